@@ -2,4 +2,8 @@ from django.apps import AppConfig
 
 
 class ArticlesConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
     name = "apps.articles"
+
+    def ready(self):
+        from . import signals  # noqa: F401
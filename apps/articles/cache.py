@@ -0,0 +1,49 @@
+"""
+Cache des statistiques du catalogue.
+
+ArticleService.get_statistics est appelée à chaque page de la liste des
+articles : son résultat est mis en cache sous un numéro de version, incrémenté
+après chaque écriture d'article (signaux, encaissement, import CSV). Les
+entrées périmées ne sont plus lues et sortent du cache d'elles-mêmes.
+"""
+import time
+
+from django.core.cache import cache
+
+CACHE_PREFIX = "articles"
+VERSION_KEY = f"{CACHE_PREFIX}:statistiques:version"
+
+# Durée de vie maximale, par sécurité si plusieurs processus n'invalident pas
+# un cache partagé (cache local à chaque processus).
+STATISTICS_TIMEOUT = 300
+
+
+def _new_version():
+    # Jamais réutilisée : une clé évincée ne ressuscite pas d'anciennes entrées.
+    return time.time_ns()
+
+
+def _version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _new_version(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump():
+    """Invalide les statistiques en cache"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, _new_version(), timeout=None)
+
+
+def get_statistics(builder):
+    """Retourne les statistiques en cache, calculées par `builder` si absentes"""
+    key = f"{CACHE_PREFIX}:statistiques:{_version()}"
+    value = cache.get(key)
+    if value is None:
+        value = builder()
+        cache.set(key, value, timeout=STATISTICS_TIMEOUT)
+    return value
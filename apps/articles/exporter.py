@@ -0,0 +1,61 @@
+"""
+Export des articles en CSV, au format relu par l'import (apps.articles.importer).
+
+Les lignes sont produites au fil de la lecture : la base est parcourue avec un
+curseur (values_list().iterator()), sans instancier les modèles, et chaque
+ligne est envoyée au client dès qu'elle est écrite.
+"""
+import csv
+
+from facturation.models import Article
+
+EXPORT_CHUNK_SIZE = 2000
+
+HEADER = [
+    'Code-barres', 'Nom', 'Description', 'Prix HT', 'Prix TTC',
+    'TVA', 'Catégorie', 'Unité', 'Stock actuel', 'Stock minimum', 'Actif',
+]
+FIELDS = (
+    'code_barres', 'nom', 'description', 'prix_HT', 'prix_TTC',
+    'taux_TVA', 'categorie', 'unite_mesure', 'stock_actuel', 'stock_minimum', 'actif',
+)
+
+CATEGORIES = dict(Article.CATEGORIE_CHOICES)
+UNITES = dict(Article.UNITE_MESURE_CHOICES)
+
+
+class _Echo:
+    """Pseudo-fichier : csv.writer renvoie la ligne au lieu de l'écrire"""
+
+    def write(self, value):
+        return value
+
+
+def _percent(taux):
+    """Taux décimal stocké (0.055) -> pourcentage affiché (5.5)"""
+    value = f"{taux * 100:f}"
+    return value.rstrip('0').rstrip('.') if '.' in value else value
+
+
+def iter_csv(queryset=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Lignes CSV (chaînes) des articles, BOM et en-tête compris"""
+    if queryset is None:
+        queryset = Article.objects.all()
+    writer = csv.writer(_Echo())
+    yield '\ufeff'  # BOM pour Excel
+    yield writer.writerow(HEADER)
+    rows = queryset.order_by('pk').values_list(*FIELDS).iterator(chunk_size=chunk_size)
+    for code, nom, description, prix_ht, prix_ttc, taux, categorie, unite, stock, stock_min, actif in rows:
+        yield writer.writerow([
+            code,
+            nom,
+            description,
+            prix_ht,
+            prix_ttc,
+            _percent(taux),
+            CATEGORIES.get(categorie, categorie),
+            UNITES.get(unite, unite),
+            stock,
+            stock_min,
+            'Oui' if actif else 'Non',
+        ])
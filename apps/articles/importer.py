@@ -0,0 +1,223 @@
+"""
+Import des articles depuis un CSV fournisseur.
+
+Le fichier est décodé au fil de la lecture (jamais chargé en entier), validé par
+lots puis enregistré avec un upsert par lot :
+INSERT ... ON CONFLICT (code_barres) DO UPDATE, dans une transaction par lot.
+Un lot rejeté par la base est rejoué ligne par ligne pour signaler les lignes
+fautives sans perdre les autres.
+"""
+import csv
+import io
+import unicodedata
+from decimal import Decimal, InvalidOperation
+
+from django.db import DatabaseError, transaction
+
+from apps.caisse.cache import barcode_cache
+from facturation.models import Article
+from . import cache as statistics_cache
+
+IMPORT_CHUNK_SIZE = 1000
+# Nombre maximal d'erreurs détaillées conservées (toutes sont comptées).
+MAX_REPORTED_ERRORS = 500
+
+CSV_ENCODING = 'utf-8-sig'
+REQUIRED_COLUMNS = ('Code-barres', 'Nom', 'Prix HT', 'Prix TTC')
+TRUE_VALUES = ('oui', 'yes', '1', 'true', 'active')
+
+UPDATE_FIELDS = [
+    'nom', 'description', 'prix_HT', 'prix_TTC', 'taux_TVA', 'categorie',
+    'unite_mesure', 'stock_actuel', 'stock_minimum', 'actif', 'date_modification',
+]
+
+PRICE_LIMIT = Decimal('1e8')  # DecimalField(max_digits=10, decimal_places=2)
+CENT = Decimal('0.01')
+
+
+class RowError(ValueError):
+    """Ligne du CSV invalide"""
+
+
+class ImportResult:
+    """Bilan d'un import : lignes lues, articles enregistrés et erreurs par ligne"""
+
+    def __init__(self):
+        self.rows = 0
+        self.imported_count = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, row_num, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"Ligne {row_num}: {message}")
+
+    @property
+    def message(self):
+        message = f"{self.imported_count} article(s) importé(s) avec succès"
+        if self.error_count:
+            message += f" (avec {self.error_count} erreur(s))"
+        return message
+
+
+def _normalize(value):
+    value = unicodedata.normalize('NFKD', str(value or '')).encode('ascii', 'ignore').decode()
+    return ' '.join(value.lower().replace('_', ' ').split())
+
+
+def _choice_lookup(choices):
+    """Accepte la clé ou le libellé d'un choix, sans tenir compte de la casse ni des accents"""
+    lookup = {}
+    for key, label in choices:
+        lookup[_normalize(key)] = key
+        lookup[_normalize(label)] = key
+    return lookup
+
+
+CATEGORIES = _choice_lookup(Article.CATEGORIE_CHOICES)
+UNITES = _choice_lookup(Article.UNITE_MESURE_CHOICES)
+
+
+def _text(row, column, default=''):
+    return (row.get(column) or default).strip()
+
+
+def _decimal(row, column, default='0'):
+    raw = _text(row, column) or default
+    try:
+        value = Decimal(raw.replace(',', '.').replace(' ', ''))
+    except InvalidOperation:
+        raise RowError(f"Erreur de format - {column} invalide : {raw!r}")
+    if not value.is_finite():
+        raise RowError(f"Erreur de format - {column} invalide : {raw!r}")
+    return value
+
+
+def _price(row, column):
+    value = _decimal(row, column).quantize(CENT)
+    if value < 0 or value >= PRICE_LIMIT:
+        raise RowError(f"{column} hors limites : {value}")
+    return value
+
+
+def _quantity(row, column, default):
+    value = _decimal(row, column, default)
+    if value < 0:
+        raise RowError(f"{column} négatif : {value}")
+    return int(value)
+
+
+def _choice(row, column, lookup, default, max_length):
+    raw = _text(row, column, default)
+    value = lookup.get(_normalize(raw), raw)
+    if len(value) > max_length:
+        raise RowError(f"{column} trop long ({len(value)} caractères)")
+    return value
+
+
+def parse_row(row):
+    """Convertit une ligne du CSV en Article non enregistré ; lève RowError si invalide"""
+    if not all(_text(row, column) for column in REQUIRED_COLUMNS):
+        raise RowError("Champs requis manquants")
+
+    code_barres = _text(row, 'Code-barres')
+    nom = _text(row, 'Nom')
+    if len(code_barres) > Article._meta.get_field('code_barres').max_length:
+        raise RowError("Code-barres trop long")
+    if len(nom) > Article._meta.get_field('nom').max_length:
+        raise RowError("Nom trop long")
+
+    # La TVA est donnée en pourcentage (5.5), stockée en décimal (0.055).
+    taux_tva = (_decimal(row, 'TVA', '5.5') / 100).quantize(Decimal('0.001'))
+    if not 0 <= taux_tva < 100:
+        raise RowError(f"TVA hors limites : {taux_tva * 100}")
+
+    return Article(
+        code_barres=code_barres,
+        nom=nom,
+        description=_text(row, 'Description'),
+        prix_HT=_price(row, 'Prix HT'),
+        prix_TTC=_price(row, 'Prix TTC'),
+        taux_TVA=taux_tva,
+        categorie=_choice(row, 'Catégorie', CATEGORIES, 'Epicerie', 100),
+        unite_mesure=_choice(row, 'Unité', UNITES, 'Unite', 50),
+        stock_actuel=_quantity(row, 'Stock actuel', '0'),
+        stock_minimum=_quantity(row, 'Stock minimum', '5'),
+        actif=_text(row, 'Actif', 'Oui').lower() in TRUE_VALUES,
+    )
+
+
+def _upsert(articles):
+    Article.objects.bulk_create(
+        articles,
+        update_conflicts=True,
+        unique_fields=['code_barres'],
+        update_fields=UPDATE_FIELDS,
+    )
+
+
+def _save_chunk(chunk, result):
+    """Enregistre un lot de (numéro de ligne, article) ; rejoue ligne à ligne en cas d'échec"""
+    # Un code-barres présent deux fois dans le lot : la dernière ligne l'emporte.
+    by_code = {}
+    for row_num, article in chunk:
+        by_code[article.code_barres] = (row_num, article)
+    try:
+        with transaction.atomic():
+            _upsert([article for _, article in by_code.values()])
+        result.imported_count += len(chunk)
+        return
+    except DatabaseError:
+        pass
+    for row_num, article in chunk:
+        try:
+            with transaction.atomic():
+                _upsert([article])
+            result.imported_count += 1
+        except DatabaseError as e:
+            result.add_error(row_num, str(e).strip().splitlines()[0])
+
+
+def iter_rows(fileobj, encoding=CSV_ENCODING):
+    """Lignes du CSV (numéro de ligne, dict), décodées au fil de la lecture"""
+    text = io.TextIOWrapper(fileobj, encoding=encoding, newline='')
+    try:
+        yield from enumerate(csv.DictReader(text), start=2)
+    finally:
+        # Le fichier reste à l'appelant.
+        text.detach()
+
+
+def import_articles(fileobj, chunk_size=IMPORT_CHUNK_SIZE, on_progress=None):
+    """
+    Importe les articles d'un fichier CSV binaire (upload ou fichier ouvert en 'rb').
+    `on_progress(result)` est appelé après chaque lot enregistré.
+    """
+    result = ImportResult()
+    chunk = []
+    row_num = 1
+    try:
+        for row_num, row in iter_rows(fileobj):
+            result.rows += 1
+            try:
+                chunk.append((row_num, parse_row(row)))
+            except RowError as e:
+                result.add_error(row_num, str(e))
+            if len(chunk) >= chunk_size:
+                _save_chunk(chunk, result)
+                chunk = []
+                if on_progress is not None:
+                    on_progress(result)
+    except UnicodeDecodeError:
+        # Les lignes déjà lues sont conservées ; la suite du fichier est ignorée.
+        result.add_error(row_num + 1, "Encodage invalide (UTF-8 attendu), import interrompu")
+    if chunk:
+        _save_chunk(chunk, result)
+    if on_progress is not None:
+        on_progress(result)
+
+    # bulk_create n'envoie pas de signal : le cache code-barres est vidé d'un bloc.
+    transaction.on_commit(barcode_cache.clear)
+    transaction.on_commit(statistics_cache.bump)
+    return result
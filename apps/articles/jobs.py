@@ -0,0 +1,165 @@
+"""
+Exécution des imports CSV en arrière-plan.
+
+La vue enregistre le fichier et une TacheImport, puis rend la main : la tâche
+est confiée à un pool de threads du processus web, sans broker externe.
+Les tâches restées en attente (redémarrage du serveur, import désactivé dans
+le processus web) sont traitées par la commande process_import_jobs. Une tâche
+en cours qui ne progresse plus depuis IMPORT_STALE_AFTER (thread ou processus
+arrêté en plein import) est reprise depuis le début, l'upsert étant rejouable ;
+après MAX_ATTEMPTS reprises elle est marquée en échec.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .importer import import_articles
+from .models import TacheImport
+
+logger = logging.getLogger(__name__)
+
+# Imports simultanés par processus : un seul suffit, l'upsert est déjà groupé.
+IMPORT_WORKERS = 1
+# Erreurs détaillées conservées sur la tâche pour l'affichage.
+ERROR_SAMPLE_SIZE = 50
+# Délai sans progression après lequel une tâche en cours est considérée interrompue.
+IMPORT_STALE_AFTER = timedelta(minutes=10)
+MAX_ATTEMPTS = 3
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="import-articles")
+    return _executor
+
+
+def submit(tache):
+    """Planifie la tâche après validation de la transaction qui l'a créée"""
+    if not getattr(settings, "ARTICLES_IMPORT_IN_PROCESS", True):
+        return  # Traitée par la commande process_import_jobs
+    if getattr(settings, "ARTICLES_IMPORT_ASYNC", True):
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_thread, tache.pk))
+    else:
+        transaction.on_commit(lambda: run(tache.pk))
+
+
+def _stale():
+    return Q(statut="en_cours", date_progression__lt=timezone.now() - IMPORT_STALE_AFTER)
+
+
+def is_stale(tache):
+    return (
+        tache.statut == "en_cours"
+        and tache.date_progression is not None
+        and tache.date_progression < timezone.now() - IMPORT_STALE_AFTER
+    )
+
+
+def abandon_stale():
+    """Marque en échec les tâches interrompues MAX_ATTEMPTS fois ; retourne leur nombre"""
+    abandoned = 0
+    for tache in TacheImport.objects.filter(_stale(), tentatives__gte=MAX_ATTEMPTS):
+        updated = TacheImport.objects.filter(pk=tache.pk, statut="en_cours").update(
+            statut="echouee",
+            message=f"Import interrompu {tache.tentatives} fois, abandonné",
+            fichier="",
+            date_fin=timezone.now(),
+        )
+        if updated:
+            tache.fichier.delete(save=False)
+            abandoned += 1
+    return abandoned
+
+
+def resume(tache):
+    """Relance une tâche interrompue (ou l'abandonne après MAX_ATTEMPTS reprises)"""
+    abandon_stale()
+    tache.refresh_from_db()
+    if is_stale(tache):
+        submit(tache)
+
+
+def _run_in_thread(tache_id):
+    close_old_connections()
+    try:
+        run(tache_id)
+    except Exception:
+        logger.exception("Import d'articles %s interrompu", tache_id)
+    finally:
+        connection.close()
+
+
+def run(tache_id):
+    """
+    Exécute une tâche en attente, ou interrompue. Retourne False si elle a
+    déjà été prise par un autre processus.
+    """
+    now = timezone.now()
+    claimed = (
+        TacheImport.objects.filter(Q(statut="en_attente") | _stale(), pk=tache_id, tentatives__lt=MAX_ATTEMPTS)
+        .update(statut="en_cours", date_debut=now, date_progression=now, tentatives=F("tentatives") + 1)
+    )
+    if not claimed:
+        return False
+    tache = TacheImport.objects.get(pk=tache_id)
+
+    try:
+        with tache.fichier.open("rb") as fichier:
+
+            def on_progress(result):
+                TacheImport.objects.filter(pk=tache_id).update(
+                    octets_lus=fichier.tell(),
+                    lignes_lues=result.rows,
+                    lignes_importees=result.imported_count,
+                    nb_erreurs=result.error_count,
+                    erreurs=result.errors[:ERROR_SAMPLE_SIZE],
+                    date_progression=timezone.now(),
+                )
+
+            result = import_articles(fichier, on_progress=on_progress)
+    except Exception as e:
+        TacheImport.objects.filter(pk=tache_id).update(
+            statut="echouee",
+            message=f"Erreur lors de la lecture du fichier: {e}",
+            fichier="",
+            date_fin=timezone.now(),
+        )
+        raise
+    finally:
+        # Le fichier n'est plus utile une fois lu.
+        tache.fichier.delete(save=False)
+
+    TacheImport.objects.filter(pk=tache_id).update(
+        statut="terminee",
+        octets_lus=tache.taille,
+        lignes_lues=result.rows,
+        lignes_importees=result.imported_count,
+        nb_erreurs=result.error_count,
+        erreurs=result.errors[:ERROR_SAMPLE_SIZE],
+        message=result.message,
+        fichier="",
+        date_fin=timezone.now(),
+    )
+    return True
+
+
+def process_pending(limit=None):
+    """Traite les tâches en attente ou interrompues, des plus anciennes aux plus récentes"""
+    processed = 0
+    abandon_stale()
+    pending = TacheImport.objects.filter(Q(statut="en_attente") | _stale()).order_by("date_creation")
+    for tache_id in pending.values_list("pk", flat=True)[:limit]:
+        try:
+            if run(tache_id):
+                processed += 1
+        except Exception:
+            logger.exception("Import d'articles %s interrompu", tache_id)
+    return processed
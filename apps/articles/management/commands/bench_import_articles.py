@@ -0,0 +1,93 @@
+import csv
+import io
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.articles.importer import IMPORT_CHUNK_SIZE, import_articles, parse_row
+from facturation.models import Article
+
+
+class Command(BaseCommand):
+    help = "Mesure le débit (lignes/s) de l'import CSV d'articles sur un catalogue agrandi"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            default=str(Path(settings.BASE_DIR) / 'articles_import_fcfa.csv'),
+            help='CSV modèle, répété jusqu\'au nombre de lignes voulu',
+        )
+        parser.add_argument('--rows', type=int, default=50000, help='Nombre de lignes importées')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, help='Lignes par lot')
+        parser.add_argument(
+            '--compare',
+            type=int,
+            default=0,
+            help='Mesure aussi l\'ancien import (update_or_create par ligne) sur N lignes',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['source'], newline='', encoding='utf-8-sig') as source:
+                reader = csv.DictReader(source)
+                fieldnames = reader.fieldnames
+                template = list(reader)
+        except OSError as e:
+            raise CommandError(f"Lecture impossible de {options['source']}: {e}")
+        if not template:
+            raise CommandError('Le CSV modèle est vide')
+        rows = max(1, options['rows'])
+
+        # Catalogue agrandi écrit sur disque, puis relu en flux comme un upload.
+        with tempfile.TemporaryFile() as upload:
+            text = io.TextIOWrapper(upload, encoding='utf-8', newline='')
+            writer = csv.DictWriter(text, fieldnames=fieldnames)
+            writer.writeheader()
+            for i in range(rows):
+                row = dict(template[i % len(template)])
+                row['Code-barres'] = f'BENCHI{i:010d}'
+                writer.writerow(row)
+            text.flush()
+            text.detach()
+            size_mb = upload.tell() / (1024 * 1024)
+
+            # Tout est fait dans une transaction annulée : la base n'est pas modifiée.
+            with transaction.atomic():
+                for label in ('création', 'mise à jour'):
+                    upload.seek(0)
+                    started = time.perf_counter()
+                    result = import_articles(upload, chunk_size=options['chunk_size'])
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f'{label:>12} : {result.imported_count} lignes ({size_mb:.1f} Mo) en {elapsed:.2f} s '
+                        f'-> {result.imported_count / elapsed:,.0f} lignes/s, {result.error_count} erreur(s)'
+                    )
+
+                if options['compare']:
+                    self._legacy(template, options['compare'])
+
+                transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Benchmark terminé (données annulées)'))
+
+    def _legacy(self, template, rows):
+        """Import ligne à ligne de référence (une requête update_or_create par ligne)"""
+        started = time.perf_counter()
+        for i in range(rows):
+            article = parse_row(template[i % len(template)])
+            Article.objects.update_or_create(
+                code_barres=f'BENCHL{i:010d}',
+                defaults={
+                    field.attname: getattr(article, field.attname)
+                    for field in Article._meta.concrete_fields
+                    if field.attname not in ('id', 'code_barres', 'date_modification')
+                },
+            )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{'ligne à ligne':>12} : {rows} lignes en {elapsed:.2f} s -> {rows / elapsed:,.0f} lignes/s"
+        )
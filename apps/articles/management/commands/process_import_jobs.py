@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.articles import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Traite les imports CSV d'articles en attente (après un redémarrage, "
+        "ou quand ARTICLES_IMPORT_IN_PROCESS = False)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Reste actif et traite les nouveaux imports')
+        parser.add_argument('--interval', type=float, default=2.0, help='Pause entre deux passages, en secondes')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = jobs.process_pending()
+            if processed:
+                self.stdout.write(self.style.SUCCESS(f"{processed} import(s) traité(s)"))
+            if not options['loop']:
+                if not processed:
+                    self.stdout.write("Aucun import en attente")
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,41 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0003_remove_article_articles_ar_code_ba_6a26b2_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TacheImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fichier', models.FileField(blank=True, upload_to='imports/articles/')),
+                ('nom_fichier', models.CharField(max_length=255)),
+                ('taille', models.BigIntegerField(default=0, help_text='Taille du fichier en octets')),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('terminee', 'Terminée'), ('echouee', 'Échouée')], db_index=True, default='en_attente', max_length=20)),
+                ('octets_lus', models.BigIntegerField(default=0)),
+                ('lignes_lues', models.IntegerField(default=0)),
+                ('lignes_importees', models.IntegerField(default=0)),
+                ('nb_erreurs', models.IntegerField(default=0)),
+                ('erreurs', models.JSONField(blank=True, default=list, help_text='Échantillon des erreurs par ligne')),
+                ('message', models.TextField(blank=True, default='')),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_debut', models.DateTimeField(blank=True, null=True)),
+                ('date_fin', models.DateTimeField(blank=True, null=True)),
+                ('cree_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': "Tâche d'import",
+                'verbose_name_plural': "Tâches d'import",
+                'ordering': ['-date_creation'],
+            },
+        ),
+    ]
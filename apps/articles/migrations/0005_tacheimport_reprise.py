@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:03
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def init_date_progression(apps, schema_editor):
+    # Tâches déjà prises : une tentative, sans progression connue depuis le début.
+    TacheImport = apps.get_model('articles', 'TacheImport')
+    TacheImport.objects.filter(date_debut__isnull=False).update(date_progression=F('date_debut'), tentatives=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0004_tacheimport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tacheimport',
+            name='date_progression',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='tacheimport',
+            name='tentatives',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(init_date_progression, migrations.RunPython.noop),
+    ]
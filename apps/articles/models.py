@@ -1,3 +1,58 @@
+from django.conf import settings
+from django.db import models
+
 from facturation.models import Article
 
-__all__ = ["Article"]
+__all__ = ["Article", "TacheImport"]
+
+
+class TacheImport(models.Model):
+    """Import CSV d'articles exécuté en arrière-plan (voir apps.articles.jobs)"""
+
+    STATUT_CHOICES = [
+        ("en_attente", "En attente"),
+        ("en_cours", "En cours"),
+        ("terminee", "Terminée"),
+        ("echouee", "Échouée"),
+    ]
+
+    fichier = models.FileField(upload_to="imports/articles/", blank=True)
+    nom_fichier = models.CharField(max_length=255)
+    taille = models.BigIntegerField(default=0, help_text="Taille du fichier en octets")
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default="en_attente", db_index=True)
+    octets_lus = models.BigIntegerField(default=0)
+    lignes_lues = models.IntegerField(default=0)
+    lignes_importees = models.IntegerField(default=0)
+    nb_erreurs = models.IntegerField(default=0)
+    erreurs = models.JSONField(default=list, blank=True, help_text="Échantillon des erreurs par ligne")
+    message = models.TextField(blank=True, default="")
+    cree_par = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_debut = models.DateTimeField(null=True, blank=True)
+    # Dernière progression : une tâche en cours qui n'avance plus est reprise (voir jobs).
+    date_progression = models.DateTimeField(null=True, blank=True)
+    tentatives = models.PositiveSmallIntegerField(default=0)
+    date_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Tâche d'import"
+        verbose_name_plural = "Tâches d'import"
+        ordering = ["-date_creation"]
+
+    def __str__(self):
+        return f"Import {self.nom_fichier} ({self.get_statut_display()})"
+
+    @property
+    def termine(self):
+        return self.statut in ("terminee", "echouee")
+
+    @property
+    def progression(self):
+        """Avancement en pourcentage, estimé sur les octets lus"""
+        if self.statut == "terminee":
+            return 100
+        if not self.taille:
+            return 0
+        return min(99, int(self.octets_lus * 100 / self.taille))
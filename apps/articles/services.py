@@ -1,6 +1,9 @@
-from django.db.models import Q, Sum, Count, Avg, F
+from decimal import Decimal
+
+from django.db.models import Q, Sum, Count, Avg, F, DecimalField
 from django.db.models.functions import Coalesce
 from facturation.models import Article
+from . import cache as statistics_cache
 
 
 class ArticleService:
@@ -9,55 +12,49 @@ class ArticleService:
     @staticmethod
     def get_articles_low_stock():
         """Récupère les articles en rupture ou stock faible"""
+        # stock_minimum >= 0 : la rupture est incluse, et le filtre reprend la
+        # condition de l'index partiel facturation_art_stock_bas_idx.
         return Article.objects.filter(
-            Q(stock_actuel__lte=F('stock_minimum')) | 
-            Q(stock_actuel=0),
+            stock_actuel__lte=F('stock_minimum'),
             actif=True
         ).values('id', 'code_barres', 'nom', 'stock_actuel', 'stock_minimum')
 
     @staticmethod
     def get_statistics():
-        """Retourne les statistiques du catalogue"""
-        from decimal import Decimal
-        
-        articles = Article.objects.filter(actif=True)
-        all_articles = Article.objects.all()
-        
-        # Calculer la valeur du stock et prix moyen manuellement
-        valeur_stock = Decimal('0')
-        total_prix = Decimal('0')
-        
-        for article in articles:
-            valeur_stock += article.stock_actuel * article.prix_HT
-            total_prix += article.prix_HT
-        
-        prix_moyen = (total_prix / articles.count()) if articles.count() > 0 else Decimal('0')
-        
+        """Retourne les statistiques du catalogue (en cache jusqu'à la prochaine modification d'article)"""
+        return statistics_cache.get_statistics(ArticleService.compute_statistics)
+
+    @staticmethod
+    def compute_statistics():
+        """Calcule les statistiques du catalogue : un agrégat et un regroupement par catégorie"""
+        actif = Q(actif=True)
+        stats = Article.objects.aggregate(
+            total_articles=Count('id'),
+            articles_actifs=Count('id', filter=actif),
+            stock_total=Coalesce(Sum('stock_actuel', filter=actif), 0),
+            valeur_stock=Coalesce(
+                Sum(F('stock_actuel') * F('prix_HT'), filter=actif, output_field=DecimalField(max_digits=20, decimal_places=2)),
+                Decimal('0'),
+            ),
+            prix_moyen=Coalesce(Avg('prix_HT', filter=actif), Decimal('0')),
+            articles_rupture=Count('id', filter=actif & Q(stock_actuel=0)),
+            articles_stock_faible=Count(
+                'id', filter=actif & Q(stock_actuel__gt=0, stock_actuel__lte=F('stock_minimum'))
+            ),
+        )
+        stats['articles_inactifs'] = stats['total_articles'] - stats['articles_actifs']
+
         category_labels = dict(Article.CATEGORIE_CHOICES)
         category_rows = list(
-            articles.values('categorie')
+            Article.objects.filter(actif=True)
+            .values('categorie')
             .annotate(count=Count('id'))
             .order_by('-count')
         )
         for row in category_rows:
             row['label'] = category_labels.get(row['categorie'], row['categorie'])
-
-        return {
-            'total_articles': all_articles.count(),
-            'articles_actifs': articles.count(),
-            'articles_inactifs': all_articles.filter(actif=False).count(),
-            'stock_total': articles.aggregate(
-                total=Coalesce(Sum('stock_actuel'), 0)
-            )['total'],
-            'valeur_stock': valeur_stock,
-            'prix_moyen': prix_moyen,
-            'articles_rupture': articles.filter(stock_actuel=0).count(),
-            'articles_stock_faible': articles.filter(
-                stock_actuel__gt=0,
-                stock_actuel__lte=F('stock_minimum')
-            ).count(),
-            'par_categorie': category_rows,
-        }
+        stats['par_categorie'] = category_rows
+        return stats
 
     @staticmethod
     def validate_prix(prix_ht, prix_ttc, taux_tva):
@@ -0,0 +1,13 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from facturation.models import Article
+from . import cache as statistics_cache
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+def invalidate_statistics(sender, instance, **kwargs):
+    """Invalide les statistiques du catalogue après validation de la transaction"""
+    transaction.on_commit(statistics_cache.bump)
@@ -1,7 +1,19 @@
-from django.test import TestCase, Client
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from django.core.exceptions import ValidationError
-from facturation.models import Article
+from django.core.files.uploadedfile import SimpleUploadedFile
+from decimal import Decimal
+from facturation.models import Article, Utilisateur
+from . import jobs
+from .importer import import_articles
+from .models import TacheImport
 from .services import ArticleService
 
 
@@ -106,6 +118,7 @@ class ArticleServiceTests(TestCase):
     """Tests du service métier"""
 
     def setUp(self):
+        cache.clear()
         for i in range(5):
             Article.objects.create(
                 code_barres=f'123456789012{i}',
@@ -133,6 +146,27 @@ class ArticleServiceTests(TestCase):
         self.assertIn('stock_total', stats)
         self.assertEqual(stats['total_articles'], 5)
 
+    def test_statistics_values_and_cache(self):
+        """Test les valeurs agrégées et leur invalidation à la modification d'un article"""
+        with self.assertNumQueries(2):
+            stats = ArticleService.get_statistics()
+        self.assertEqual(
+            (stats['articles_actifs'], stats['articles_inactifs'], stats['stock_total']), (3, 2, 60)
+        )
+        self.assertEqual(stats['valeur_stock'], Decimal('260'))
+        self.assertEqual(stats['prix_moyen'], Decimal('3'))
+        self.assertEqual((stats['articles_rupture'], stats['articles_stock_faible']), (1, 0))
+        self.assertEqual(stats['par_categorie'][0]['count'], 3)
+
+        with self.assertNumQueries(0):
+            ArticleService.get_statistics()
+        article = Article.objects.get(nom='Article 2')
+        article.stock_actuel = 4
+        with self.captureOnCommitCallbacks(execute=True):
+            article.save()
+        stats = ArticleService.get_statistics()
+        self.assertEqual((stats['stock_total'], stats['articles_stock_faible']), (44, 1))
+
     def test_calculate_ttc(self):
         """Test le calcul du prix TTC"""
         ttc = ArticleService.calculate_ttc(100, 5.5)
@@ -148,6 +182,7 @@ class ArticleViewsTests(TestCase):
     """Tests des vues"""
 
     def setUp(self):
+        cache.clear()
         self.client = Client()
         self.article = Article.objects.create(
             code_barres='1234567890123',
@@ -200,3 +235,215 @@ class ArticleViewsTests(TestCase):
         )
         self.assertEqual(response.status_code, 200)
 
+
+class ArticleImportTests(TestCase):
+    """Tests de l'import CSV en flux"""
+
+    HEADER = 'Code-barres,Nom,Description,Prix HT,Prix TTC,TVA,Catégorie,Unité,Stock actuel,Stock minimum,Actif\n'
+
+    def _csv(self, *lines):
+        return SimpleUploadedFile(
+            'articles.csv', (self.HEADER + '\n'.join(lines) + '\n').encode('utf-8')
+        )
+
+    def test_import_creates_and_updates(self):
+        """Test la création et la mise à jour par code-barres, en plusieurs lots"""
+        Article.objects.create(
+            code_barres='1000000000001', nom='Ancien nom',
+            prix_HT=Decimal('1.00'), prix_TTC=Decimal('1.00'),
+        )
+        lines = [
+            '1000000000001,Riz parfumé,,1000,1180,18,Epicerie,Sac,12,3,Oui',
+            '1000000000002,Lait,,500,527.50,"5,5",Produits laitiers,Litre,4,2,Non',
+            '1000000000003,Savon,,250,295,18,hygiene,Piece,0,1,oui',
+        ]
+        result = import_articles(self._csv(*lines), chunk_size=2)
+
+        self.assertEqual(result.imported_count, 3)
+        self.assertEqual(result.errors, [])
+        self.assertEqual(Article.objects.count(), 3)
+        riz = Article.objects.get(code_barres='1000000000001')
+        self.assertEqual(riz.nom, 'Riz parfumé')
+        self.assertEqual(riz.taux_TVA, Decimal('0.180'))
+        self.assertEqual(riz.categorie, 'epicerie')
+        self.assertEqual(riz.unite_mesure, 'sac')
+        self.assertEqual(riz.stock_actuel, 12)
+        lait = Article.objects.get(code_barres='1000000000002')
+        self.assertEqual(lait.taux_TVA, Decimal('0.055'))
+        self.assertEqual(lait.categorie, 'produits_laitiers')
+        self.assertFalse(lait.actif)
+
+    def test_import_reports_row_errors(self):
+        """Test que les lignes invalides sont signalées sans bloquer les autres"""
+        lines = [
+            '2000000000001,Valide,,100,118,18,Epicerie,Unite,1,1,Oui',
+            '2000000000002,,,100,118,18,Epicerie,Unite,1,1,Oui',
+            '2000000000003,Prix faux,,abc,118,18,Epicerie,Unite,1,1,Oui',
+            '2000000000004,Stock négatif,,100,118,18,Epicerie,Unite,-2,1,Oui',
+            '2000000000005,Valide aussi,,100,118,18,Epicerie,Unite,1,1,Oui',
+        ]
+        result = import_articles(self._csv(*lines))
+
+        self.assertEqual(result.imported_count, 2)
+        self.assertEqual(result.error_count, 3)
+        self.assertTrue(result.errors[0].startswith('Ligne 3:'))
+        self.assertTrue(result.errors[1].startswith('Ligne 4:'))
+        self.assertTrue(result.errors[2].startswith('Ligne 5:'))
+        self.assertEqual(Article.objects.count(), 2)
+
+    def test_import_query_count_per_chunk(self):
+        """Test que le nombre de requêtes dépend du nombre de lots, pas de lignes"""
+        lines = [f'30000000{i:05d},Article {i},,100,118,18,Epicerie,Unite,1,1,Oui' for i in range(50)]
+        # Par lot : SAVEPOINT, INSERT ... ON CONFLICT, RELEASE SAVEPOINT.
+        with self.assertNumQueries(3 * 2):
+            result = import_articles(self._csv(*lines), chunk_size=25)
+        self.assertEqual(result.imported_count, 50)
+
+
+class ArticleExportTests(TestCase):
+    """Tests de l'export CSV en flux"""
+
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(login='gerant', password='secret', role='Gestionnaire')
+        self.client.force_login(self.user)
+        Article.objects.create(
+            code_barres='5000000000001', nom='Lait, entier', prix_HT=Decimal('500.00'),
+            prix_TTC=Decimal('527.50'), taux_TVA=Decimal('0.055'),
+            categorie='produits_laitiers', unite_mesure='litre', stock_actuel=4, stock_minimum=2,
+        )
+        Article.objects.create(
+            code_barres='5000000000002', nom='Savon', prix_HT=Decimal('250.00'),
+            prix_TTC=Decimal('295.00'), taux_TVA=Decimal('0.180'), categorie='hygiene', actif=False,
+        )
+
+    def test_export_streams_importable_csv(self):
+        """Test que l'export est envoyé en flux et relu à l'identique par l'import"""
+        with self.assertNumQueries(3):  # session, utilisateur, articles
+            response = self.client.get(reverse('articles:export_articles'))
+            content = b''.join(response.streaming_content)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="articles.csv"')
+        text = content.decode('utf-8')
+        self.assertTrue(text.startswith('\ufeffCode-barres,Nom,'))
+        self.assertIn('5000000000001,"Lait, entier",,500.00,527.50,5.5,Produits laitiers,Litre,4,2,Oui', text)
+        self.assertIn(',18,', text)
+
+        Article.objects.all().delete()
+        result = import_articles(SimpleUploadedFile('articles.csv', content))
+        self.assertEqual(result.imported_count, 2)
+        lait = Article.objects.get(code_barres='5000000000001')
+        self.assertEqual(lait.taux_TVA, Decimal('0.055'))
+        self.assertEqual(lait.categorie, 'produits_laitiers')
+        self.assertEqual(lait.unite_mesure, 'litre')
+        self.assertFalse(Article.objects.get(code_barres='5000000000002').actif)
+
+
+@override_settings(ARTICLES_IMPORT_ASYNC=False)
+class ImportJobTests(TestCase):
+    """Tests des imports en arrière-plan"""
+
+    HEADER = ArticleImportTests.HEADER
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.user = Utilisateur.objects.create_user(login='gerant', password='secret', role='Gestionnaire')
+        self.client.force_login(self.user)
+
+    def _upload(self, *lines):
+        csv_file = SimpleUploadedFile('articles.csv', (self.HEADER + '\n'.join(lines) + '\n').encode('utf-8'))
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('articles:importer_articles'), {'csv_file': csv_file})
+
+    def test_upload_runs_job_and_reports_progress(self):
+        """Test que l'upload crée une tâche, rend la main, et que l'avancement est exposé"""
+        response = self._upload(
+            '4000000000001,Riz,,1000,1180,18,Epicerie,Sac,12,3,Oui',
+            '4000000000002,,,100,118,18,Epicerie,Unite,1,1,Oui',
+        )
+        tache = TacheImport.objects.get()
+        self.assertRedirects(response, f"{reverse('articles:importer_articles')}?tache={tache.pk}")
+        self.assertEqual(tache.statut, 'terminee')
+        self.assertEqual(tache.cree_par, self.user)
+        self.assertFalse(tache.fichier)
+        self.assertTrue(Article.objects.filter(code_barres='4000000000001').exists())
+
+        data = self.client.get(reverse('articles:import_progress', args=[tache.pk])).json()
+        self.assertTrue(data['termine'])
+        self.assertEqual(data['progression'], 100)
+        self.assertEqual(data['lignes_lues'], 2)
+        self.assertEqual(data['lignes_importees'], 1)
+        self.assertEqual(data['nb_erreurs'], 1)
+        self.assertTrue(data['erreurs'][0].startswith('Ligne 3:'))
+
+        page = self.client.get(response['Location'])
+        self.assertContains(page, 'articles.csv')
+
+    @override_settings(ARTICLES_IMPORT_IN_PROCESS=False)
+    def test_pending_jobs_processed_by_command(self):
+        """Test que les tâches en attente sont traitées une seule fois par process_pending"""
+        self._upload('4000000000003,Lait,,500,527.50,5.5,Epicerie,Litre,4,2,Oui')
+        tache = TacheImport.objects.get()
+        self.assertEqual(tache.statut, 'en_attente')
+        self.assertFalse(tache.termine)
+        self.assertEqual(
+            self.client.get(reverse('articles:import_progress', args=[tache.pk])).json()['progression'], 0
+        )
+
+        self.assertEqual(jobs.process_pending(), 1)
+        self.assertEqual(jobs.process_pending(), 0)
+        tache.refresh_from_db()
+        self.assertEqual(tache.statut, 'terminee')
+        self.assertEqual(tache.lignes_importees, 1)
+        self.assertIsNotNone(tache.date_fin)
+
+    def _interrupt(self, tentatives):
+        """Tâche prise par un worker arrêté en plein import"""
+        with override_settings(ARTICLES_IMPORT_IN_PROCESS=False):
+            self._upload('4000000000004,Sucre,,800,944,18,Epicerie,Kg,6,2,Oui')
+        tache = TacheImport.objects.get()
+        interrupted_at = timezone.now() - jobs.IMPORT_STALE_AFTER - timedelta(minutes=1)
+        TacheImport.objects.filter(pk=tache.pk).update(
+            statut='en_cours', date_debut=interrupted_at, date_progression=interrupted_at, tentatives=tentatives,
+        )
+        tache.refresh_from_db()
+        return tache
+
+    def test_interrupted_job_is_resumed(self):
+        """Test qu'une tâche en cours qui ne progresse plus est reprise, par la commande ou par l'avancement"""
+        tache = self._interrupt(tentatives=1)
+        self.assertEqual(jobs.process_pending(), 1)
+        tache.refresh_from_db()
+        self.assertEqual((tache.statut, tache.tentatives), ('terminee', 2))
+        self.assertTrue(Article.objects.filter(code_barres='4000000000004').exists())
+
+        TacheImport.objects.all().delete()
+        tache = self._interrupt(tentatives=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('articles:import_progress', args=[tache.pk]))
+        data = self.client.get(reverse('articles:import_progress', args=[tache.pk])).json()
+        self.assertEqual(data['statut'], 'terminee')
+
+    def test_job_abandoned_after_max_attempts(self):
+        """Test qu'une tâche interrompue trop souvent est marquée en échec et son fichier supprimé"""
+        tache = self._interrupt(tentatives=jobs.MAX_ATTEMPTS)
+        path = tache.fichier.path
+        self.assertEqual(jobs.process_pending(), 0)
+        tache.refresh_from_db()
+        self.assertEqual(tache.statut, 'echouee')
+        self.assertFalse(tache.fichier)
+        self.assertFalse(os.path.exists(path))
+
+    def test_unreadable_file_clears_fichier(self):
+        """Test que l'échec de lecture supprime le fichier et vide la référence"""
+        tache = self._interrupt(tentatives=0)
+        tache.fichier.storage.delete(tache.fichier.name)
+        TacheImport.objects.filter(pk=tache.pk).update(statut='en_attente')
+        with self.assertRaises(Exception):
+            jobs.run(tache.pk)
+        tache.refresh_from_db()
+        self.assertEqual(tache.statut, 'echouee')
+        self.assertFalse(tache.fichier)
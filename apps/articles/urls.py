@@ -11,5 +11,6 @@ urlpatterns = [
     path('supprimer/<int:pk>/', views.supprimer_article, name='supprimer_article'),
     path('supprimer-tout/', views.supprimer_tout_articles, name='supprimer_tout'),
     path('importer/', views.importer_articles, name='importer_articles'),
+    path('api/import/<int:pk>/', views.import_progress, name='import_progress'),
     path('exporter/', views.export_articles, name='export_articles'),
 ]
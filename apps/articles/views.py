@@ -1,13 +1,18 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
-from django.core.paginator import Paginator
+from django.http import JsonResponse, StreamingHttpResponse
+from django.db import transaction
 from django.db.models import Q
+from django.urls import reverse
 from urllib.parse import urlencode
 from django.views.decorators.http import require_GET
 from facturation.models import Article
+from facturation.pagination import KeysetPaginator
 from .forms import ArticleFormCreate, ArticleFormEdit
+from . import jobs
+from .exporter import iter_csv
+from .models import TacheImport
 from .services import ArticleService
 from apps.gestionnaire.decorators import gestionnaire_required
 
@@ -66,10 +71,8 @@ def liste_articles(request):
     db_field = valid_sort_fields.get(sort_by, 'nom')
     if order == 'desc':
         db_field = '-' + db_field
-        
-    articles = articles.order_by(db_field)
 
-    # Pagination
+    # Pagination par clé : chaque page coûte autant que la première
     page_sizes = [10, 25, 50]
     page_size_raw = request.GET.get('page_size', '10')
     try:
@@ -78,8 +81,8 @@ def liste_articles(request):
         page_size = 10
     if page_size not in page_sizes:
         page_size = 10
-    paginator = Paginator(articles, page_size)
-    page_obj = paginator.get_page(request.GET.get('page'))
+    paginator = KeysetPaginator(articles, page_size, [db_field])
+    page_obj = paginator.get_page(request.GET.get('cursor'))
 
     def build_query(**overrides):
         params = request.GET.copy()
@@ -93,16 +96,16 @@ def liste_articles(request):
     sort_urls = {}
     for key in valid_sort_fields.keys():
         next_order = 'desc' if (sort_by == key and order == 'asc') else 'asc'
-        sort_urls[key] = f"?{build_query(sort=key, order=next_order, page=1)}"
-    
-    # Comptage
-    total_articles = Article.objects.count()
+        sort_urls[key] = f"?{build_query(sort=key, order=next_order, cursor=None)}"
+
     stats = ArticleService.get_statistics()
-    
+
     context = {
         'articles': page_obj.object_list,
         'page_obj': page_obj,
-        'total_articles': total_articles,
+        'previous_url': f"?{build_query(cursor=page_obj.previous_cursor)}" if page_obj.previous_cursor else None,
+        'next_url': f"?{build_query(cursor=page_obj.next_cursor)}" if page_obj.next_cursor else None,
+        'total_articles': stats['total_articles'],
         'search': search,
         'categorie': categorie,
         'categorie_choices': Article.CATEGORIE_CHOICES,
@@ -194,111 +197,65 @@ def supprimer_tout_articles(request):
 @login_required
 @gestionnaire_required
 def importer_articles(request):
-    """Importe les articles depuis un fichier CSV"""
-    import csv
-    import io
-    
+    """
+    Importe les articles depuis un fichier CSV.
+    Le fichier est enregistré puis traité en arrière-plan : la page suit
+    l'avancement via import_progress.
+    """
     if request.method == 'POST' and request.FILES.get('csv_file'):
         csv_file = request.FILES['csv_file']
-        
-        try:
-            if not csv_file.name.endswith('.csv'):
-                return render(request, 'articles/importer_articles.html', {
-                    'error': 'Le fichier doit être au format CSV'
-                })
-            
-            decoded_file = csv_file.read().decode('utf-8')
-            io_string = io.StringIO(decoded_file)
-            reader = csv.DictReader(io_string)
-            
-            imported_count = 0
-            errors = []
-            
-            for row_num, row in enumerate(reader, start=2):
-                try:
-                    # Vérifier les champs requis
-                    if not all([row.get('Code-barres'), row.get('Nom'), 
-                               row.get('Prix HT'), row.get('Prix TTC')]):
-                        errors.append(f"Ligne {row_num}: Champs requis manquants")
-                        continue
-                    
-                    def clean_float(val):
-                        if not val: return 0.0
-                        return float(str(val).replace(',', '.').strip())
 
-                    # Créer ou mettre à jour l'article
-                    article, created = Article.objects.update_or_create(
-                        code_barres=row.get('Code-barres', '').strip(),
-                        defaults={
-                            'nom': row.get('Nom', '').strip(),
-                            'description': row.get('Description', '').strip(),
-                            'prix_HT': clean_float(row.get('Prix HT', 0)),
-                            'prix_TTC': clean_float(row.get('Prix TTC', 0)),
-                            'taux_tva': clean_float(row.get('TVA', 5.5)) / 100,
-                            'categorie': row.get('Catégorie', 'Epicerie').strip(),
-                            'unite_mesure': row.get('Unité', 'Unite').strip(),
-                            'stock_actuel': int(float(str(row.get('Stock actuel', 0)).replace(',', '.'))),
-                            'stock_minimum': int(float(str(row.get('Stock minimum', 5)).replace(',', '.'))),
-                            'actif': row.get('Actif', 'Oui').strip().lower() in ['oui', 'yes', '1', 'true', 'active'],
-                        }
-                    )
-                    imported_count += 1
-                    
-                except (ValueError, KeyError) as e:
-                    errors.append(f"Ligne {row_num}: Erreur de format - {str(e)}")
-                except Exception as e:
-                    errors.append(f"Ligne {row_num}: {str(e)}")
-            
-            message = f"{imported_count} article(s) importé(s) avec succès"
-            if errors:
-                message += f" (avec {len(errors)} erreur(s))"
-            
-            context = {
-                'success': True,
-                'message': message,
-                'imported_count': imported_count,
-                'errors': errors,
-            }
-            return render(request, 'articles/importer_articles.html', context)
-            
-        except Exception as e:
+        if not csv_file.name.endswith('.csv'):
             return render(request, 'articles/importer_articles.html', {
-                'error': f'Erreur lors de la lecture du fichier: {str(e)}'
+                'error': 'Le fichier doit être au format CSV'
             })
-    
-    return render(request, 'articles/importer_articles.html')
+
+        with transaction.atomic():
+            tache = TacheImport(
+                nom_fichier=csv_file.name[:255],
+                taille=csv_file.size,
+                cree_par=request.user,
+            )
+            tache.fichier.save(csv_file.name, csv_file, save=False)
+            tache.save()
+            jobs.submit(tache)
+        return redirect(f"{reverse('articles:importer_articles')}?{urlencode({'tache': tache.pk})}")
+
+    context = {}
+    tache_id = request.GET.get('tache')
+    if tache_id and tache_id.isdigit():
+        context['tache'] = TacheImport.objects.filter(pk=tache_id).first()
+    return render(request, 'articles/importer_articles.html', context)
+
+
+@login_required
+@gestionnaire_required
+@require_GET
+def import_progress(request, pk):
+    """Avancement d'un import en arrière-plan (JSON, interrogé par la page d'import)"""
+    tache = get_object_or_404(TacheImport, pk=pk)
+    if jobs.is_stale(tache):
+        # Import arrêté en cours de route (redémarrage) : relancé plutôt qu'attendu indéfiniment.
+        jobs.resume(tache)
+        tache.refresh_from_db()
+    return JsonResponse({
+        'id': tache.pk,
+        'statut': tache.statut,
+        'statut_display': tache.get_statut_display(),
+        'termine': tache.termine,
+        'progression': tache.progression,
+        'lignes_lues': tache.lignes_lues,
+        'lignes_importees': tache.lignes_importees,
+        'nb_erreurs': tache.nb_erreurs,
+        'erreurs': tache.erreurs,
+        'message': tache.message,
+    })
 
 
 @login_required
 @gestionnaire_required
 def export_articles(request):
-    """Exporte les articles en CSV"""
-    import csv
-    from django.http import HttpResponse
-    
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    """Exporte les articles en CSV, envoyé au fil de la lecture"""
+    response = StreamingHttpResponse(iter_csv(), content_type='text/csv; charset=utf-8')
     response['Content-Disposition'] = 'attachment; filename="articles.csv"'
-    response.write('\ufeff')  # BOM pour Excel
-    
-    writer = csv.writer(response)
-    writer.writerow([
-        'Code-barres', 'Nom', 'Description', 'Prix HT', 'Prix TTC',
-        'TVA', 'Catégorie', 'Unité', 'Stock actuel', 'Stock minimum', 'Actif'
-    ])
-    
-    for article in Article.objects.all():
-        writer.writerow([
-            article.code_barres,
-            article.nom,
-            article.description,
-            article.prix_HT,
-            article.prix_TTC,
-            article.taux_tva,
-            article.get_categorie_display(),
-            article.get_unite_mesure_display(),
-            article.stock_actuel,
-            article.stock_minimum,
-            'Oui' if article.actif else 'Non'
-        ])
-    
     return response
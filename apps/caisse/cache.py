@@ -0,0 +1,74 @@
+"""
+Cache LRU en mémoire des articles recherchés par code-barres.
+
+Chaque processus possède son propre cache : il est invalidé par les signaux
+de sauvegarde/suppression d'Article et après chaque encaissement, et la
+durée de vie des entrées borne l'écart entre processus.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+BARCODE_CACHE_SIZE = 4096
+BARCODE_CACHE_TTL = 60  # secondes
+
+
+class ArticleLRUCache:
+    """Cache LRU thread-safe code-barres -> article sérialisé"""
+
+    def __init__(self, maxsize=BARCODE_CACHE_SIZE, ttl=BARCODE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._codes_by_id = {}
+        self._lock = threading.Lock()
+
+    def get(self, code_barres):
+        with self._lock:
+            entry = self._entries.get(code_barres)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.monotonic():
+                self._discard(code_barres)
+                return None
+            self._entries.move_to_end(code_barres)
+            return payload
+
+    def set(self, code_barres, payload):
+        with self._lock:
+            self._discard(code_barres)
+            self._entries[code_barres] = (time.monotonic() + self.ttl, payload)
+            self._codes_by_id[payload["id"]] = code_barres
+            while len(self._entries) > self.maxsize:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate(self, article_id=None, code_barres=None):
+        """Retire l'article du cache, par id et/ou par code-barres"""
+        with self._lock:
+            if article_id is not None:
+                cached_code = self._codes_by_id.get(article_id)
+                if cached_code is not None:
+                    self._discard(cached_code)
+            if code_barres is not None:
+                self._discard(code_barres)
+
+    def invalidate_many(self, article_ids):
+        for article_id in article_ids:
+            self.invalidate(article_id=article_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._codes_by_id.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _discard(self, code_barres):
+        entry = self._entries.pop(code_barres, None)
+        if entry is not None:
+            self._codes_by_id.pop(entry[1]["id"], None)
+
+
+barcode_cache = ArticleLRUCache()
@@ -0,0 +1,101 @@
+"""
+Instantané versionné du catalogue pour les caisses hors ligne.
+
+La version est l'horodatage (en microsecondes) de la dernière modification
+d'article ou de la dernière suppression. Une caisse qui connaît une version
+ne reçoit que les articles modifiés depuis, plus les id supprimés.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Max
+from django.utils import timezone
+
+from facturation.models import Article
+from .models import ArticleSupprime
+
+CATALOGUE_FIELDS = ["id", "code_barres", "nom", "prix_ttc", "prix_ht", "tva_rate", "stock", "actif"]
+
+# Marge couvrant les transactions validées après la lecture de la version.
+CATALOGUE_DELTA_OVERLAP = timedelta(seconds=5)
+
+# Au-delà, les suppressions ne sont plus connues : instantané complet.
+TOMBSTONE_RETENTION = timedelta(days=30)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def to_version(moment):
+    if moment is None:
+        return 0
+    delta = moment - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def from_version(version):
+    return EPOCH + timedelta(microseconds=version)
+
+
+def parse_version(raw):
+    try:
+        version = int(raw)
+    except (TypeError, ValueError):
+        return None
+    return version if version > 0 else None
+
+
+def current_version():
+    last_change = Article.objects.aggregate(last=Max("date_modification"))["last"]
+    last_delete = ArticleSupprime.objects.aggregate(last=Max("date_suppression"))["last"]
+    return max(to_version(last_change), to_version(last_delete))
+
+
+def _serialize_rows(queryset):
+    return [
+        [
+            article_id,
+            code_barres,
+            nom,
+            float(prix_ttc),
+            float(prix_ht),
+            float(taux_tva) * 100,
+            stock,
+            actif,
+        ]
+        for article_id, code_barres, nom, prix_ttc, prix_ht, taux_tva, stock, actif in queryset.values_list(
+            "id", "code_barres", "nom", "prix_TTC", "prix_HT", "taux_TVA", "stock_actuel", "actif"
+        ).iterator(chunk_size=2000)
+    ]
+
+
+def build_snapshot(since=None, version=None):
+    """
+    Construit l'instantané (complet si `since` est absent ou trop ancien)
+    ou le delta des articles modifiés/supprimés depuis `since`.
+    """
+    if version is None:
+        version = current_version()
+    horizon = timezone.now() - TOMBSTONE_RETENTION
+    full = since is None or since > version or from_version(since) < horizon
+
+    if full:
+        ArticleSupprime.objects.filter(date_suppression__lt=horizon).delete()
+        rows = _serialize_rows(Article.objects.filter(actif=True).order_by("id"))
+        removed = []
+    else:
+        changed_since = from_version(since) - CATALOGUE_DELTA_OVERLAP
+        rows = _serialize_rows(
+            Article.objects.filter(date_modification__gt=changed_since).order_by("id")
+        )
+        removed = list(
+            ArticleSupprime.objects.filter(date_suppression__gt=changed_since)
+            .values_list("article_id", flat=True)
+        )
+
+    return {
+        "version": version,
+        "full": full,
+        "fields": CATALOGUE_FIELDS,
+        "articles": rows,
+        "removed": removed,
+        "total": Article.objects.filter(actif=True).count(),
+    }
@@ -0,0 +1,73 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.caisse.services import CheckoutService
+from facturation.models import Article, Client
+
+
+class Command(BaseCommand):
+    help = "Mesure la latence d'encaissement en fonction de la taille du panier"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='1,5,10,25,50,100',
+            help='Tailles de panier à mesurer, séparées par des virgules',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Nombre de factures créées par taille de panier',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted({int(size) for size in options['sizes'].split(',') if size.strip()})
+        except ValueError:
+            raise CommandError('--sizes doit être une liste d\'entiers')
+        if not sizes or sizes[0] <= 0:
+            raise CommandError('--sizes doit contenir des tailles positives')
+        repeat = max(1, options['repeat'])
+
+        # Tout est fait dans une transaction annulée : la base n'est pas modifiée.
+        with transaction.atomic():
+            articles = Article.objects.bulk_create([
+                Article(
+                    code_barres=f'BENCH{i:08d}',
+                    nom=f'Article bench {i}',
+                    prix_HT=Decimal('100.00'),
+                    prix_TTC=Decimal('119.25'),
+                    taux_TVA=Decimal('0.1925'),
+                    stock_actuel=10 ** 6,
+                    stock_minimum=0,
+                )
+                for i in range(sizes[-1])
+            ])
+            client = Client.objects.create(nom='Client bench', type='anonyme')
+
+            self.stdout.write(f"{'panier':>8} {'médiane ms':>12} {'p95 ms':>10} {'requêtes':>10}")
+            for size in sizes:
+                items = [{'article_id': article.id, 'quantite': 1} for article in articles[:size]]
+                timings = []
+                queries = 0
+                for _ in range(repeat):
+                    with CaptureQueriesContext(connection) as ctx:
+                        started = time.perf_counter()
+                        CheckoutService.create_facture(items, client=client, caissier=None)
+                        timings.append((time.perf_counter() - started) * 1000)
+                    queries = len(ctx.captured_queries)
+                timings.sort()
+                p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                self.stdout.write(
+                    f'{size:>8} {statistics.median(timings):>12.2f} {p95:>10.2f} {queries:>10}'
+                )
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Benchmark terminé (données annulées)'))
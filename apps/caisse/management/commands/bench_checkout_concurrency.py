@@ -0,0 +1,115 @@
+import random
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.caisse.services import CheckoutService
+from facturation.models import Article, Client, Facture
+
+CODE_PREFIX = 'BENCHC'
+
+
+def _percentile(sorted_values, ratio):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(ratio * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Simule plusieurs caisses vendant en parallèle un catalogue partagé "
+        "et mesure débit, latence et reprises de transaction"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--registers', type=int, default=8, help='Nombre de caisses simultanées')
+        parser.add_argument('--sales', type=int, default=50, help='Ventes par caisse')
+        parser.add_argument('--catalogue', type=int, default=20, help="Nombre d'articles du catalogue chaud")
+        parser.add_argument('--basket', type=int, default=5, help="Nombre d'articles par panier")
+        parser.add_argument('--keep', action='store_true', help='Conserver les données générées')
+
+    def handle(self, *args, **options):
+        registers = options['registers']
+        sales = options['sales']
+        catalogue_size = options['catalogue']
+        basket = options['basket']
+        if min(registers, sales, catalogue_size, basket) <= 0:
+            raise CommandError('Tous les paramètres doivent être positifs')
+        if basket > catalogue_size:
+            raise CommandError('--basket ne peut pas dépasser --catalogue')
+
+        Article.objects.filter(code_barres__startswith=CODE_PREFIX).delete()
+        Article.objects.bulk_create([
+            Article(
+                code_barres=f'{CODE_PREFIX}{i:07d}',
+                nom=f'Article concurrence {i}',
+                prix_HT=Decimal('100.00'),
+                prix_TTC=Decimal('119.25'),
+                taux_TVA=Decimal('0.1925'),
+                stock_actuel=registers * sales * basket,
+                stock_minimum=0,
+            )
+            for i in range(catalogue_size)
+        ])
+        article_ids = list(
+            Article.objects.filter(code_barres__startswith=CODE_PREFIX).values_list('id', flat=True)
+        )
+        client = Client.objects.create(nom='Client concurrence', type='anonyme')
+
+        lock = threading.Lock()
+        latencies = []
+        counters = {'retries': 0, 'errors': 0}
+
+        def on_retry(attempt, exc):
+            with lock:
+                counters['retries'] += 1
+
+        def register(seed):
+            rng = random.Random(seed)
+            try:
+                for _ in range(sales):
+                    # Ordre de panier aléatoire : les verrous restent pris par id croissant.
+                    items = [
+                        {'article_id': article_id, 'quantite': 1}
+                        for article_id in rng.sample(article_ids, basket)
+                    ]
+                    started = time.perf_counter()
+                    try:
+                        CheckoutService.create_facture(
+                            items, client=client, caissier=None, on_retry=on_retry
+                        )
+                    except Exception:
+                        with lock:
+                            counters['errors'] += 1
+                        continue
+                    elapsed = (time.perf_counter() - started) * 1000
+                    with lock:
+                        latencies.append(elapsed)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=register, args=(seed,)) for seed in range(registers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - started
+
+        latencies.sort()
+        self.stdout.write(f'Caisses          : {registers}')
+        self.stdout.write(f'Ventes réussies  : {len(latencies)} / {registers * sales}')
+        self.stdout.write(f'Débit            : {len(latencies) / duration:.1f} ventes/s')
+        self.stdout.write(f'Latence p50      : {_percentile(latencies, 0.50):.2f} ms')
+        self.stdout.write(f'Latence p99      : {_percentile(latencies, 0.99):.2f} ms')
+        self.stdout.write(f'Reprises         : {counters["retries"]}')
+        self.stdout.write(f'Échecs           : {counters["errors"]}')
+
+        if not options['keep']:
+            Facture.objects.filter(client=client).delete()
+            client.delete()
+            Article.objects.filter(code_barres__startswith=CODE_PREFIX).delete()
@@ -0,0 +1,206 @@
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client as HttpClient
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from facturation.models import Article, Utilisateur
+from .bench_checkout_concurrency import _percentile
+
+LOGIN = 'charge-caisse'
+ENDPOINTS = ('search_articles', 'create_facture', 'recent_factures')
+
+
+def _parse_target(value):
+    label, _, url = value.partition('=')
+    parts = urlsplit(url)
+    if not label or parts.scheme != 'http' or not parts.hostname:
+        raise CommandError(f'Cible invalide : {value} (attendu LABEL=http://hôte:port)')
+    return label, parts
+
+
+class Register:
+    """Caisse simulée : une connexion HTTP persistante et sa propre session"""
+
+    def __init__(self, target, cookie, csrf_token, rng):
+        self.target = target
+        self.headers = {'Cookie': cookie, 'X-CSRFToken': csrf_token}
+        self.rng = rng
+        self.connection = None
+        self.timings = []
+
+    def request(self, endpoint, method, path, body=None):
+        headers = dict(self.headers)
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(self.target.hostname, self.target.port or 80, timeout=30)
+        started = time.perf_counter()
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+            ok = response.status == 200
+        except (OSError, http.client.HTTPException):
+            # Connexion fermée par le serveur : rouverte à la requête suivante.
+            self.connection.close()
+            self.connection = None
+            ok = False
+        self.timings.append((endpoint, (time.perf_counter() - started) * 1000, ok))
+        return ok
+
+    def run(self, deadline, articles, queries, basket, think):
+        """Passages en caisse jusqu'à `deadline` : recherches, encaissement, dernières factures"""
+        search_path = reverse('caisse:search_articles')
+        try:
+            while time.perf_counter() < deadline:
+                for query in self.rng.sample(queries, 2):
+                    self.request('search_articles', 'GET', f"{search_path}?{urlencode({'q': query})}")
+                items = [{'article_id': article_id, 'quantite': 1} for article_id in self.rng.sample(articles, basket)]
+                self.request('create_facture', 'POST', reverse('caisse:create_facture'), {'items': items})
+                self.request('recent_factures', 'GET', reverse('caisse:recent_factures'))
+                if think:
+                    time.sleep(think / 1000)
+        finally:
+            if self.connection is not None:
+                self.connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Test de charge des caisses contre des serveurs déjà lancés (par exemple uvicorn sur "
+        "facturation.asgi et gunicorn sur facturation.wsgi) : débit et latence par nombre de "
+        "caisses simultanées. Les ventes sont réellement enregistrées : base de test uniquement"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target',
+            action='append',
+            required=True,
+            help='Serveur testé, LABEL=http://hôte:port (répétable : asgi=... --target wsgi=...)',
+        )
+        parser.add_argument(
+            '--registers', default='8,32', help='Nombres de caisses simultanées, séparés par des virgules (défaut 8,32)'
+        )
+        parser.add_argument('--duration', type=float, default=15, help='Durée de chaque palier en secondes (défaut 15)')
+        parser.add_argument('--basket', type=int, default=3, help="Articles par panier (défaut 3)")
+        parser.add_argument('--think', type=float, default=0, help='Pause entre deux passages, en ms (défaut 0)')
+        parser.add_argument('--output', help='Fichier JSON des résultats')
+
+    def handle(self, *args, **options):
+        targets = [_parse_target(value) for value in options['target']]
+        try:
+            levels = [int(value) for value in options['registers'].split(',')]
+        except ValueError:
+            raise CommandError('--registers : liste d\'entiers attendue, par exemple 8,32')
+        if min(levels) <= 0 or options['duration'] <= 0 or options['basket'] <= 0:
+            raise CommandError('Tous les paramètres doivent être positifs')
+
+        # Les articles les mieux approvisionnés : le stock ne s'épuise pas pendant le test.
+        articles = list(
+            Article.objects.filter(actif=True, stock_actuel__gt=0)
+            .order_by('-stock_actuel')
+            .values_list('id', 'nom')[:300]
+        )
+        if len(articles) < options['basket']:
+            raise CommandError('Pas assez d\'articles en stock : générer des données avec la commande seed_load')
+        queries = sorted({nom.split()[0][:4] for _, nom in articles if nom.split()})
+        if len(queries) < 2:
+            queries = [nom[:4] for _, nom in articles[:2]]
+        article_ids = [article_id for article_id, _ in articles]
+
+        user = Utilisateur.objects.filter(login=LOGIN).first()
+        if user is None:
+            user = Utilisateur.objects.create_user(login=LOGIN, role='Caissier')
+
+        results = []
+        for label, target in targets:
+            for level in levels:
+                registers = [
+                    Register(target, *self._session(user), random.Random(seed)) for seed in range(level)
+                ]
+                if not registers[0].request('search_articles', 'GET', reverse('caisse:search_articles')):
+                    raise CommandError(
+                        f'{label} : recherche refusée ou serveur injoignable '
+                        '(le serveur doit utiliser la même base et le même moteur de sessions)'
+                    )
+                registers[0].timings.clear()
+
+                deadline = time.perf_counter() + options['duration']
+                threads = [
+                    threading.Thread(
+                        target=register.run,
+                        args=(deadline, article_ids, queries, options['basket'], options['think']),
+                    )
+                    for register in registers
+                ]
+                started = time.perf_counter()
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                duration = time.perf_counter() - started
+
+                row = self._summarize(label, level, duration, [t for r in registers for t in r.timings])
+                results.append(row)
+                self._write_row(row)
+
+        if len(targets) > 1:
+            self._compare(results, [label for label, _ in targets], levels)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump({'duree_palier_s': options['duration'], 'resultats': results}, output, indent=2)
+            self.stdout.write(f"Résultats écrits dans {options['output']}")
+
+    def _session(self, user):
+        """Cookie de session (partagé avec le serveur par la base) et jeton CSRF d'une caisse"""
+        client = HttpClient()
+        client.force_login(user)
+        csrf_token = get_random_string(32)
+        session = client.cookies[settings.SESSION_COOKIE_NAME].value
+        return f'{settings.SESSION_COOKIE_NAME}={session}; {settings.CSRF_COOKIE_NAME}={csrf_token}', csrf_token
+
+    def _summarize(self, label, level, duration, timings):
+        row = {'cible': label, 'caisses': level, 'duree_s': round(duration, 2), 'erreurs': 0}
+        for endpoint in ENDPOINTS:
+            latencies = sorted(ms for name, ms, ok in timings if name == endpoint and ok)
+            row['erreurs'] += sum(1 for name, _, ok in timings if name == endpoint and not ok)
+            row[endpoint] = {
+                'requetes': len(latencies),
+                'p50_ms': round(_percentile(latencies, 0.50), 2),
+                'p95_ms': round(_percentile(latencies, 0.95), 2),
+            }
+        row['requetes_s'] = round(sum(row[endpoint]['requetes'] for endpoint in ENDPOINTS) / duration, 1)
+        row['ventes_s'] = round(row['create_facture']['requetes'] / duration, 1)
+        return row
+
+    def _write_row(self, row):
+        self.stdout.write(
+            f"{row['cible']:<8} {row['caisses']:>4} caisses : {row['ventes_s']:>7.1f} ventes/s, "
+            f"{row['requetes_s']:>7.1f} requêtes/s, {row['erreurs']} erreur(s)"
+        )
+        for endpoint in ENDPOINTS:
+            stats = row[endpoint]
+            self.stdout.write(
+                f"    {endpoint:<16} p50 {stats['p50_ms']:>8.1f} ms   p95 {stats['p95_ms']:>8.1f} ms"
+            )
+
+    def _compare(self, results, labels, levels):
+        """Débit et p95 de l'encaissement de chaque cible, palier par palier"""
+        self.stdout.write('Comparaison (ventes/s, p95 encaissement) :')
+        by_key = {(row['cible'], row['caisses']): row for row in results}
+        for level in levels:
+            cells = []
+            for label in labels:
+                row = by_key[(label, level)]
+                cells.append(f"{label} {row['ventes_s']:.1f}/s {row['create_facture']['p95_ms']:.0f} ms")
+            self.stdout.write(f"{level:>4} caisses : " + '  |  '.join(cells))
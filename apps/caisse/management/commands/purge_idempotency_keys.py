@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from apps.caisse.services import IDEMPOTENCY_KEY_TTL, CheckoutService
+
+
+class Command(BaseCommand):
+    help = "Supprime les clés d'idempotence de facture expirées"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=int(IDEMPOTENCY_KEY_TTL.total_seconds() // 3600),
+            help='Durée de conservation des clés, en heures',
+        )
+
+    def handle(self, *args, **options):
+        deleted = CheckoutService.purge_idempotency_keys(timedelta(hours=options['hours']))
+        self.stdout.write(self.style.SUCCESS(f"{deleted} clé(s) d'idempotence supprimée(s)"))
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('caisse', '0001_initial'),
+        ('facturation', '0010_article_date_modification_facture_reference_caisse'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CleIdempotence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cle', models.CharField(max_length=64, unique=True)),
+                ('empreinte', models.CharField(help_text='SHA-256 du contenu de la requête', max_length=64)),
+                ('date_creation', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('facture', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='facturation.facture')),
+            ],
+            options={
+                'verbose_name': "Clé d'idempotence",
+                'verbose_name_plural': "Clés d'idempotence",
+            },
+        ),
+    ]
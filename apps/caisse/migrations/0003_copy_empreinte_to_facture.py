@@ -0,0 +1,26 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:02
+
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def copy_empreinte(apps, schema_editor):
+    # Clés encore présentes : leur empreinte est recopiée sur la facture.
+    CleIdempotence = apps.get_model('caisse', 'CleIdempotence')
+    Facture = apps.get_model('facturation', 'Facture')
+    empreinte = CleIdempotence.objects.filter(facture_id=OuterRef('pk')).values('empreinte')[:1]
+    Facture.objects.filter(
+        pk__in=CleIdempotence.objects.values('facture_id'),
+    ).update(empreinte_caisse=Subquery(empreinte))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('caisse', '0002_cleidempotence'),
+        ('facturation', '0014_facture_empreinte_caisse'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_empreinte, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+from django.db import models
+
+
+class ArticleSupprime(models.Model):
+    """Trace d'un article supprimé, transmise aux caisses lors de la synchronisation"""
+
+    article_id = models.BigIntegerField()
+    date_suppression = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Article supprimé"
+        verbose_name_plural = "Articles supprimés"
+
+    def __str__(self):
+        return f"Article {self.article_id} supprimé"
+
+
+class CleIdempotence(models.Model):
+    """Clé d'idempotence d'une création de facture (en-tête Idempotency-Key)"""
+
+    cle = models.CharField(max_length=64, unique=True)
+    empreinte = models.CharField(max_length=64, help_text="SHA-256 du contenu de la requête")
+    facture = models.ForeignKey("facturation.Facture", on_delete=models.CASCADE, related_name="+")
+    date_creation = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Clé d'idempotence"
+        verbose_name_plural = "Clés d'idempotence"
+
+    def __str__(self):
+        return self.cle
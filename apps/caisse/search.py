@@ -0,0 +1,47 @@
+"""
+Recherche d'articles pour la caisse.
+
+Sur PostgreSQL, la recherche s'appuie sur les index GIN pg_trgm créés par
+la migration facturation 0009 : le filtre icontains (UPPER(col) LIKE ...)
+et l'opérateur de similarité % sont servis par index, et les résultats sont
+classés par similarité. Sur les autres bases, on conserve le filtre
+icontains d'origine.
+"""
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import Q
+from django.db.models.functions import Greatest
+
+from facturation.models import Article
+
+SEARCH_LIMIT = 50
+
+# En dessous de cette longueur, un terme ne contient aucun trigramme complet.
+MIN_TRIGRAM_LENGTH = 3
+
+SEARCH_FIELDS = ("id", "nom", "code_barres", "prix_TTC", "prix_HT", "taux_TVA", "stock_actuel")
+
+
+def search_articles(query, limit=SEARCH_LIMIT):
+    """Retourne au plus `limit` articles actifs correspondant à la recherche"""
+    articles = Article.objects.filter(actif=True).only(*SEARCH_FIELDS)
+    query = (query or "").strip()
+    if not query:
+        return articles[:limit]
+
+    matches = Q(nom__icontains=query) | Q(code_barres__icontains=query)
+    if connection.vendor != "postgresql":
+        return articles.filter(matches)[:limit]
+
+    if len(query) >= MIN_TRIGRAM_LENGTH:
+        matches |= Q(nom__trigram_similar=query)
+    return (
+        articles.filter(matches)
+        .annotate(
+            similarity=Greatest(
+                TrigramSimilarity("nom", query),
+                TrigramSimilarity("code_barres", query),
+            )
+        )
+        .order_by("-similarity", "nom")[:limit]
+    )
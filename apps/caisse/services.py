@@ -0,0 +1,295 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from facturation.models import Article, DetailFacture, Facture
+from apps.articles import cache as article_statistics
+from apps.clients import metrics as client_metrics
+from apps.report import rollups
+from .cache import barcode_cache
+from .models import CleIdempotence
+
+CENT = Decimal("0.01")
+
+# Nombre maximal d'articles traités par UPDATE de stock (taille du CASE).
+STOCK_UPDATE_BATCH_SIZE = 200
+
+# Reprise des transactions en conflit (sérialisation / interblocage).
+RETRYABLE_SQLSTATES = {"40001", "40P01"}
+CHECKOUT_MAX_ATTEMPTS = 4
+CHECKOUT_BACKOFF_BASE = 0.02  # secondes
+CHECKOUT_BACKOFF_MAX = 0.5
+
+# Durée de conservation des clés d'idempotence (purge_idempotency_keys).
+IDEMPOTENCY_KEY_TTL = timedelta(hours=48)
+
+
+class CheckoutError(Exception):
+    """Erreur métier d'encaissement, renvoyée telle quelle au client."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def is_retryable_error(exc):
+    """Indique si l'erreur base de données peut être résolue en rejouant la transaction"""
+    cause = exc.__cause__
+    sqlstate = getattr(cause, "sqlstate", None) or getattr(cause, "pgcode", None)
+    if sqlstate in RETRYABLE_SQLSTATES:
+        return True
+    # SQLite : base verrouillée par une autre connexion
+    return "database is locked" in str(exc)
+
+
+def run_with_retry(func, max_attempts=CHECKOUT_MAX_ATTEMPTS, on_retry=None):
+    """
+    Exécute func et la rejoue sur erreur de sérialisation ou d'interblocage,
+    avec un délai exponentiel borné et aléatoire entre deux tentatives.
+    Aucune reprise n'est tentée dans une transaction englobante.
+    """
+    attempt = 1
+    while True:
+        try:
+            return func()
+        except OperationalError as exc:
+            if (
+                attempt >= max_attempts
+                or connection.in_atomic_block
+                or not is_retryable_error(exc)
+            ):
+                raise
+            delay = min(CHECKOUT_BACKOFF_MAX, CHECKOUT_BACKOFF_BASE * (2 ** (attempt - 1)))
+            if on_retry is not None:
+                on_retry(attempt, exc)
+            time.sleep(random.uniform(delay / 2, delay))
+            attempt += 1
+
+
+class CheckoutService:
+    """Service d'encaissement de la caisse"""
+
+    @staticmethod
+    def parse_items(items):
+        """Valide les lignes du panier et retourne des couples (article_id, quantite)"""
+        lines = []
+        for item in items:
+            article_id = item.get("article_id")
+            quantite = int(item.get("quantite", 0))
+            if not article_id or quantite <= 0:
+                raise CheckoutError("Ligne article invalide")
+            lines.append((int(article_id), quantite))
+        return lines
+
+    @staticmethod
+    def lock_articles(article_ids):
+        """
+        Verrouille en une seule requête les articles du panier.
+        Les verrous sont pris dans l'ordre des id pour que deux caisses
+        vendant les mêmes articles les acquièrent toujours dans le même ordre.
+        """
+        articles = (
+            Article.objects.select_for_update()
+            .filter(id__in=sorted(set(article_ids)), actif=True)
+            .order_by("id")
+        )
+        return {article.id: article for article in articles}
+
+    @staticmethod
+    def decrement_stock(quantities):
+        """
+        Décrémente le stock avec un UPDATE conditionnel par lot :
+        stock_actuel = stock_actuel - qte WHERE stock_actuel >= qte.
+        """
+        article_ids = sorted(quantities)
+        for start in range(0, len(article_ids), STOCK_UPDATE_BATCH_SIZE):
+            batch = article_ids[start:start + STOCK_UPDATE_BATCH_SIZE]
+            guard = Q()
+            whens = []
+            for article_id in batch:
+                quantite = quantities[article_id]
+                guard |= Q(id=article_id, stock_actuel__gte=quantite)
+                whens.append(When(id=article_id, then=Value(quantite)))
+            updated = Article.objects.filter(guard).update(
+                stock_actuel=F("stock_actuel") - Case(*whens, output_field=IntegerField()),
+                date_modification=Now(),
+            )
+            if updated != len(batch):
+                raise CheckoutError("Stock insuffisant pour un ou plusieurs articles")
+
+    @staticmethod
+    def create_facture(
+        items,
+        client,
+        caissier,
+        mode_paiement="especes",
+        remise=None,
+        reference=None,
+        fingerprint="",
+        on_retry=None,
+    ):
+        """
+        Crée la facture et ses lignes, puis décrémente le stock.
+        La transaction est rejouée en cas de conflit avec une autre caisse.
+
+        `reference` est la clé d'idempotence de la requête : si elle est déjà
+        connue, la facture existante est renvoyée sans rien créer. La même
+        clé envoyée avec un autre contenu (`fingerprint`) est refusée.
+        """
+        if reference:
+            existing = CheckoutService.find_by_reference(reference, fingerprint)
+            if existing is not None:
+                return existing
+        try:
+            return run_with_retry(
+                lambda: CheckoutService._create_facture(
+                    items, client, caissier, mode_paiement, remise, reference, fingerprint
+                ),
+                on_retry=on_retry,
+            )
+        except IntegrityError:
+            # Envoi concurrent de la même clé : l'autre requête l'a emporté.
+            existing = CheckoutService.find_by_reference(reference, fingerprint) if reference else None
+            if existing is None:
+                raise
+            return existing
+
+    @staticmethod
+    def find_by_reference(reference, fingerprint=""):
+        """Retourne la facture déjà créée pour cette clé d'idempotence, s'il y en a une"""
+        known = (
+            CleIdempotence.objects.select_related("facture")
+            .filter(cle=reference)
+            .first()
+        )
+        if known is not None:
+            if fingerprint and known.empreinte and known.empreinte != fingerprint:
+                raise CheckoutError(
+                    "Clé d'idempotence déjà utilisée pour une autre facture", status=422
+                )
+            return known.facture
+        # Clé purgée : la référence et l'empreinte restent enregistrées sur la facture.
+        facture = Facture.objects.filter(reference_caisse=reference).first()
+        if facture is not None and fingerprint and facture.empreinte_caisse != fingerprint:
+            # Contenu différent, ou facture antérieure à l'empreinte : rien ne prouve que c'est la même vente.
+            raise CheckoutError(
+                "Clé d'idempotence déjà utilisée pour une autre facture", status=422
+            )
+        return facture
+
+    @staticmethod
+    def purge_idempotency_keys(ttl=IDEMPOTENCY_KEY_TTL):
+        """Supprime les clés d'idempotence plus anciennes que `ttl`"""
+        deleted, _ = CleIdempotence.objects.filter(
+            date_creation__lt=timezone.now() - ttl
+        ).delete()
+        return deleted
+
+    @staticmethod
+    def _create_facture(items, client, caissier, mode_paiement, remise, reference=None, fingerprint=""):
+        """Transaction d'encaissement : le nombre de requêtes ne dépend pas du panier"""
+        lines = CheckoutService.parse_items(items)
+        if not lines:
+            raise CheckoutError("Le panier est vide")
+
+        quantities = {}
+        for article_id, quantite in lines:
+            quantities[article_id] = quantities.get(article_id, 0) + quantite
+
+        remise = remise or {}
+
+        with transaction.atomic():
+            articles = CheckoutService.lock_articles(quantities)
+
+            montant_ht_brut = Decimal("0")
+            montant_tva_brut = Decimal("0")
+            montant_ttc_brut = Decimal("0")
+            detail_rows = []
+
+            for article_id, quantite in lines:
+                article = articles.get(article_id)
+                if article is None:
+                    raise CheckoutError("Article introuvable ou inactif", status=404)
+                if article.stock_actuel < quantities[article_id]:
+                    raise CheckoutError(
+                        f"Stock insuffisant pour {article.nom} (disponible: {article.stock_actuel})"
+                    )
+
+                line_ht = (article.prix_HT * quantite).quantize(CENT)
+                line_ttc = (article.prix_TTC * quantite).quantize(CENT)
+                line_tva = (line_ttc - line_ht).quantize(CENT)
+
+                montant_ht_brut += line_ht
+                montant_tva_brut += line_tva
+                montant_ttc_brut += line_ttc
+
+                detail_rows.append(
+                    {
+                        "article": article,
+                        "quantite": quantite,
+                        "prix_unitaire": article.prix_TTC,
+                        "remise": Decimal("0"),
+                        "total_ligne": line_ttc,
+                        "taux_TVA": article.taux_TVA,
+                    }
+                )
+
+            remise_amount = Decimal(str(remise.get("amount") or "0")).quantize(CENT)
+            if remise_amount < 0:
+                remise_amount = Decimal("0.00")
+            if remise_amount > montant_ttc_brut:
+                remise_amount = montant_ttc_brut
+
+            net_ttc = (montant_ttc_brut - remise_amount).quantize(CENT)
+            ratio = Decimal("1")
+            if montant_ttc_brut > 0:
+                ratio = (net_ttc / montant_ttc_brut)
+
+            montant_ht = (montant_ht_brut * ratio).quantize(CENT)
+            montant_tva = (net_ttc - montant_ht).quantize(CENT)
+
+            facture = Facture.objects.create(
+                montant_HT=montant_ht,
+                montant_TVA=montant_tva,
+                montant_TTC=net_ttc,
+                mode_paiement=mode_paiement,
+                client=client,
+                caissier=caissier,
+                reference_caisse=reference or None,
+                empreinte_caisse=fingerprint if reference else "",
+            )
+
+            if reference:
+                CleIdempotence.objects.create(cle=reference, empreinte=fingerprint, facture=facture)
+
+            DetailFacture.objects.bulk_create(
+                [DetailFacture(facture=facture, **row) for row in detail_rows]
+            )
+            CheckoutService.decrement_stock(quantities)
+            if client.type == "anonyme":
+                # Le client de passage a une seule ligne de statistiques, partagée par
+                # toutes les caisses : mise à jour après validation, hors transaction.
+                transaction.on_commit(lambda: client_metrics.apply_facture(facture))
+            else:
+                client_metrics.apply_facture(facture)
+            # Agrégats journaliers mis à jour en dernier : leurs verrous sont
+            # partagés par toutes les caisses et tenus le moins longtemps possible.
+            rollups.apply_facture(
+                facture,
+                [
+                    (row["article"].id, row["taux_TVA"], row["quantite"], row["total_ligne"])
+                    for row in detail_rows
+                ],
+            )
+            # Le stock change via UPDATE, sans signal : on invalide explicitement.
+            transaction.on_commit(lambda: barcode_cache.invalidate_many(quantities))
+            transaction.on_commit(article_statistics.bump)
+
+        return facture
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from facturation.models import Article
+from .cache import barcode_cache
+from .models import ArticleSupprime
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+def invalidate_article_cache(sender, instance, **kwargs):
+    """Retire l'article du cache code-barres dès qu'il est modifié ou supprimé"""
+    barcode_cache.invalidate(article_id=instance.pk, code_barres=instance.code_barres)
+
+
+@receiver(post_delete, sender=Article)
+def record_article_deletion(sender, instance, **kwargs):
+    """Conserve la suppression pour la synchronisation des caisses hors ligne"""
+    ArticleSupprime.objects.create(article_id=instance.pk)
@@ -2,6 +2,8 @@
 let cart = [];
 let nextItemId = 1;
 let lastSearchResults = []; // Stockage temporaire des derniers résultats de recherche
+let currentReference = null; // Clé d'idempotence du panier en cours d'encaissement
+let clientSuggestions = new Map(); // Libellé proposé -> identifiant du client
 let discount = {
     type: null, // 'percent' | 'amount'
     value: 0,
@@ -13,6 +15,9 @@ document.addEventListener('DOMContentLoaded', function () {
     setupEventListeners();
     setupKeyboardShortcuts();
     updateCart();
+    if (window.CaisseOffline) {
+        window.CaisseOffline.init({ onFactureResult: onQueuedFactureResult }).then(refreshRejectedButton);
+    }
 });
 
 // Event Listeners
@@ -42,6 +47,14 @@ function setupEventListeners() {
         searchArticles(e.target.value);
     }, 300));
 
+    // Suggestions de clients existants pendant la saisie du nom
+    const clientNameInput = document.getElementById('clientNameInput');
+    if (clientNameInput) {
+        clientNameInput.addEventListener('input', debounce(function (e) {
+            searchClients(e.target.value);
+        }, 300));
+    }
+
     ['searchModal', 'receiptModal', 'historyModal', 'discountModal'].forEach((id) => {
         const modal = document.getElementById(id);
         if (!modal) return;
@@ -111,12 +124,44 @@ function getCSRFToken() {
 /**
  * Recherche un article par son code-barres via l'API Django.
  * Utilisé lors d'un scan direct ou d'une saisie manuelle rapide.
+ * Le code scanné est d'abord cherché de façon exacte (index unique) ;
+ * une saisie partielle retombe sur la recherche texte.
  */
 function searchArticleByBarcode(barcode) {
+    barcode = (barcode || '').trim();
     if (!barcode) return;
 
-    // Appel asynchrone au backend
-    fetch(`/caisse/api/search/?q=${barcode}`)
+    // Catalogue local (mode hors ligne) : aucun aller-retour serveur
+    const localArticle = window.CaisseOffline ? window.CaisseOffline.findByBarcode(barcode) : null;
+    if (localArticle) {
+        addToCart(localArticle);
+        return;
+    }
+
+    // Appel asynchrone au backend : recherche exacte
+    fetch(`/caisse/api/article/${encodeURIComponent(barcode)}/`)
+        .then(response => {
+            if (response.status === 404) return null;
+            return response.json();
+        })
+        .then(data => {
+            if (data && data.article) {
+                addToCart(data.article);
+                return;
+            }
+            searchArticleByText(barcode);
+        })
+        .catch(error => console.error('Erreur lors de la recherche:', error));
+}
+
+function searchArticleByText(query) {
+    const localResults = window.CaisseOffline ? window.CaisseOffline.search(query) : null;
+    if (localResults && localResults.length > 0) {
+        addToCart(localResults[0]);
+        return;
+    }
+
+    fetch(`/caisse/api/search/?q=${encodeURIComponent(query)}`)
         .then(response => response.json())
         .then(data => {
             if (data.articles && data.articles.length > 0) {
@@ -134,19 +179,16 @@ function searchArticleByBarcode(barcode) {
 
 // Search articles (modal)
 function searchArticles(query) {
-    // Si vide, charger tous les articles
-    if (!query || query.length === 0) {
-        fetch(`/caisse/api/search/?q=`)
-            .then(response => response.json())
-            .then(data => {
-                lastSearchResults = data.articles;
-                displaySearchResults(data.articles);
-            })
-            .catch(error => console.error('Erreur:', error));
+    // Catalogue local disponible : recherche instantanée
+    const localResults = window.CaisseOffline ? window.CaisseOffline.search(query) : null;
+    if (localResults) {
+        lastSearchResults = localResults;
+        displaySearchResults(localResults);
         return;
     }
 
-    fetch(`/caisse/api/search/?q=${query}`)
+    // Si vide, le serveur renvoie tous les articles
+    fetch(`/caisse/api/search/?q=${encodeURIComponent(query || '')}`)
         .then(response => response.json())
         .then(data => {
             lastSearchResults = data.articles;
@@ -254,6 +296,9 @@ function computeDiscountAmount(totalTTC) {
 
 // Update cart display
 function updateCart() {
+    // Panier modifié : un nouvel encaissement aura une nouvelle clé
+    currentReference = null;
+
     const cartItemsContainer = document.getElementById('cartItems');
     const emptyCart = document.getElementById('emptyCart');
     const cartTitle = document.getElementById('cartTitle');
@@ -489,12 +534,40 @@ function closeReceiptModal() {
     document.getElementById('receiptModal').classList.add('hidden');
     // Clear client name input for next transaction
     document.getElementById('clientNameInput').value = '';
+    clientSuggestions = new Map();
+}
+
+/**
+ * Propose les clients existants correspondant au nom saisi (liste datalist).
+ * Un client choisi dans la liste est envoyé par son identifiant.
+ */
+function searchClients(query) {
+    const list = document.getElementById('clientSuggestions');
+    if (!list || query.trim().length < 2) return;
+
+    fetch(`/caisse/api/clients/?q=${encodeURIComponent(query)}`)
+        .then(response => response.json())
+        .then(data => {
+            clientSuggestions = new Map(data.clients.map(client => [client.label, client.id]));
+            list.innerHTML = '';
+            data.clients.forEach(client => {
+                const option = document.createElement('option');
+                option.value = client.label;
+                list.appendChild(option);
+            });
+        })
+        .catch(error => console.error('Erreur recherche clients:', error));
 }
 
 function printReceipt() {
     window.print();
 }
 
+function newFactureReference() {
+    if (window.crypto && window.crypto.randomUUID) return window.crypto.randomUUID();
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+}
+
 /**
  * ACTION FINALE : Enregistrement de la vente.
  * Envoie le contenu du panier au serveur pour créer une Facture officielle
@@ -510,8 +583,12 @@ function finishTransaction() {
     // Récupérer le mode de paiement sélectionné
     const paymentMethod = document.getElementById('paymentMethod').value;
 
+    // Un second clic sur le même panier réutilise la même clé
+    if (!currentReference) currentReference = newFactureReference();
+
     // Préparation des données pour le serveur
     const data = {
+        reference: currentReference, // Rend l'envoi rejouable sans doublon
         items: cart.map(item => ({
             article_id: item.article_id,
             quantite: item.quantite,
@@ -519,6 +596,7 @@ function finishTransaction() {
             total: item.total
         })),
         client_name: clientName,  // Nom du client (peut être vide pour anonyme)
+        client_id: clientSuggestions.get(clientName) || null, // Client choisi dans les suggestions
         mode_paiement: paymentMethod // Mode de paiement sélectionné
         ,
         remise: {
@@ -528,17 +606,95 @@ function finishTransaction() {
         }
     };
 
+    // Caisse hors ligne : la vente est mise en file puis envoyée en arrière-plan
+    if (!navigator.onLine && canQueueFacture()) {
+        queueFacture(data);
+        return;
+    }
+
+    sendFacture(data);
+}
+
+function canQueueFacture() {
+    return Boolean(window.CaisseOffline && window.CaisseOffline.isReady());
+}
+
+/**
+ * Met la vente en file d'attente locale (réseau indisponible). Elle garde sa
+ * référence : si le serveur l'a reçue malgré la coupure, le renvoi ne crée
+ * pas de doublon.
+ */
+function queueFacture(data) {
+    window.CaisseOffline.enqueueFacture(data)
+        .then(() => {
+            if (window.AppNotify) {
+                window.AppNotify.success('Vente enregistree hors ligne, envoi au retour du reseau');
+            }
+            clearCart();
+            closeReceiptModal();
+        })
+        .catch(() => {
+            if (window.AppNotify) {
+                window.AppNotify.error('Impossible d\'enregistrer la vente hors ligne.');
+            }
+        });
+}
+
+const FACTURE_TIMEOUT_MS = 8000;
+const FACTURE_MAX_ATTEMPTS = 3;
+
+/**
+ * Envoie la facture avec sa clé d'idempotence. En cas de délai dépassé ou
+ * d'erreur réseau, la même requête est renvoyée : le serveur ne crée
+ * jamais deux factures pour une même clé.
+ */
+async function postFacture(data, attempt = 1) {
+    const controller = new AbortController();
+    const timer = setTimeout(() => controller.abort(), FACTURE_TIMEOUT_MS);
+    try {
+        const response = await fetch('/caisse/api/facture/create/', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': getCSRFToken(), // Protection contre les attaques CSRF
+                'Idempotency-Key': data.reference
+            },
+            body: JSON.stringify(data), // Conversion de l'objet JS en texte (JSON)
+            signal: controller.signal
+        });
+        if (response.status === 503 && attempt < FACTURE_MAX_ATTEMPTS) {
+            return postFacture(data, attempt + 1);
+        }
+        return response;
+    } catch (error) {
+        if (attempt < FACTURE_MAX_ATTEMPTS) {
+            await new Promise(resolve => setTimeout(resolve, 250 * attempt));
+            return postFacture(data, attempt + 1);
+        }
+        throw error;
+    } finally {
+        clearTimeout(timer);
+    }
+}
+
+/**
+ * Envoi direct de la facture au serveur. La file d'attente locale ne sert
+ * qu'en cas d'échec réseau : un refus du serveur laisse le panier intact.
+ */
+function sendFacture(payload) {
     // Envoi de la requête POST au serveur Django
-    fetch('/caisse/api/facture/create/', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-            'X-CSRFToken': getCSRFToken() // Protection contre les attaques CSRF
-        },
-        body: JSON.stringify(data) // Conversion de l'objet JS en texte (JSON)
-    })
-        .then(response => response.json())
+    postFacture(payload)
+        .catch(error => {
+            // Serveur injoignable : la vente part dans la file d'attente locale
+            if (canQueueFacture()) {
+                queueFacture(payload);
+                return null;
+            }
+            throw error;
+        })
+        .then(response => response && response.json().catch(() => ({ error: `HTTP ${response.status}` })))
         .then(data => {
+            if (!data) return;
             if (data.success) {
                 // Si le serveur confirme l'enregistrement (Code 200)
                 if (window.AppNotify) {
@@ -561,6 +717,81 @@ function finishTransaction() {
         });
 }
 
+/**
+ * Résultat de l'envoi d'une facture mise en file par le mode hors ligne.
+ */
+function onQueuedFactureResult(facture, success, data) {
+    if (!success) refreshRejectedButton();
+    if (!window.AppNotify) return;
+    if (success) {
+        window.AppNotify.info(`Facture synchronisee: ${data.numero_facture}`);
+    } else {
+        window.AppNotify.error('Vente refusee par le serveur, a traiter: ' + (data.error || 'erreur inconnue'));
+    }
+}
+
+/**
+ * Ventes hors ligne refusées par le serveur : elles restent affichées jusqu'à
+ * ce que le caissier les renvoie (après correction du stock) ou les classe.
+ */
+function refreshRejectedButton() {
+    const button = document.getElementById('rejectedBtn');
+    if (!button || !window.CaisseOffline) return Promise.resolve([]);
+    return window.CaisseOffline.rejectedFactures().then(rejected => {
+        button.classList.toggle('hidden', rejected.length === 0);
+        document.getElementById('rejectedCount').textContent = rejected.length;
+        return rejected;
+    });
+}
+
+function openRejectedModal() {
+    document.getElementById('rejectedModal').classList.remove('hidden');
+    renderRejected();
+}
+
+function closeRejectedModal() {
+    document.getElementById('rejectedModal').classList.add('hidden');
+}
+
+function renderRejected() {
+    const content = document.getElementById('rejectedContent');
+    refreshRejectedButton().then(rejected => {
+        if (!rejected.length) {
+            content.innerHTML = '<p class="text-sm text-slate-500 dark:text-zinc-400">Aucune vente refusee.</p>';
+            return;
+        }
+        content.innerHTML = rejected.map(facture => {
+            const total = facture.items.reduce((sum, item) => sum + Number(item.total || 0), 0);
+            const articles = facture.items.reduce((sum, item) => sum + item.quantite, 0);
+            return `
+                <div class="py-3 flex items-center justify-between gap-4">
+                    <div>
+                        <p class="text-sm font-medium text-slate-900 dark:text-zinc-100">
+                            ${new Date(facture.queued_at).toLocaleString('fr-FR')} · ${articles} article(s) · ${total.toFixed(2)} FCFA
+                        </p>
+                        <p class="text-sm text-red-600">${facture.error}</p>
+                    </div>
+                    <div class="flex gap-2 shrink-0">
+                        <button onclick="retryRejected('${facture.reference}')"
+                            class="px-3 py-2 text-sm rounded-lg btn-primary text-white">Renvoyer</button>
+                        <button onclick="dismissRejected('${facture.reference}')"
+                            class="px-3 py-2 text-sm rounded-lg border border-slate-300 dark:border-zinc-700 hover:bg-slate-50 dark:hover:bg-zinc-800">Classer</button>
+                    </div>
+                </div>
+            `;
+        }).join('');
+    });
+}
+
+function retryRejected(reference) {
+    window.CaisseOffline.retryRejected(reference).then(renderRejected);
+}
+
+function dismissRejected(reference) {
+    if (!confirm('Classer cette vente ? Elle ne sera jamais enregistree sur le serveur.')) return;
+    window.CaisseOffline.dismissRejected(reference).then(renderRejected);
+}
+
 /**
  * Fonction Utilitaire : Debounce
  * Permet de retarder l'exécution d'une fonction (évite de lancer 50 requêtes quand on tape vite).
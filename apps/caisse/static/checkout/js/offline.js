@@ -0,0 +1,309 @@
+/**
+ * Mode hors ligne de la caisse.
+ *
+ * - Le catalogue est copié dans IndexedDB puis tenu à jour par deltas
+ *   (/caisse/api/catalogue/?since=<version>) : la recherche se fait en local.
+ * - Les factures encaissées sans réseau sont placées dans une file d'attente
+ *   locale puis envoyées au serveur avec une référence unique : un renvoi
+ *   après une coupure ne crée jamais de doublon.
+ * - Une facture de la file refusée par le serveur (stock insuffisant, article
+ *   introuvable, clé déjà utilisée) n'est jamais supprimée : elle passe dans
+ *   le magasin « rejetees » jusqu'à ce que le caissier la renvoie ou la classe.
+ */
+const CaisseOffline = (function () {
+    const DB_NAME = 'caisse-plus';
+    const DB_VERSION = 2;
+    const SYNC_INTERVAL_MS = 60000;
+    const FLUSH_INTERVAL_MS = 15000;
+    const SEARCH_LIMIT = 50;
+
+    let db = null;
+    let ready = false;
+    let version = null;
+    let etag = null;
+    let flushing = false;
+    let onFactureResult = null;
+    const articles = new Map();   // id -> article
+    const byBarcode = new Map();  // code-barres -> id
+
+    // --- IndexedDB ---
+
+    function openDb() {
+        return new Promise((resolve, reject) => {
+            if (!('indexedDB' in window)) {
+                reject(new Error('IndexedDB indisponible'));
+                return;
+            }
+            const request = indexedDB.open(DB_NAME, DB_VERSION);
+            request.onupgradeneeded = () => {
+                const database = request.result;
+                const stores = database.objectStoreNames;
+                if (!stores.contains('articles')) database.createObjectStore('articles', { keyPath: 'id' });
+                if (!stores.contains('meta')) database.createObjectStore('meta');
+                if (!stores.contains('factures')) database.createObjectStore('factures', { keyPath: 'reference' });
+                if (!stores.contains('rejetees')) database.createObjectStore('rejetees', { keyPath: 'reference' });
+            };
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    function withStores(names, mode, work) {
+        return new Promise((resolve, reject) => {
+            const transaction = db.transaction(names, mode);
+            const result = work(transaction);
+            transaction.oncomplete = () => resolve(result);
+            transaction.onerror = () => reject(transaction.error);
+            transaction.onabort = () => reject(transaction.error);
+        });
+    }
+
+    function requestResult(request) {
+        return new Promise((resolve, reject) => {
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    // --- Catalogue ---
+
+    function indexArticle(article) {
+        const previous = articles.get(article.id);
+        if (previous) byBarcode.delete(previous.code_barres);
+        articles.set(article.id, article);
+        byBarcode.set(article.code_barres, article.id);
+    }
+
+    function dropArticle(id) {
+        const previous = articles.get(id);
+        if (previous) byBarcode.delete(previous.code_barres);
+        articles.delete(id);
+    }
+
+    async function loadLocalCatalogue() {
+        const [rows, storedVersion] = await withStores(['articles', 'meta'], 'readonly', (transaction) =>
+            Promise.all([
+                requestResult(transaction.objectStore('articles').getAll()),
+                requestResult(transaction.objectStore('meta').get('version')),
+            ])
+        );
+        rows.forEach(indexArticle);
+        version = storedVersion || null;
+    }
+
+    async function syncCatalogue(forceFull = false) {
+        const since = forceFull ? null : version;
+        const url = since ? `/caisse/api/catalogue/?since=${since}` : '/caisse/api/catalogue/';
+        const headers = {};
+        if (etag && !forceFull) headers['If-None-Match'] = etag;
+
+        let response;
+        try {
+            response = await fetch(url, { headers });
+        } catch (error) {
+            return false; // Hors ligne : on garde le catalogue local
+        }
+        if (response.status === 304) return true;
+        if (!response.ok) return false;
+        etag = response.headers.get('ETag');
+        const data = await response.json();
+
+        const changed = data.articles.map((row) => {
+            const article = {};
+            data.fields.forEach((field, index) => { article[field] = row[index]; });
+            return article;
+        });
+
+        if (data.full) {
+            articles.clear();
+            byBarcode.clear();
+        }
+        changed.forEach((article) => (article.actif ? indexArticle(article) : dropArticle(article.id)));
+        data.removed.forEach(dropArticle);
+        version = data.version;
+
+        await withStores(['articles', 'meta'], 'readwrite', (transaction) => {
+            const store = transaction.objectStore('articles');
+            if (data.full) store.clear();
+            changed.forEach((article) => (article.actif ? store.put(article) : store.delete(article.id)));
+            data.removed.forEach((id) => store.delete(id));
+            transaction.objectStore('meta').put(version, 'version');
+        });
+
+        // Copie locale divergente : on repart d'un instantané complet.
+        if (!data.full && articles.size !== data.total) {
+            return syncCatalogue(true);
+        }
+        return true;
+    }
+
+    function normalize(text) {
+        return (text || '').toString().toLowerCase().normalize('NFD').replace(/[\u0300-\u036f]/g, '');
+    }
+
+    function search(query) {
+        if (!ready) return null;
+        const term = normalize(query).trim();
+        const results = [];
+        for (const article of articles.values()) {
+            if (!term || normalize(article.nom).includes(term) || article.code_barres.includes(term)) {
+                results.push(article);
+                if (results.length >= SEARCH_LIMIT) break;
+            }
+        }
+        return results;
+    }
+
+    function findByBarcode(code) {
+        if (!ready) return null;
+        const id = byBarcode.get((code || '').trim());
+        return id ? articles.get(id) : null;
+    }
+
+    // --- File d'attente des factures ---
+
+    function newReference() {
+        if (window.crypto && window.crypto.randomUUID) return window.crypto.randomUUID();
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+    }
+
+    function csrfToken() {
+        const input = document.querySelector('[name=csrfmiddlewaretoken]');
+        return input ? input.value : '';
+    }
+
+    async function enqueueFacture(payload) {
+        const facture = { ...payload, reference: payload.reference || newReference(), queued_at: Date.now() };
+        await withStores(['factures', 'articles'], 'readwrite', (transaction) => {
+            transaction.objectStore('factures').put(facture);
+            // Stock estimé localement jusqu'à la prochaine synchronisation.
+            facture.items.forEach((item) => {
+                const article = articles.get(item.article_id);
+                if (!article) return;
+                article.stock = Math.max(0, article.stock - item.quantite);
+                transaction.objectStore('articles').put(article);
+            });
+        });
+        return facture.reference;
+    }
+
+    async function pendingCount() {
+        if (!db) return 0;
+        return withStores(['factures'], 'readonly', (transaction) =>
+            requestResult(transaction.objectStore('factures').count())
+        );
+    }
+
+    async function rejectedFactures() {
+        if (!db) return [];
+        const rejected = await withStores(['rejetees'], 'readonly', (transaction) =>
+            requestResult(transaction.objectStore('rejetees').getAll())
+        );
+        return rejected.sort((a, b) => a.queued_at - b.queued_at);
+    }
+
+    async function retryRejected(reference) {
+        // Nouvelle clé : l'ancienne n'a créé aucune facture, ou désigne un autre panier (422).
+        await withStores(['rejetees', 'factures'], 'readwrite', (transaction) => {
+            const rejected = transaction.objectStore('rejetees');
+            const request = rejected.get(reference);
+            request.onsuccess = () => {
+                if (!request.result) return;
+                const { rejected_at, status, error, ...payload } = request.result;
+                rejected.delete(reference);
+                transaction.objectStore('factures').put({ ...payload, reference: newReference() });
+            };
+        });
+        return flushQueue();
+    }
+
+    async function dismissRejected(reference) {
+        await withStores(['rejetees'], 'readwrite', (transaction) => {
+            transaction.objectStore('rejetees').delete(reference);
+        });
+    }
+
+    async function flushQueue() {
+        if (!db || flushing) return;
+        flushing = true;
+        try {
+            const pending = await withStores(['factures'], 'readonly', (transaction) =>
+                requestResult(transaction.objectStore('factures').getAll())
+            );
+            pending.sort((a, b) => a.queued_at - b.queued_at);
+
+            for (const facture of pending) {
+                let response;
+                try {
+                    response = await fetch('/caisse/api/facture/create/', {
+                        method: 'POST',
+                        headers: {
+                            'Content-Type': 'application/json',
+                            'X-CSRFToken': csrfToken(),
+                            'Idempotency-Key': facture.reference,
+                        },
+                        body: JSON.stringify(facture),
+                    });
+                } catch (error) {
+                    break; // Toujours hors ligne : nouvel essai plus tard
+                }
+                // Session expirée ou serveur indisponible : la facture reste en file.
+                if ([401, 403, 429].includes(response.status) || response.status >= 500) break;
+
+                const data = await response.json().catch(() => ({}));
+                const success = Boolean(response.ok && data.success);
+                await withStores(['factures', 'rejetees'], 'readwrite', (transaction) => {
+                    transaction.objectStore('factures').delete(facture.reference);
+                    // Vente déjà payée : le refus est conservé jusqu'à ce que le caissier le traite.
+                    if (!success) {
+                        transaction.objectStore('rejetees').put({
+                            ...facture,
+                            rejected_at: Date.now(),
+                            status: response.status,
+                            error: data.error || 'erreur inconnue',
+                        });
+                    }
+                });
+                if (onFactureResult) onFactureResult(facture, success, data);
+            }
+        } finally {
+            flushing = false;
+        }
+    }
+
+    async function init(options = {}) {
+        onFactureResult = options.onFactureResult || null;
+        try {
+            db = await openDb();
+            await loadLocalCatalogue();
+            const synced = await syncCatalogue();
+            ready = synced || articles.size > 0;
+        } catch (error) {
+            console.warn('Mode hors ligne indisponible:', error);
+            return;
+        }
+        flushQueue();
+        setInterval(syncCatalogue, SYNC_INTERVAL_MS);
+        setInterval(flushQueue, FLUSH_INTERVAL_MS);
+        window.addEventListener('online', () => {
+            flushQueue();
+            syncCatalogue();
+        });
+    }
+
+    return {
+        init,
+        isReady: () => ready,
+        search,
+        findByBarcode,
+        enqueueFacture,
+        flushQueue,
+        pendingCount,
+        rejectedFactures,
+        retryRejected,
+        dismissRejected,
+        syncCatalogue,
+    };
+})();
+
+window.CaisseOffline = CaisseOffline;
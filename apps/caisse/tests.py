@@ -0,0 +1,311 @@
+from datetime import timedelta
+from decimal import Decimal
+from inspect import iscoroutinefunction
+
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from facturation.models import Article, Client, DetailFacture, Facture, Utilisateur
+from . import search, views
+from .cache import barcode_cache
+from .models import CleIdempotence
+from .services import CheckoutError, CheckoutService, run_with_retry
+
+
+class CheckoutServiceTests(TestCase):
+    """Tests du moteur d'encaissement"""
+
+    def setUp(self):
+        self.client_obj = Client.objects.create(nom='Client de passage', type='anonyme')
+        self.articles = [
+            Article.objects.create(
+                code_barres=f'100000000000{i}',
+                nom=f'Article {i}',
+                prix_HT=Decimal('100.00'),
+                prix_TTC=Decimal('118.00'),
+                taux_TVA=Decimal('0.18'),
+                stock_actuel=10,
+            )
+            for i in range(5)
+        ]
+
+    def _items(self, count, quantite=1):
+        return [{'article_id': a.id, 'quantite': quantite} for a in self.articles[:count]]
+
+    def test_create_facture_totals_and_stock(self):
+        """Test la création d'une facture et la décrémentation du stock"""
+        facture = CheckoutService.create_facture(self._items(2, 3), client=self.client_obj, caissier=None)
+
+        self.assertEqual(facture.montant_TTC, Decimal('708.00'))
+        self.assertEqual(facture.montant_HT, Decimal('600.00'))
+        self.assertEqual(DetailFacture.objects.filter(facture=facture).count(), 2)
+        self.articles[0].refresh_from_db()
+        self.assertEqual(self.articles[0].stock_actuel, 7)
+
+    def test_query_count_independent_of_basket_size(self):
+        """Test que le nombre de requêtes ne dépend pas de la taille du panier"""
+        with CaptureQueriesContext(connection) as small:
+            CheckoutService.create_facture(self._items(1), client=self.client_obj, caissier=None)
+        with CaptureQueriesContext(connection) as large:
+            CheckoutService.create_facture(self._items(5), client=self.client_obj, caissier=None)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_insufficient_stock_rolls_back(self):
+        """Test qu'un stock insuffisant annule toute la facture"""
+        items = self._items(2) + [{'article_id': self.articles[2].id, 'quantite': 11}]
+        with self.assertRaises(CheckoutError):
+            CheckoutService.create_facture(items, client=self.client_obj, caissier=None)
+        self.assertFalse(DetailFacture.objects.exists())
+        self.articles[0].refresh_from_db()
+        self.assertEqual(self.articles[0].stock_actuel, 10)
+
+    def test_duplicate_lines_share_stock(self):
+        """Test que deux lignes du même article sont contrôlées ensemble"""
+        items = [{'article_id': self.articles[0].id, 'quantite': 6}] * 2
+        with self.assertRaises(CheckoutError):
+            CheckoutService.create_facture(items, client=self.client_obj, caissier=None)
+
+    def test_inactive_article_not_found(self):
+        """Test qu'un article inactif est refusé"""
+        self.articles[0].actif = False
+        self.articles[0].save()
+        with self.assertRaises(CheckoutError) as ctx:
+            CheckoutService.create_facture(self._items(1), client=self.client_obj, caissier=None)
+        self.assertEqual(ctx.exception.status, 404)
+
+
+class RunWithRetryTests(SimpleTestCase):
+    """Tests de la reprise des transactions en conflit"""
+
+    def test_retries_locked_database(self):
+        """Test qu'une erreur de verrouillage est rejouée"""
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError('database is locked')
+            return 'ok'
+
+        retries = []
+        result = run_with_retry(flaky, on_retry=lambda attempt, exc: retries.append(attempt))
+        self.assertEqual(result, 'ok')
+        self.assertEqual(retries, [1, 2])
+
+    def test_other_errors_are_not_retried(self):
+        """Test qu'une autre erreur est remontée immédiatement"""
+        calls = []
+
+        def broken():
+            calls.append(1)
+            raise OperationalError('no such table')
+
+        with self.assertRaises(OperationalError):
+            run_with_retry(broken)
+        self.assertEqual(len(calls), 1)
+
+
+class SearchArticlesTests(TestCase):
+    """Tests de la recherche d'articles"""
+
+    def setUp(self):
+        Article.objects.create(
+            code_barres='3017620425035', nom='Baguette Tradition',
+            prix_HT=Decimal('100'), prix_TTC=Decimal('118'), stock_actuel=5,
+        )
+        Article.objects.create(
+            code_barres='3330461112330', nom='Yaourt Nature',
+            prix_HT=Decimal('100'), prix_TTC=Decimal('118'), stock_actuel=5, actif=False,
+        )
+
+    def test_search_by_name_and_barcode(self):
+        """Test la recherche par nom et par code-barres"""
+        self.assertEqual([a.nom for a in search.search_articles('baguette')], ['Baguette Tradition'])
+        self.assertEqual([a.nom for a in search.search_articles('301762')], ['Baguette Tradition'])
+
+    def test_search_excludes_inactive(self):
+        """Test que les articles inactifs sont exclus"""
+        self.assertEqual(list(search.search_articles('yaourt')), [])
+        self.assertEqual(len(search.search_articles('')), 1)
+
+
+class ArticleByBarcodeTests(TestCase):
+    """Tests de la recherche exacte par code-barres"""
+
+    def setUp(self):
+        barcode_cache.clear()
+        self.user = Utilisateur.objects.create_user(login='caissiere', password='secret', role='Caissier')
+        self.client.force_login(self.user)
+        self.article = Article.objects.create(
+            code_barres='3017620425035', nom='Baguette Tradition',
+            prix_HT=Decimal('100'), prix_TTC=Decimal('118'), stock_actuel=5,
+        )
+        self.url = reverse('caisse:article_by_barcode', args=['3017620425035'])
+
+    def test_lookup_is_cached(self):
+        """Test que le second scan est servi par le cache"""
+        self.assertEqual(self.client.get(self.url).json()['article']['id'], self.article.id)
+        with self.assertNumQueries(2):  # session + utilisateur
+            response = self.client.get(self.url)
+        self.assertEqual(response.json()['article']['stock'], 5)
+
+    def test_cache_invalidated_on_save_and_checkout(self):
+        """Test l'invalidation du cache après modification et vente"""
+        self.client.get(self.url)
+        self.article.nom = 'Baguette'
+        self.article.save()
+        self.assertEqual(self.client.get(self.url).json()['article']['nom'], 'Baguette')
+
+        client_obj = Client.objects.create(nom='Client de passage', type='anonyme')
+        with self.captureOnCommitCallbacks(execute=True):
+            CheckoutService.create_facture(
+                [{'article_id': self.article.id, 'quantite': 2}], client=client_obj, caissier=None
+            )
+        self.assertEqual(self.client.get(self.url).json()['article']['stock'], 3)
+
+    def test_unknown_barcode(self):
+        """Test un code-barres inconnu"""
+        response = self.client.get(reverse('caisse:article_by_barcode', args=['0000000000000']))
+        self.assertEqual(response.status_code, 404)
+
+
+class CatalogueSnapshotTests(TestCase):
+    """Tests de l'instantané du catalogue pour le mode hors ligne"""
+
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(login='caissiere', password='secret', role='Caissier')
+        self.client.force_login(self.user)
+        self.articles = [
+            Article.objects.create(
+                code_barres=f'200000000000{i}', nom=f'Article {i}',
+                prix_HT=Decimal('100'), prix_TTC=Decimal('118'), stock_actuel=5,
+            )
+            for i in range(3)
+        ]
+        self.url = reverse('caisse:catalogue')
+
+    def test_full_snapshot_and_etag(self):
+        """Test l'instantané complet et la réponse 304"""
+        response = self.client.get(self.url)
+        data = response.json()
+        self.assertTrue(data['full'])
+        self.assertEqual(len(data['articles']), 3)
+        self.assertEqual(data['total'], 3)
+
+        cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_delta_contains_changes_and_deletions(self):
+        """Test le delta depuis une version connue"""
+        version = self.client.get(self.url).json()['version']
+        deleted_id = self.articles[0].id
+        self.articles[0].delete()
+
+        data = self.client.get(self.url, {'since': version}).json()
+        self.assertFalse(data['full'])
+        self.assertIn(deleted_id, data['removed'])
+        self.assertEqual(data['total'], 2)
+
+
+class IdempotentFactureTests(TestCase):
+    """Tests du renvoi d'une facture depuis la file d'attente de la caisse"""
+
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(login='caissiere', password='secret', role='Caissier')
+        self.client.force_login(self.user)
+        self.article = Article.objects.create(
+            code_barres='3017620425035', nom='Baguette',
+            prix_HT=Decimal('100'), prix_TTC=Decimal('118'), stock_actuel=5,
+        )
+
+    def test_same_reference_creates_one_facture(self):
+        """Test qu'un renvoi avec la même référence ne crée pas de doublon"""
+        payload = {
+            'reference': 'ref-0001',
+            'items': [{'article_id': self.article.id, 'quantite': 2}],
+        }
+        url = reverse('caisse:create_facture')
+        first = self.client.post(url, payload, content_type='application/json').json()
+        second = self.client.post(url, payload, content_type='application/json').json()
+
+        self.assertEqual(first['facture_id'], second['facture_id'])
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.stock_actuel, 3)
+
+    def test_idempotency_key_header(self):
+        """Test l'en-tête Idempotency-Key et le refus d'un contenu différent"""
+        url = reverse('caisse:create_facture')
+        payload = {'items': [{'article_id': self.article.id, 'quantite': 1}]}
+        first = self.client.post(url, payload, content_type='application/json', HTTP_IDEMPOTENCY_KEY='cle-1')
+        replay = self.client.post(url, payload, content_type='application/json', HTTP_IDEMPOTENCY_KEY='cle-1')
+        self.assertEqual(first.json()['facture_id'], replay.json()['facture_id'])
+        self.assertTrue(CleIdempotence.objects.filter(cle='cle-1').exists())
+
+        other = {'items': [{'article_id': self.article.id, 'quantite': 2}]}
+        conflict = self.client.post(url, other, content_type='application/json', HTTP_IDEMPOTENCY_KEY='cle-1')
+        self.assertEqual(conflict.status_code, 422)
+
+    def test_purge_keeps_facture_reference(self):
+        """Test qu'une clé purgée protège toujours contre les doublons"""
+        url = reverse('caisse:create_facture')
+        payload = {'items': [{'article_id': self.article.id, 'quantite': 1}]}
+        first = self.client.post(url, payload, content_type='application/json', HTTP_IDEMPOTENCY_KEY='cle-2')
+        CheckoutService.purge_idempotency_keys(ttl=timedelta(0))
+        self.assertFalse(CleIdempotence.objects.exists())
+        replay = self.client.post(url, payload, content_type='application/json', HTTP_IDEMPOTENCY_KEY='cle-2')
+        self.assertEqual(first.json()['facture_id'], replay.json()['facture_id'])
+
+        other = {'items': [{'article_id': self.article.id, 'quantite': 3}]}
+        conflict = self.client.post(url, other, content_type='application/json', HTTP_IDEMPOTENCY_KEY='cle-2')
+        self.assertEqual(conflict.status_code, 422)
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.stock_actuel, 4)
+
+
+class AsyncCaisseViewsTests(TestCase):
+    """Tests des vues asynchrones de la caisse (pile ASGI)"""
+
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(login='caissiere', password='secret', role='Caissier')
+        self.article = Article.objects.create(
+            code_barres='3017620425035', nom='Baguette',
+            prix_HT=Decimal('100'), prix_TTC=Decimal('118'), stock_actuel=5,
+        )
+
+    def test_views_are_async(self):
+        """Test que la recherche, l'encaissement et les dernières factures sont des coroutines"""
+        for view in (views.search_articles, views.create_facture, views.recent_factures):
+            self.assertTrue(iscoroutinefunction(view), view.__name__)
+
+    async def test_checkout_flow(self):
+        """Test recherche, encaissement et dernières factures via le client asynchrone"""
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('caisse:search_articles'), {'q': 'bague'})
+        self.assertEqual([a['nom'] for a in response.json()['articles']], ['Baguette'])
+
+        response = await self.async_client.post(
+            reverse('caisse:create_facture'),
+            {'items': [{'article_id': self.article.id, 'quantite': 2}]},
+            content_type='application/json',
+        )
+        facture_id = response.json()['facture_id']
+        facture = await Facture.objects.select_related('caissier').aget(pk=facture_id)
+        self.assertEqual(facture.caissier, self.user)
+        self.assertEqual((await Article.objects.aget(pk=self.article.pk)).stock_actuel, 3)
+
+        response = await self.async_client.get(reverse('caisse:recent_factures'))
+        self.assertEqual([f['id'] for f in response.json()['factures']], [facture_id])
+
+    def test_duplicate_walk_in_clients(self):
+        """Test qu'un client de passage en double (caisses concurrentes) ne bloque pas les ventes"""
+        first = Client.objects.create(nom='Client de passage', type='anonyme')
+        Client.objects.create(nom='Client de passage', type='anonyme')
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('caisse:create_facture'),
+            {'items': [{'article_id': self.article.id, 'quantite': 1}]},
+            content_type='application/json',
+        )
+        self.assertEqual(Facture.objects.get(pk=response.json()['facture_id']).client, first)
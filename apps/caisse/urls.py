@@ -6,6 +6,9 @@ app_name = 'caisse'
 urlpatterns = [
     path('', views.index, name='index'),
     path('api/search/', views.search_articles, name='search_articles'),
+    path('api/clients/', views.search_clients, name='search_clients'),
+    path('api/article/<str:code_barres>/', views.article_by_barcode, name='article_by_barcode'),
+    path('api/catalogue/', views.catalogue_snapshot, name='catalogue'),
     path('api/facture/create/', views.create_facture, name='create_facture'),
     path('api/factures/recent/', views.recent_factures, name='recent_factures'),
 ]
@@ -1,10 +1,15 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
-from django.db import models, transaction
-from facturation.models import Article, Client, Facture, DetailFacture, Utilisateur
-from decimal import Decimal
+from django.views.decorators.http import condition, require_http_methods
+from django.db import OperationalError
+from facturation.models import Article, Client, Facture
+from apps.clients import search as client_search
+from . import catalogue, search
+from .cache import barcode_cache
+from .services import CheckoutError, CheckoutService, is_retryable_error
+import hashlib
 import json
 
 @login_required
@@ -20,25 +25,8 @@ def index(request):
     }
     return render(request, 'caisse/index.html', context)
 
-@require_http_methods(["GET"])
-@login_required
-def search_articles(request):
-    """Recherche d'articles par nom ou code-barres"""
-    query = request.GET.get('q', '')
-    
-    # Recherche dans les articles actifs
-    articles = Article.objects.filter(actif=True)
-    
-    # Si une recherche est fournie, filtrer
-    if query:
-        articles = articles.filter(
-            models.Q(nom__icontains=query) | 
-            models.Q(code_barres__icontains=query)
-        )
-    
-    articles = articles[:50]  # Limite à 50 articles
-    
-    articles_data = [{
+def _serialize_article(article):
+    return {
         'id': article.id,
         'nom': article.nom,
         'code_barres': article.code_barres,
@@ -46,13 +34,93 @@ def search_articles(request):
         'prix_ht': float(article.prix_HT),
         'tva_rate': float(article.taux_TVA) * 100,
         'stock': article.stock_actuel
-    } for article in articles]
-    
+    }
+
+@require_http_methods(["GET"])
+@login_required
+async def search_articles(request):
+    """Recherche d'articles par nom ou code-barres"""
+    query = request.GET.get('q', '')
+    articles_data = [
+        _serialize_article(article) async for article in search.search_articles(query)
+    ]
     return JsonResponse({'articles': articles_data})
 
+@require_http_methods(["GET"])
+@login_required
+def search_clients(request):
+    """Suggestions de clients pour la saisie du client à l'encaissement"""
+    clients = client_search.search_clients(request.GET.get('q', ''))
+    clients_data = []
+    for client in clients:
+        name = " ".join(part for part in [client.prenom, client.nom] if part).strip() or "Client"
+        clients_data.append({
+            'id': client.id,
+            'label': f"{name} · {client.telephone}" if client.telephone else name,
+        })
+    return JsonResponse({'clients': clients_data})
+
+@require_http_methods(["GET"])
+@login_required
+def article_by_barcode(request, code_barres):
+    """Recherche exacte d'un article scanné, via l'index unique du code-barres"""
+    article_data = barcode_cache.get(code_barres)
+    if article_data is None:
+        article = (
+            Article.objects.filter(code_barres=code_barres, actif=True)
+            .only(*search.SEARCH_FIELDS)
+            .first()
+        )
+        if article is None:
+            return JsonResponse({'error': 'Article introuvable'}, status=404)
+        article_data = _serialize_article(article)
+        barcode_cache.set(code_barres, article_data)
+
+    return JsonResponse({'article': article_data})
+
+def _catalogue_version(request):
+    if not hasattr(request, '_catalogue_version'):
+        request._catalogue_version = catalogue.current_version()
+    return request._catalogue_version
+
+def _catalogue_etag(request):
+    since = catalogue.parse_version(request.GET.get('since'))
+    return f'"catalogue-{_catalogue_version(request)}-{since or 0}"'
+
+@require_http_methods(["GET"])
+@login_required
+@condition(etag_func=_catalogue_etag)
+def catalogue_snapshot(request):
+    """Instantané compact du catalogue (ou delta depuis ?since=<version>)"""
+    since = catalogue.parse_version(request.GET.get('since'))
+    snapshot = catalogue.build_snapshot(since=since, version=_catalogue_version(request))
+    response = JsonResponse(snapshot)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+def _request_fingerprint(data):
+    """Empreinte du contenu d'une facture, indépendante de sa clé et de la file"""
+    content = {
+        key: value for key, value in data.items()
+        if key not in ('reference', 'queued_at')
+    }
+    canonical = json.dumps(content, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+async def _client_by_name(nom, **defaults):
+    """
+    Plus ancien client de ce nom, créé au besoin.
+    Le nom n'est pas unique : deux caisses peuvent créer le même client au
+    même instant, et get_or_create échouerait ensuite sur chaque vente.
+    """
+    client = await Client.objects.filter(nom=nom).order_by("pk").afirst()
+    if client is None:
+        client = await Client.objects.acreate(nom=nom, **defaults)
+    return client
+
 @login_required
 @require_http_methods(["POST"])
-def create_facture(request):
+async def create_facture(request):
     """Créer une nouvelle facture"""
     try:
         data = json.loads(request.body)
@@ -63,114 +131,68 @@ def create_facture(request):
             return JsonResponse({'error': 'Le panier est vide'}, status=400)
         
         # Utiliser l'utilisateur actuellement connecté
-        caissier = request.user
+        caissier = await request.auser()
         
-        # Gérer le client (nom fourni ou anonyme par défaut)
+        # Gérer le client (choisi dans les suggestions, nom fourni ou anonyme par défaut)
         client_name = data.get('client_name', '').strip()
-        if client_name:
+        client = None
+        client_id = str(data.get('client_id') or '')
+        if client_id.isdigit():
+            # Client choisi dans les suggestions : désigné par son identifiant.
+            client = await Client.objects.filter(pk=int(client_id)).afirst()
+        if client is None and client_name:
             # Créer ou récupérer un client avec le nom fourni
-            client, _ = Client.objects.get_or_create(
-                nom=client_name,
-                defaults={
-                    "type": "enregistre",
-                    "prenom": "",
-                },
-            )
-        else:
+            client = await _client_by_name(client_name, type="enregistre", prenom="")
+        elif client is None:
             # Client anonyme par défaut
-            client, _ = Client.objects.get_or_create(
-                nom="Client de passage",
-                defaults={"type": "anonyme"},
-            )
-
-        montant_ht_brut = Decimal("0")
-        montant_tva_brut = Decimal("0")
-        montant_ttc_brut = Decimal("0")
-        detail_rows = []
-
-        with transaction.atomic():
-            for item in items:
-                article_id = item.get("article_id")
-                quantite = int(item.get("quantite", 0))
-                if not article_id or quantite <= 0:
-                    return JsonResponse({"error": "Ligne article invalide"}, status=400)
-
-                article = Article.objects.select_for_update().get(id=article_id, actif=True)
-                if article.stock_actuel < quantite:
-                    return JsonResponse(
-                        {"error": f"Stock insuffisant pour {article.nom} (disponible: {article.stock_actuel})"},
-                        status=400,
-                    )
-
-                line_ht = (article.prix_HT * quantite).quantize(Decimal("0.01"))
-                line_ttc = (article.prix_TTC * quantite).quantize(Decimal("0.01"))
-                line_tva = (line_ttc - line_ht).quantize(Decimal("0.01"))
-
-                montant_ht_brut += line_ht
-                montant_tva_brut += line_tva
-                montant_ttc_brut += line_ttc
-
-                detail_rows.append(
-                    {
-                        "article": article,
-                        "quantite": quantite,
-                        "prix_unitaire": article.prix_TTC,
-                        "remise": Decimal("0"),
-                        "total_ligne": line_ttc,
-                    }
-                )
-
-            remise_amount = Decimal(str(remise_data.get("amount") or "0")).quantize(Decimal("0.01"))
-            if remise_amount < 0:
-                remise_amount = Decimal("0.00")
-            if remise_amount > montant_ttc_brut:
-                remise_amount = montant_ttc_brut
-
-            net_ttc = (montant_ttc_brut - remise_amount).quantize(Decimal("0.01"))
-            ratio = Decimal("1")
-            if montant_ttc_brut > 0:
-                ratio = (net_ttc / montant_ttc_brut)
-
-            montant_ht = (montant_ht_brut * ratio).quantize(Decimal("0.01"))
-            montant_tva = (net_ttc - montant_ht).quantize(Decimal("0.01"))
-
-            facture = Facture.objects.create(
-                montant_HT=montant_ht,
-                montant_TVA=montant_tva,
-                montant_TTC=net_ttc,
-                mode_paiement=data.get("mode_paiement", "especes"),
-                client=client,
-                caissier=caissier,
-            )
-
-            for row in detail_rows:
-                DetailFacture.objects.create(facture=facture, **row)
-                row["article"].stock_actuel -= row["quantite"]
-                row["article"].save(update_fields=["stock_actuel"])
-        
+            client = await _client_by_name("Client de passage", type="anonyme")
+
+        # Clé d'idempotence : en-tête Idempotency-Key, ou référence de la file hors ligne
+        reference = (
+            request.headers.get('Idempotency-Key') or data.get('reference') or ''
+        ).strip()[:64] or None
+        fingerprint = _request_fingerprint(data) if reference else ""
+
+        # Seule la transaction (verrous, reprises sur conflit) reste synchrone :
+        # elle s'exécute d'un bloc dans le thread de la requête.
+        facture = await sync_to_async(CheckoutService.create_facture)(
+            items,
+            client=client,
+            caissier=caissier,
+            mode_paiement=data.get("mode_paiement", "especes"),
+            remise=remise_data,
+            reference=reference,
+            fingerprint=fingerprint,
+        )
+
         return JsonResponse({
             'success': True,
             'facture_id': facture.id,
-            'numero_facture': f'FAC-{facture.id:08d}'
+            'numero_facture': f'FAC-{facture.id:08d}',
+            'reference': facture.reference_caisse,
         })
-    except Article.DoesNotExist:
-        return JsonResponse({'error': "Article introuvable ou inactif"}, status=404)
+    except CheckoutError as e:
+        return JsonResponse({'error': e.message}, status=e.status)
     except ValueError:
         return JsonResponse({'error': "Format de données invalide"}, status=400)
+    except OperationalError as e:
+        if is_retryable_error(e):
+            return JsonResponse({'error': "Caisse occupée, veuillez réessayer"}, status=503)
+        return JsonResponse({'error': str(e)}, status=500)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
 
 @login_required
 @require_http_methods(["GET"])
-def recent_factures(request):
+async def recent_factures(request):
     factures = (
         Facture.objects.select_related("client", "caissier")
         .order_by("-date_facture")[:20]
     )
 
     data = []
-    for facture in factures:
+    async for facture in factures:
         client_name = " ".join(
             part for part in [facture.client.prenom, facture.client.nom] if part
         ).strip() or "Client"
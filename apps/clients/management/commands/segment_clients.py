@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from apps.clients import metrics, rfm
+from apps.clients.models import StatistiqueClient
+
+
+class Command(BaseCommand):
+    help = "Calcule la segmentation RFM (récence, fréquence, montant) des clients"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Recalcule d\'abord les statistiques de tous les clients à partir des factures',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            updated = metrics.rebuild()
+            self.stdout.write(f"{updated} client(s) recalculé(s) à partir des factures")
+        counts = rfm.segmenter()
+        labels = dict(StatistiqueClient.SEGMENT_CHOICES)
+        for segment, _ in StatistiqueClient.SEGMENT_CHOICES:
+            if counts.get(segment):
+                self.stdout.write(f"  {labels[segment]}: {counts[segment]} client(s)")
+        self.stdout.write(self.style.SUCCESS(f"{sum(counts.values())} client(s) segmenté(s)"))
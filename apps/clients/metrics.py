@@ -0,0 +1,137 @@
+"""
+Statistiques d'achat par client : nombre de factures, montant total, panier
+moyen et date du dernier achat.
+
+StatistiqueClient est tenue à jour à chaque encaissement (CheckoutService) et à
+chaque changement de statut, de montant ou de client d'une facture (signaux) :
+la liste des clients trie et pagine sur ses colonnes indexées au lieu
+d'agréger toutes les factures à chaque affichage. Comme pour les agrégats
+journaliers, seules les factures payées sont comptées ; `rebuild` recalcule
+tout à partir des factures (commande segment_clients --rebuild). Les ventes du
+client de passage, dont la ligne est partagée par toutes les caisses, sont
+comptées après validation de l'encaissement.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, NullIf
+from django.utils import timezone
+
+from apps.report.rollups import STATUTS_COMPTABILISES
+from facturation.models import Client, Facture
+from .models import StatistiqueClient
+
+CENT = Decimal("0.01")
+ZERO = Decimal("0")
+REBUILD_BATCH_SIZE = 1000
+
+
+def factures_comptees():
+    return Facture.objects.filter(statut__in=STATUTS_COMPTABILISES)
+
+
+def _values(nb, montant, derniere):
+    return {
+        "nb_factures": nb,
+        "montant_total": montant,
+        "panier_moyen": (montant / nb).quantize(CENT, rounding=ROUND_HALF_UP) if nb else ZERO,
+        "derniere_facture": derniere,
+    }
+
+
+def apply_facture(facture, sign=1):
+    """
+    Ajoute (sign=1) ou retire (sign=-1) une facture des statistiques de son
+    client : un seul UPDATE, sans lecture préalable.
+    """
+    nb = F("nb_factures") + sign
+    montant = F("montant_total") + sign * facture.montant_TTC
+    if sign > 0:
+        date = Value(facture.date_facture)
+        derniere = Greatest(Coalesce("derniere_facture", date), date)
+    else:
+        # La facture retirée était peut-être la dernière : relue parmi les autres.
+        derniere = Subquery(
+            factures_comptees()
+            .filter(client_id=facture.client_id)
+            .exclude(pk=facture.pk)
+            .order_by("-date_facture")
+            .values("date_facture")[:1]
+        )
+    updated = StatistiqueClient.objects.filter(client_id=facture.client_id).update(
+        nb_factures=nb,
+        montant_total=montant,
+        panier_moyen=Coalesce(
+            ExpressionWrapper(montant / NullIf(nb, 0), output_field=DecimalField(max_digits=12, decimal_places=2)),
+            ZERO,
+        ),
+        derniere_facture=derniere,
+        date_modification=timezone.now(),
+    )
+    if not updated:
+        # Client créé sans passer par l'ORM (import, restauration partielle).
+        refresh(facture.client_id, exclude=facture.pk if sign < 0 else None)
+
+
+def refresh(client_id, exclude=None):
+    """Recalcule les statistiques d'un client à partir de ses factures (`exclude` : facture ignorée)"""
+    factures = factures_comptees().filter(client_id=client_id)
+    if exclude is not None:
+        factures = factures.exclude(pk=exclude)
+    totals = factures.aggregate(
+        nb=Count("id"),
+        montant=Coalesce(Sum("montant_TTC"), ZERO),
+        derniere=Max("date_facture"),
+    )
+    statistiques, _ = StatistiqueClient.objects.update_or_create(
+        client_id=client_id,
+        defaults=_values(totals["nb"], totals["montant"], totals["derniere"]),
+    )
+    return statistiques
+
+
+def ensure_rows():
+    """Crée les statistiques (vides) des clients qui n'en ont pas encore. Retourne leur nombre"""
+    missing = Client.objects.filter(statistiques__isnull=True).values_list("id", flat=True)
+    created = 0
+    batch = []
+    for client_id in missing.iterator(chunk_size=REBUILD_BATCH_SIZE):
+        batch.append(StatistiqueClient(client_id=client_id))
+        if len(batch) >= REBUILD_BATCH_SIZE:
+            created += len(StatistiqueClient.objects.bulk_create(batch, ignore_conflicts=True))
+            batch = []
+    created += len(StatistiqueClient.objects.bulk_create(batch, ignore_conflicts=True))
+    return created
+
+
+def rebuild():
+    """
+    Recalcule les statistiques de tous les clients à partir des factures.
+    Les segments sont conservés. Retourne le nombre de clients mis à jour.
+    """
+    totals = {
+        row["client_id"]: row
+        for row in factures_comptees()
+        .values("client_id")
+        .annotate(nb=Count("id"), montant=Coalesce(Sum("montant_TTC"), ZERO), derniere=Max("date_facture"))
+        .order_by()
+    }
+    fields = ["nb_factures", "montant_total", "panier_moyen", "derniere_facture", "date_modification"]
+    now = timezone.now()
+    updated = 0
+    with transaction.atomic():
+        ensure_rows()
+        batch = []
+        for statistiques in StatistiqueClient.objects.only("client_id").iterator(chunk_size=REBUILD_BATCH_SIZE):
+            row = totals.get(statistiques.client_id)
+            values = _values(row["nb"], row["montant"], row["derniere"]) if row else _values(0, ZERO, None)
+            for field, value in values.items():
+                setattr(statistiques, field, value)
+            statistiques.date_modification = now
+            batch.append(statistiques)
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                updated += StatistiqueClient.objects.bulk_update(batch, fields)
+                batch = []
+        updated += StatistiqueClient.objects.bulk_update(batch, fields)
+    return updated
@@ -0,0 +1,71 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:20
+
+from decimal import ROUND_HALF_UP, Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+def init_statistiques(apps, schema_editor):
+    """Une ligne par client, calculée à partir de ses factures payées"""
+    Client = apps.get_model('facturation', 'Client')
+    Facture = apps.get_model('facturation', 'Facture')
+    StatistiqueClient = apps.get_model('clients', 'StatistiqueClient')
+    totals = {
+        row['client_id']: row
+        for row in Facture.objects.filter(statut='payee')
+        .values('client_id')
+        .annotate(nb=Count('id'), montant=Sum('montant_TTC'), derniere=Max('date_facture'))
+        .order_by()
+    }
+    batch = []
+    for client_id in Client.objects.values_list('id', flat=True).iterator(chunk_size=1000):
+        row = totals.get(client_id)
+        if row is None:
+            batch.append(StatistiqueClient(client_id=client_id))
+        else:
+            batch.append(StatistiqueClient(
+                client_id=client_id,
+                nb_factures=row['nb'],
+                montant_total=row['montant'],
+                panier_moyen=(row['montant'] / row['nb']).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
+                derniere_facture=row['derniere'],
+            ))
+        if len(batch) >= 1000:
+            StatistiqueClient.objects.bulk_create(batch)
+            batch = []
+    StatistiqueClient.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('facturation', '0011_facture_date_modification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatistiqueClient',
+            fields=[
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='statistiques', serialize=False, to='facturation.client')),
+                ('nb_factures', models.IntegerField(db_index=True, default=0)),
+                ('montant_total', models.DecimalField(db_index=True, decimal_places=2, default=0, max_digits=14)),
+                ('panier_moyen', models.DecimalField(db_index=True, decimal_places=2, default=0, max_digits=12)),
+                ('derniere_facture', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('score_recence', models.PositiveSmallIntegerField(default=0)),
+                ('score_frequence', models.PositiveSmallIntegerField(default=0)),
+                ('score_montant', models.PositiveSmallIntegerField(default=0)),
+                ('segment', models.CharField(choices=[('sans_achat', 'Sans achat'), ('champions', 'Champions'), ('fideles', 'Fidèles'), ('prometteurs', 'Prometteurs'), ('occasionnels', 'Occasionnels'), ('a_risque', 'À risque'), ('perdus', 'Perdus')], db_index=True, default='sans_achat', max_length=20)),
+                ('date_segmentation', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Statistique client',
+                'verbose_name_plural': 'Statistiques clients',
+                'indexes': [models.Index(fields=['score_recence', 'score_frequence', 'score_montant'], name='clients_stat_rfm_idx')],
+            },
+        ),
+        migrations.RunPython(init_statistiques, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+from django.db import models
+
+
+class StatistiqueClient(models.Model):
+    """Statistiques d'achat et segment RFM d'un client (voir metrics et rfm)"""
+
+    SEGMENT_CHOICES = [
+        ("sans_achat", "Sans achat"),
+        ("champions", "Champions"),
+        ("fideles", "Fidèles"),
+        ("prometteurs", "Prometteurs"),
+        ("occasionnels", "Occasionnels"),
+        ("a_risque", "À risque"),
+        ("perdus", "Perdus"),
+    ]
+
+    client = models.OneToOneField(
+        "facturation.Client",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="statistiques",
+    )
+    # Factures payées uniquement, comme les agrégats journaliers.
+    nb_factures = models.IntegerField(default=0, db_index=True)
+    montant_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, db_index=True)
+    panier_moyen = models.DecimalField(max_digits=12, decimal_places=2, default=0, db_index=True)
+    derniere_facture = models.DateTimeField(null=True, blank=True, db_index=True)
+    # Notes de 1 à 5 (0 sans achat), recalculées par la commande segment_clients.
+    score_recence = models.PositiveSmallIntegerField(default=0)
+    score_frequence = models.PositiveSmallIntegerField(default=0)
+    score_montant = models.PositiveSmallIntegerField(default=0)
+    segment = models.CharField(max_length=20, choices=SEGMENT_CHOICES, default="sans_achat", db_index=True)
+    date_segmentation = models.DateTimeField(null=True, blank=True)
+    # Sauvegardes incrémentales : renseignée aussi par les UPDATE groupés (metrics, rfm).
+    date_modification = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Statistique client"
+        verbose_name_plural = "Statistiques clients"
+        indexes = [
+            models.Index(
+                fields=["score_recence", "score_frequence", "score_montant"],
+                name="clients_stat_rfm_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Client {self.client_id} : {self.nb_factures} facture(s)"
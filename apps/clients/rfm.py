@@ -0,0 +1,123 @@
+"""
+Segmentation RFM (récence, fréquence, montant) des clients.
+
+Calculée par lot (commande segment_clients, chaque nuit par exemple) sur les
+colonnes de StatistiqueClient : chaque critère est noté de 1 à 5 par quintile
+parmi les clients qui ont acheté, les ex aequo recevant la même note, puis le
+couple (récence, fréquence) désigne le segment. Les notes sont calculées
+d'un bloc avec NumPy s'il est installé, en Python pur sinon (mêmes résultats).
+L'écriture regroupe les clients par notes identiques : au plus 125
+combinaisons, donc quelques UPDATE ... WHERE client_id IN (...).
+"""
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import metrics
+from .models import StatistiqueClient
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - optional dependency
+    numpy = None
+
+QUANTILES = 5
+# Identifiants par UPDATE ... IN (limite de paramètres de SQLite).
+UPDATE_BATCH_SIZE = 500
+
+
+def segment_for(recence, frequence):
+    """Segment d'un client d'après ses notes de récence et de fréquence (0 : sans achat)"""
+    if not recence:
+        return "sans_achat"
+    if recence >= 4 and frequence >= 4:
+        return "champions"
+    if recence <= 2 and frequence >= 3:
+        return "a_risque"
+    if frequence >= 4:
+        return "fideles"
+    if recence >= 4:
+        return "prometteurs"
+    if recence <= 2:
+        return "perdus"
+    return "occasionnels"
+
+
+# Table [récence][fréquence] -> segment, indexable d'un bloc.
+SEGMENTS = [[segment_for(r, f) for f in range(QUANTILES + 1)] for r in range(QUANTILES + 1)]
+
+
+def scores(values):
+    """
+    Note de 1 à 5 de chaque valeur selon son quintile (plus grand = meilleur) :
+    le rang d'une valeur est celui de sa première occurrence dans l'ordre trié.
+    """
+    count = len(values)
+    if not count:
+        return []
+    if numpy is not None:
+        array = numpy.asarray(values, dtype=float)
+        ranks = numpy.searchsorted(numpy.sort(array), array, side="left")
+        return (ranks * QUANTILES // count + 1).tolist()
+    ordered = sorted(values)
+    return [bisect_left(ordered, value) * QUANTILES // count + 1 for value in values]
+
+
+def segments(recences, frequences):
+    if numpy is not None and recences:
+        table = numpy.array(SEGMENTS, dtype=object)
+        return table[numpy.asarray(recences), numpy.asarray(frequences)].tolist()
+    return [SEGMENTS[r][f] for r, f in zip(recences, frequences)]
+
+
+def segmenter():
+    """Note et segmente tous les clients. Retourne {segment: nombre de clients}"""
+    now = timezone.now()
+    with transaction.atomic():
+        metrics.ensure_rows()
+        rows = list(
+            StatistiqueClient.objects.filter(nb_factures__gt=0, derniere_facture__isnull=False)
+            .order_by()
+            .values_list("client_id", "derniere_facture", "nb_factures", "montant_total")
+        )
+        client_ids = [row[0] for row in rows]
+        recences = scores([row[1].timestamp() for row in rows])
+        frequences = scores([row[2] for row in rows])
+        montants = scores([float(row[3]) for row in rows])
+
+        groups = defaultdict(list)
+        for client_id, r, f, m, segment in zip(
+            client_ids, recences, frequences, montants, segments(recences, frequences)
+        ):
+            groups[(r, f, m, segment)].append(client_id)
+
+        sans_achat = StatistiqueClient.objects.filter(
+            Q(nb_factures__lte=0) | Q(derniere_facture__isnull=True)
+        ).update(
+            score_recence=0,
+            score_frequence=0,
+            score_montant=0,
+            segment="sans_achat",
+            date_segmentation=now,
+            date_modification=now,
+        )
+        for (r, f, m, segment), ids in groups.items():
+            for start in range(0, len(ids), UPDATE_BATCH_SIZE):
+                StatistiqueClient.objects.filter(client_id__in=ids[start:start + UPDATE_BATCH_SIZE]).update(
+                    score_recence=r,
+                    score_frequence=f,
+                    score_montant=m,
+                    segment=segment,
+                    date_segmentation=now,
+                    date_modification=now,
+                )
+
+    counts = defaultdict(int)
+    if sans_achat:
+        counts["sans_achat"] = sans_achat
+    for (_, _, _, segment), ids in groups.items():
+        counts[segment] += len(ids)
+    return dict(counts)
@@ -0,0 +1,39 @@
+"""
+Recherche de clients (liste des clients et caisse).
+
+La colonne Client.recherche contient prénom, nom, e-mail et téléphone en
+minuscules et sans accents, recalculée à chaque enregistrement. Chaque mot de
+la recherche, normalisé de la même façon, doit y figurer : « diallo awa »
+trouve « Awa Diallo », « celine » trouve « Céline ». Sur PostgreSQL, chaque
+filtre LIKE '%mot%' est servi par l'index GIN pg_trgm de la migration
+facturation 0012 et les résultats de la caisse sont classés par similarité.
+"""
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+
+from facturation.models import Client, nom_complet_tri, normaliser_recherche
+
+SEARCH_LIMIT = 20
+
+SEARCH_FIELDS = ("id", "prenom", "nom", "telephone")
+
+
+def filter_clients(queryset, query, prefix=""):
+    """Restreint `queryset` aux clients contenant chaque mot de `query` (`prefix` : chemin vers Client)"""
+    for mot in normaliser_recherche(query).split():
+        queryset = queryset.filter(**{f"{prefix}recherche__contains": mot})
+    return queryset
+
+
+def search_clients(query, limit=SEARCH_LIMIT):
+    """Retourne au plus `limit` clients correspondant à la recherche"""
+    normalized = normaliser_recherche(query)
+    if not normalized:
+        return Client.objects.none()
+    clients = filter_clients(Client.objects.only(*SEARCH_FIELDS), normalized)
+    if connection.vendor != "postgresql":
+        return clients.order_by(nom_complet_tri())[:limit]
+    return (
+        clients.annotate(similarity=TrigramSimilarity("recherche", normalized))
+        .order_by("-similarity", nom_complet_tri())[:limit]
+    )
@@ -0,0 +1,41 @@
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from apps.report.rollups import is_counted
+from facturation import snapshots
+from facturation.models import Client, Facture
+from . import metrics
+from .models import StatistiqueClient
+
+# Champs d'une facture qui déterminent sa place dans les statistiques du client.
+_METRIC_FIELDS = ("statut", "montant_TTC", "client_id", "date_facture")
+
+
+@receiver(post_save, sender=Client)
+def create_client_statistics(sender, instance, created, **kwargs):
+    """Chaque client a sa ligne de statistiques : la liste des clients part de cette table"""
+    if created:
+        StatistiqueClient.objects.get_or_create(client=instance)
+
+
+@receiver(post_save, sender=Facture)
+def update_statistics_on_change(sender, instance, created, **kwargs):
+    """
+    Répercute une annulation, un remboursement ou une correction de facture.
+    La création est prise en charge par CheckoutService.
+    """
+    previous = snapshots.previous(instance)
+    if created or previous is None:
+        return
+    if all(getattr(previous, field) == getattr(instance, field) for field in _METRIC_FIELDS):
+        return
+    if is_counted(previous.statut):
+        metrics.apply_facture(previous, sign=-1)
+    if is_counted(instance.statut):
+        metrics.apply_facture(instance, sign=1)
+
+
+@receiver(pre_delete, sender=Facture)
+def update_statistics_on_delete(sender, instance, **kwargs):
+    if is_counted(instance.statut):
+        metrics.apply_facture(instance, sign=-1)
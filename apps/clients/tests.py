@@ -0,0 +1,201 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.caisse.services import CheckoutService
+from facturation.models import Article, Client, Facture, Utilisateur
+from . import metrics, rfm, search
+from .models import StatistiqueClient
+
+
+class ClientStatisticsTests(TestCase):
+    """Tests des statistiques clients tenues à jour à l'encaissement"""
+
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(login='gerant', password='secret', role='Gestionnaire')
+        self.article = Article.objects.create(
+            code_barres='7000000000001', nom='Riz', prix_HT=Decimal('100.00'),
+            prix_TTC=Decimal('118.00'), taux_TVA=Decimal('0.180'), stock_actuel=100,
+        )
+        self.awa = Client.objects.create(nom='Diallo', prenom='Awa', type='enregistre')
+        self.moussa = Client.objects.create(nom='Traore', prenom='Moussa', type='enregistre')
+
+    def _vendre(self, client, quantite=1):
+        return CheckoutService.create_facture(
+            [{'article_id': self.article.id, 'quantite': quantite}], client=client, caissier=self.user
+        )
+
+    def _statistiques(self, client):
+        return StatistiqueClient.objects.get(client=client)
+
+    def test_checkout_and_status_changes_update_statistics(self):
+        """Test l'encaissement, l'annulation et la suppression d'une facture"""
+        self.assertEqual(self._statistiques(self.awa).nb_factures, 0)
+        premiere = self._vendre(self.awa, 1)
+        derniere = self._vendre(self.awa, 3)
+
+        statistiques = self._statistiques(self.awa)
+        self.assertEqual(statistiques.nb_factures, 2)
+        self.assertEqual(statistiques.montant_total, Decimal('472.00'))
+        self.assertEqual(statistiques.panier_moyen, Decimal('236.00'))
+        self.assertEqual(statistiques.derniere_facture, derniere.date_facture)
+
+        derniere.statut = 'annulee'
+        with CaptureQueriesContext(connection) as ctx:
+            derniere.save()
+        # Une seule lecture de l'état précédent, partagée par les agrégats et les statistiques.
+        lectures = [q for q in ctx.captured_queries if q['sql'].startswith('SELECT "facturation_facture"')]
+        self.assertEqual(len(lectures), 1)
+        statistiques = self._statistiques(self.awa)
+        self.assertEqual((statistiques.nb_factures, statistiques.montant_total), (1, Decimal('118.00')))
+        self.assertEqual(statistiques.panier_moyen, Decimal('118.00'))
+        self.assertEqual(statistiques.derniere_facture, premiere.date_facture)
+
+        premiere.delete()
+        statistiques = self._statistiques(self.awa)
+        self.assertEqual((statistiques.nb_factures, statistiques.montant_total), (0, Decimal('0.00')))
+        self.assertIsNone(statistiques.derniere_facture)
+
+    def test_anonymous_client_statistics_after_commit(self):
+        """Test que les statistiques du client de passage sont mises à jour après validation"""
+        passage = Client.objects.create(nom='Client de passage', type='anonyme')
+        with self.captureOnCommitCallbacks() as callbacks:
+            self._vendre(passage, 2)
+        self.assertEqual(self._statistiques(passage).nb_factures, 0)
+
+        for callback in callbacks:
+            callback()
+        statistiques = self._statistiques(passage)
+        self.assertEqual((statistiques.nb_factures, statistiques.montant_total), (1, Decimal('236.00')))
+
+    def test_rebuild_matches_incremental_statistics(self):
+        """Test que le recalcul complet donne les mêmes statistiques"""
+        self._vendre(self.awa, 2)
+        facture = self._vendre(self.moussa, 1)
+        facture.client = self.awa
+        facture.save()
+        self._vendre(self.moussa, 4)
+        # Tout sauf la date de modification, renouvelée par le recalcul.
+        colonnes = [f.attname for f in StatistiqueClient._meta.concrete_fields if f.name != 'date_modification']
+        incremental = list(StatistiqueClient.objects.order_by('pk').values_list(*colonnes))
+
+        StatistiqueClient.objects.all().delete()
+        self.assertEqual(metrics.rebuild(), 2)
+        self.assertEqual(list(StatistiqueClient.objects.order_by('pk').values_list(*colonnes)), incremental)
+
+    def test_segmentation_and_client_list(self):
+        """Test la segmentation RFM puis le tri et le filtre de la liste des clients"""
+        ancien = Client.objects.create(nom='Kone', prenom='Ali', type='enregistre')
+        self._vendre(self.moussa, 1)
+        for _ in range(4):
+            self._vendre(self.awa, 2)
+        Facture.objects.create(client=ancien, montant_TTC=Decimal('50.00'))
+        Facture.objects.filter(client=ancien).update(date_facture=timezone.now() - timedelta(days=200))
+        metrics.rebuild()
+        Client.objects.create(nom='Nouveau', type='anonyme')
+
+        counts = rfm.segmenter()
+        self.assertEqual(sum(counts.values()), 4)
+        self.assertEqual(self._statistiques(self.awa).segment, 'champions')
+        self.assertEqual(self._statistiques(ancien).segment, 'perdus')
+        self.assertEqual(StatistiqueClient.objects.get(client__nom='Nouveau').segment, 'sans_achat')
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('clients:index'), {'sort': 'total_spent', 'dir': 'desc'})
+        self.assertEqual(response.status_code, 200)
+        names = [row['name'] for row in response.context['clients']]
+        self.assertEqual(names[:3], ['Awa Diallo', 'Moussa Traore', 'Ali Kone'])
+        self.assertEqual(response.context['active_clients'], 3)
+
+        response = self.client.get(reverse('clients:index'), {'segment': 'perdus'})
+        self.assertEqual([row['name'] for row in response.context['clients']], ['Ali Kone', 'Moussa Traore'])
+
+        details = self.client.get(reverse('clients:details', args=[self.awa.id])).json()
+        self.assertEqual(details['segment'], 'Champions')
+
+    def test_client_list_pages_by_cursor(self):
+        """Test le passage d'une page à l'autre de la liste des clients par curseur"""
+        for i in range(10):
+            Client.objects.create(nom=f'Client {i:02d}')
+        self._vendre(self.moussa, 1)
+        self.client.force_login(self.user)
+        url = reverse('clients:index')
+        first = self.client.get(url, {'sort': 'last_purchase', 'dir': 'desc'})
+        names = [row['name'] for row in first.context['clients']]
+        self.assertEqual((len(names), names[0]), (10, 'Moussa Traore'))
+        self.assertIsNone(first.context['previous_url'])
+
+        second = self.client.get(url + first.context['next_url'])
+        self.assertEqual(second.context['page_obj'].number, 2)
+        self.assertEqual([row['name'] for row in second.context['clients']], ['Client 09', 'Awa Diallo'])
+        self.assertIsNone(second.context['next_url'])
+        back = self.client.get(url + second.context['previous_url'])
+        self.assertEqual([row['name'] for row in back.context['clients']], names)
+
+
+class ClientSearchTests(TestCase):
+    """Tests de la recherche de clients sur la colonne normalisée"""
+
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(login='gerant', password='secret', role='Gestionnaire')
+        self.celine = Client.objects.create(
+            nom='Kouamé', prenom='Céline', email='Celine.K@exemple.ci', telephone='+225 07 08 09 10',
+        )
+        self.awa = Client.objects.create(nom='Diallo', prenom='Awa')
+
+    def _found(self, query):
+        return list(search.search_clients(query))
+
+    def test_accents_word_order_and_phone_digits(self):
+        """Test la recherche sans accents, dans le désordre et par téléphone sans espaces"""
+        self.assertEqual(self._found('celine kouame'), [self.celine])
+        self.assertEqual(self._found('KOUAMÉ cél'), [self.celine])
+        self.assertEqual(self._found('0708'), [self.celine])
+        self.assertEqual(self._found('exemple.ci'), [self.celine])
+        self.assertEqual(self._found('awa kouame'), [])
+        self.assertEqual(self._found('   '), [])
+
+    def test_search_column_follows_partial_saves(self):
+        """Test que la colonne de recherche suit un enregistrement avec update_fields"""
+        self.awa.nom = 'Sow'
+        self.awa.save(update_fields=['nom'])
+        self.awa.refresh_from_db()
+        self.assertEqual(self.awa.recherche, 'awa sow')
+        self.assertEqual(self._found('sow'), [self.awa])
+
+    def test_client_list_and_cashier_lookup(self):
+        """Test le filtre de la liste des clients et les suggestions de la caisse"""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('clients:index'), {'q': 'céline'})
+        self.assertEqual([row['name'] for row in response.context['clients']], ['Céline Kouamé'])
+
+        data = self.client.get(reverse('caisse:search_clients'), {'q': 'diallo'}).json()
+        self.assertEqual(data['clients'], [{'id': self.awa.id, 'label': 'Awa Diallo'}])
+
+
+class RfmScoreTests(SimpleTestCase):
+    """Tests des notes par quintile"""
+
+    def test_scores_by_quintile_with_ties(self):
+        """Test les notes de 1 à 5 et la même note pour les ex aequo"""
+        self.assertEqual(rfm.scores(list(range(10))), [1, 1, 2, 2, 3, 3, 4, 4, 5, 5])
+        self.assertEqual(rfm.scores([7, 7, 7]), [1, 1, 1])
+        self.assertEqual(rfm.scores([3, 1, 3, 2, 9]), [3, 1, 3, 2, 5])
+        self.assertEqual(rfm.scores([]), [])
+
+    def test_pure_python_matches_numpy(self):
+        """Test que le calcul sans NumPy donne les mêmes notes et segments"""
+        values = [5.0, 1.5, 3.0, 3.0, 8.25, 0.0, 3.0, 12.0, 7.5, 1.5, 4.0]
+        numpy = rfm.numpy
+        try:
+            rfm.numpy = None
+            expected = rfm.scores(values), rfm.segments([1, 5, 3], [5, 5, 1])
+        finally:
+            rfm.numpy = numpy
+        self.assertEqual((rfm.scores(values), rfm.segments([1, 5, 3], [5, 5, 1])), expected)
+        self.assertEqual(expected[1], ['a_risque', 'champions', 'occasionnels'])
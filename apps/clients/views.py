@@ -4,15 +4,17 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from urllib.parse import urlencode
 
-from django.core.paginator import Paginator
 from django.db import IntegrityError
-from django.db.models import Count, Max, Q, Sum, Value
-from django.db.models.functions import Coalesce, Concat, Lower
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
-from facturation.models import Client, Facture
+from facturation.models import Client, Facture, nom_complet_tri
+from facturation.pagination import KeysetPaginator
 from apps.gestionnaire.decorators import gestionnaire_required
+from . import metrics, search
+from .models import StatistiqueClient
 
 
 def _format_fcfa(amount: Decimal) -> str:
@@ -31,21 +33,24 @@ def _split_full_name(full_name: str):
     return parts[0], parts[1]
 
 
-def _serialize_client_row(client):
+def _serialize_client_row(statistiques):
+    client = statistiques.client
     full_name = " ".join(part for part in [client.prenom, client.nom] if part).strip() or "Client"
-    last_purchase = client.last_purchase.strftime("%d/%m/%Y") if client.last_purchase else "-"
-    status = "Actif" if (client.facture_count or 0) > 0 else "Inactif"
+    last_purchase = statistiques.derniere_facture
     return {
         "id": client.id,
         "name": full_name,
         "email": client.email or "",
         "phone": client.telephone or "",
         "address": client.adresse or "",
-        "total_spent_raw": client.total_spent or Decimal("0"),
-        "total_spent": _format_fcfa(client.total_spent or Decimal("0")),
-        "last_purchase": last_purchase,
-        "status": status,
-        "facture_count": client.facture_count or 0,
+        "total_spent_raw": statistiques.montant_total,
+        "total_spent": _format_fcfa(statistiques.montant_total),
+        "average_basket": _format_fcfa(statistiques.panier_moyen),
+        "last_purchase": last_purchase.strftime("%d/%m/%Y") if last_purchase else "-",
+        "status": "Actif" if statistiques.nb_factures > 0 else "Inactif",
+        "facture_count": statistiques.nb_factures,
+        "segment": statistiques.segment,
+        "segment_label": statistiques.get_segment_display(),
         "client_type": client.type or "anonyme",
     }
 
@@ -66,51 +71,55 @@ def clients_view(request):
     if page_size not in page_sizes:
         page_size = 10
 
-    clients_qs = Client.objects.annotate(
-        total_spent=Coalesce(Sum("facture__montant_TTC"), Decimal("0")),
-        last_purchase=Max("facture__date_facture"),
-        facture_count=Count("facture", distinct=True),
-        full_name_sort=Lower(
-            Concat(
-                Coalesce("prenom", Value("")),
-                Value(" "),
-                Coalesce("nom", Value("")),
-            )
-        ),
+    segment = (request.GET.get("segment") or "").strip()
+    segments = dict(StatistiqueClient.SEGMENT_CHOICES)
+    if segment not in segments:
+        segment = ""
+
+    # Statistiques précalculées (apps.clients.metrics) : tri et pagination sur
+    # des colonnes indexées, sans agréger les factures.
+    clients_qs = StatistiqueClient.objects.select_related("client").annotate(
+        # Même expression que l'index de tri de Client.
+        full_name_sort=nom_complet_tri("client__"),
     )
 
     if query:
-        clients_qs = clients_qs.filter(
-            Q(nom__icontains=query)
-            | Q(prenom__icontains=query)
-            | Q(email__icontains=query)
-            | Q(telephone__icontains=query)
-        )
+        clients_qs = search.filter_clients(clients_qs, query, prefix="client__")
+    if segment:
+        clients_qs = clients_qs.filter(segment=segment)
 
     sort_map = {
         "name": ("full_name_sort",),
-        "email": ("email",),
-        "phone": ("telephone",),
-        "total_spent": ("total_spent",),
-        "last_purchase": ("last_purchase",),
-        "status": ("facture_count",),
+        "email": ("client__email",),
+        "phone": ("client__telephone",),
+        "total_spent": ("montant_total",),
+        "average_basket": ("panier_moyen",),
+        "last_purchase": ("derniere_facture",),
+        "status": ("nb_factures",),
+        "segment": ("score_recence", "score_frequence", "score_montant"),
     }
-    sort_fields = sort_map.get(sort_key, ("nom", "prenom"))
+    sort_fields = sort_map.get(sort_key, ("full_name_sort",))
     order_fields = []
     for field in sort_fields:
         if direction == "desc":
             order_fields.append(f"-{field}")
         else:
             order_fields.append(field)
-    clients_qs = clients_qs.order_by(*order_fields, "nom", "prenom")
+    if sort_fields != ("full_name_sort",):
+        order_fields.append("full_name_sort")
 
-    paginator = Paginator(clients_qs, page_size)
-    page_obj = paginator.get_page(request.GET.get("page"))
-    clients = [_serialize_client_row(client) for client in page_obj.object_list]
+    # Pagination par clé : chaque page coûte autant que la première.
+    paginator = KeysetPaginator(clients_qs, page_size, order_fields)
+    page_obj = paginator.get_page(request.GET.get("cursor"))
+    clients = [_serialize_client_row(statistiques) for statistiques in page_obj.object_list]
 
     total_clients = Client.objects.count()
-    active_clients = Client.objects.filter(facture__isnull=False).distinct().count()
-    ca_total_clients = Facture.objects.aggregate(total=Coalesce(Sum("montant_TTC"), Decimal("0")))["total"]
+    summary = StatistiqueClient.objects.aggregate(
+        active=Count("client_id", filter=Q(nb_factures__gt=0)),
+        total=Coalesce(Sum("montant_total"), Decimal("0")),
+    )
+    active_clients = summary["active"]
+    ca_total_clients = summary["total"]
 
     def build_query(**overrides):
         params = request.GET.copy()
@@ -124,17 +133,21 @@ def clients_view(request):
     sort_urls = {}
     for key in sort_map.keys():
         next_dir = "desc" if (sort_key == key and direction == "asc") else "asc"
-        sort_urls[key] = f"?{build_query(sort=key, dir=next_dir, page=1)}"
+        sort_urls[key] = f"?{build_query(sort=key, dir=next_dir, cursor=None)}"
 
     context = {
         "clients": clients,
         "page_obj": page_obj,
+        "previous_url": f"?{build_query(cursor=page_obj.previous_cursor)}" if page_obj.previous_cursor else None,
+        "next_url": f"?{build_query(cursor=page_obj.next_cursor)}" if page_obj.next_cursor else None,
         "page_sizes": page_sizes,
         "current_page_size": page_size,
         "sort_key": sort_key,
         "direction": direction,
         "sort_urls": sort_urls,
         "query": query,
+        "segment": segment,
+        "segments": StatistiqueClient.SEGMENT_CHOICES,
         "total_clients": total_clients,
         "active_clients": active_clients,
         "ca_total_clients": _format_fcfa(ca_total_clients or Decimal("0")),
@@ -210,14 +223,8 @@ def update_client(request, client_id):
 @login_required
 @gestionnaire_required
 def client_details(request, client_id):
-    client = get_object_or_404(
-        Client.objects.annotate(
-            total_spent=Coalesce(Sum("facture__montant_TTC"), Decimal("0")),
-            last_purchase=Max("facture__date_facture"),
-            facture_count=Count("facture", distinct=True),
-        ),
-        id=client_id,
-    )
+    client = get_object_or_404(Client, id=client_id)
+    statistiques = StatistiqueClient.objects.filter(client_id=client.id).first() or metrics.refresh(client.id)
 
     full_name = " ".join(part for part in [client.prenom, client.nom] if part).strip() or "Client"
     history = [
@@ -236,9 +243,13 @@ def client_details(request, client_id):
             "email": client.email,
             "phone": client.telephone,
             "address": client.adresse or "Non renseigné",
-            "total_spent": _format_fcfa(client.total_spent or Decimal("0")),
-            "last_purchase": client.last_purchase.strftime("%d/%m/%Y") if client.last_purchase else "-",
-            "status": "Actif" if (client.facture_count or 0) > 0 else "Inactif",
+            "total_spent": _format_fcfa(statistiques.montant_total),
+            "average_basket": _format_fcfa(statistiques.panier_moyen),
+            "last_purchase": (
+                statistiques.derniere_facture.strftime("%d/%m/%Y") if statistiques.derniere_facture else "-"
+            ),
+            "status": "Actif" if statistiques.nb_factures > 0 else "Inactif",
+            "segment": statistiques.get_segment_display(),
             "history": history,
         }
     )
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from django.urls import NoReverseMatch, reverse
 from apps.parametre.models import Configuration
 
@@ -10,14 +12,14 @@ def _safe_reverse(candidates, fallback="#"):
             continue
     return fallback
 
-def sidebar_context(request):
+
+@lru_cache(maxsize=None)
+def _navigation(user_role):
     """
-    Context processor for the sidebar.
-    Filtre les éléments selon le rôle de l'utilisateur.
+    Éléments de navigation visibles pour un rôle.
+    Calculés une seule fois par rôle et par processus : les URL ne changent pas
+    sans redémarrage.
     """
-    # Déterminer le rôle de l'utilisateur
-    user_role = getattr(request.user, 'role', None) if request.user.is_authenticated else None
-    
     # Tous les éléments de navigation
     all_items = [
         {
@@ -70,15 +72,34 @@ def sidebar_context(request):
             'roles': ['Gestionnaire'],
         },
     ]
-    
+
     # Filtrer les éléments selon le rôle
-    items = []
-    for item in all_items:
-        if 'all' in item['roles'] or user_role in item['roles']:
-            items.append(item)
+    return tuple(
+        item for item in all_items
+        if 'all' in item['roles'] or user_role in item['roles']
+    )
+
+
+@lru_cache(maxsize=None)
+def _auth_urls():
+    return (
+        _safe_reverse(['authentification:login', 'login']),
+        _safe_reverse(['authentification:logout', 'logout']),
+    )
+
+
+def sidebar_context(request):
+    """
+    Context processor for the sidebar.
+    Filtre les éléments selon le rôle de l'utilisateur.
+    """
+    # Déterminer le rôle de l'utilisateur
+    user_role = getattr(request.user, 'role', None) if request.user.is_authenticated else None
 
     current_path = request.path or '/'
-    for item in items:
+    items = []
+    for item in _navigation(user_role):
+        item = dict(item)
         item_url = item['url']
         if item_url == '/' or item_url == '#':
             item['is_active'] = current_path == '/'
@@ -88,11 +109,15 @@ def sidebar_context(request):
                 item['is_active'] = remaining == '' or remaining.startswith('/')
             else:
                 item['is_active'] = False
+        items.append(item)
 
-    try:
-        config = Configuration.objects.first()
-    except Exception:
-        config = None
+    # Une seule lecture par requête, même si plusieurs templates sont rendus.
+    if not hasattr(request, '_store_configuration'):
+        try:
+            request._store_configuration = Configuration.get_solo()
+        except Exception:
+            request._store_configuration = None
+    config = request._store_configuration
     store_name = (config.nom_magasin if config and config.nom_magasin else "Caisse Plus")
     store_description = (
         config.description_accueil
@@ -101,10 +126,11 @@ def sidebar_context(request):
     )
     store_logo_url = config.logo.url if config and config.logo else None
 
+    login_url, logout_url = _auth_urls()
     return {
         'sidebar_items': items,
-        'login_url': _safe_reverse(['authentification:login', 'login']),
-        'logout_url': _safe_reverse(['authentification:logout', 'logout']),
+        'login_url': login_url,
+        'logout_url': logout_url,
         'user_role': user_role,
         'store_name': store_name,
         'store_description': store_description,
@@ -0,0 +1,123 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Exists, F, OuterRef, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from facturation.models import Article, Client, Facture
+from apps.clients.models import StatistiqueClient
+from apps.report.models import FactureJournaliere, VenteJournaliere
+from apps.report.rollups import debut_jour
+
+# Fenêtre des indicateurs « récents » et de la courbe des ventes, en jours.
+DASHBOARD_PERIOD_DAYS = 30
+TOP_LIMIT = 5
+
+
+class DashboardService:
+    """
+    Indicateurs du tableau de bord.
+    Chaque bloc est calculé en une requête (agrégats conditionnels) :
+    le nombre de requêtes ne dépend ni du volume de données ni de la période.
+    """
+
+    @staticmethod
+    def get_sales_kpis(since):
+        """Chiffre d'affaires et nombre de factures, au total et depuis `since`"""
+        recent = Q(jour__gte=since)
+        sales = FactureJournaliere.objects.aggregate(
+            total_sales=Coalesce(Sum('montant_TTC'), Decimal('0')),
+            recent_sales=Coalesce(Sum('montant_TTC', filter=recent), Decimal('0')),
+            total_invoices=Coalesce(Sum('nb_factures'), 0),
+            recent_invoices=Coalesce(Sum('nb_factures', filter=recent), 0),
+        )
+        total_invoices = sales['total_invoices']
+        sales['avg_cart'] = (sales['total_sales'] / total_invoices) if total_invoices else Decimal('0')
+        return sales
+
+    @staticmethod
+    def get_article_kpis():
+        """Compteurs du catalogue"""
+        actif = Q(actif=True)
+        return Article.objects.aggregate(
+            total_articles=Count('id'),
+            active_articles=Count('id', filter=actif),
+            low_stock_articles=Count('id', filter=actif & Q(stock_actuel__lte=F('stock_minimum'))),
+            out_of_stock_articles=Count('id', filter=actif & Q(stock_actuel=0)),
+        )
+
+    @staticmethod
+    def get_client_kpis(since):
+        """Clients enregistrés, clients ayant acheté, et clients ayant acheté depuis `since`"""
+        has_invoice = Exists(Facture.objects.filter(client=OuterRef('pk')))
+        has_recent_invoice = Exists(
+            Facture.objects.filter(client=OuterRef('pk'), date_facture__gte=debut_jour(since))
+        )
+        return Client.objects.aggregate(
+            total_clients=Count('id'),
+            active_clients=Count('id', filter=Q(has_invoice)),
+            new_clients_30d=Count('id', filter=Q(has_recent_invoice)),
+        )
+
+    @staticmethod
+    def get_sales_by_day(since, until):
+        """Ventes TTC par jour de `since` à `until` inclus, jours sans vente compris"""
+        daily_totals = dict(
+            FactureJournaliere.objects.filter(jour__gte=since, jour__lte=until)
+            .values('jour')
+            .annotate(total=Sum('montant_TTC'))
+            .values_list('jour', 'total')
+        )
+        days = (until - since).days
+        return [
+            {
+                'date': (since + timedelta(days=i)).strftime('%d/%m'),
+                'amount': float(daily_totals.get(since + timedelta(days=i)) or 0),
+            }
+            for i in range(days + 1)
+        ]
+
+    @staticmethod
+    def get_payment_methods():
+        """Ventes par mode de paiement"""
+        return FactureJournaliere.objects.values('mode_paiement').annotate(
+            count=Sum('nb_factures'),
+            total=Sum('montant_TTC')
+        ).filter(count__gt=0).order_by('-total')
+
+    @staticmethod
+    def get_top_articles(limit=TOP_LIMIT):
+        """Articles les plus vendus"""
+        return VenteJournaliere.objects.values(
+            'article__nom', 'article__code_barres'
+        ).annotate(
+            total_qty=Sum('quantite'),
+            total_revenue=Sum('total_ttc')
+        ).filter(total_qty__gt=0).order_by('-total_qty')[:limit]
+
+    @staticmethod
+    def get_top_clients(limit=TOP_LIMIT):
+        """Clients ayant le plus dépensé (factures payées, statistiques précalculées)"""
+        return StatistiqueClient.objects.filter(nb_factures__gt=0).values(
+            'client__nom', 'client__prenom',
+            total_spent=F('montant_total'),
+            invoice_count=F('nb_factures'),
+        ).order_by('-montant_total')[:limit]
+
+    @staticmethod
+    def get_metrics(today=None):
+        """Contexte complet du tableau de bord"""
+        today = today or timezone.localdate()
+        since = today - timedelta(days=DASHBOARD_PERIOD_DAYS)
+        return {
+            **DashboardService.get_sales_kpis(since),
+            **DashboardService.get_article_kpis(),
+            **DashboardService.get_client_kpis(since),
+            'top_articles': DashboardService.get_top_articles(),
+            'top_clients': DashboardService.get_top_clients(),
+            'sales_by_day': DashboardService.get_sales_by_day(since, today),
+            'payment_methods': DashboardService.get_payment_methods(),
+            'period_start': since.strftime('%d/%m/%Y'),
+            'period_end': today.strftime('%d/%m/%Y'),
+        }
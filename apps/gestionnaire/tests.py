@@ -0,0 +1,135 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.caisse.services import CheckoutService
+from facturation.models import Article, Client, Facture, Utilisateur
+from apps.parametre.models import Configuration
+from .context_processors import sidebar_context
+from .services import DashboardService
+
+# Requêtes d'un affichage du tableau de bord : session, utilisateur, puis
+# 7 requêtes d'indicateurs (la configuration du magasin est en cache).
+DASHBOARD_QUERY_BUDGET = 9
+
+
+class DashboardServiceTests(TestCase):
+    """Tests des indicateurs du tableau de bord"""
+
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(login='gerant', password='secret', role='Gestionnaire')
+        self.client.force_login(self.user)
+        self.client_obj = Client.objects.create(nom='Diallo', prenom='Awa', type='fidele')
+        Client.objects.create(nom='Sans achat', type='anonyme')
+        self.articles = [
+            Article.objects.create(
+                code_barres=f'400000000000{i}',
+                nom=f'Article {i}',
+                prix_HT=Decimal('100.00'),
+                prix_TTC=Decimal('118.00'),
+                taux_TVA=Decimal('0.18'),
+                stock_actuel=20,
+                stock_minimum=5,
+            )
+            for i in range(3)
+        ]
+        Article.objects.filter(pk=self.articles[2].pk).update(stock_actuel=0)
+
+    def _sell(self, quantite=1):
+        return CheckoutService.create_facture(
+            [{'article_id': self.articles[0].id, 'quantite': quantite}],
+            client=self.client_obj,
+            caissier=None,
+        )
+
+    def test_metrics(self):
+        """Test les indicateurs calculés par agrégats conditionnels"""
+        self._sell(2)
+        self._sell(1)
+        cancelled = self._sell(4)
+        cancelled.statut = 'annulee'
+        cancelled.save()
+
+        metrics = DashboardService.get_metrics()
+
+        self.assertEqual(metrics['total_invoices'], 2)
+        self.assertEqual(metrics['recent_invoices'], 2)
+        self.assertEqual(metrics['total_sales'], Decimal('354.00'))
+        self.assertEqual(metrics['avg_cart'], Decimal('177.00'))
+        self.assertEqual(metrics['total_articles'], 3)
+        self.assertEqual(metrics['active_articles'], 3)
+        self.assertEqual(metrics['out_of_stock_articles'], 1)
+        self.assertEqual(metrics['low_stock_articles'], 1)
+        self.assertEqual(metrics['total_clients'], 2)
+        self.assertEqual(metrics['active_clients'], 1)
+        self.assertEqual(metrics['new_clients_30d'], 1)
+        self.assertEqual(len(metrics['sales_by_day']), 31)
+        self.assertEqual(metrics['sales_by_day'][-1]['amount'], 354.0)
+        self.assertEqual(metrics['top_articles'][0]['total_qty'], 3)
+        self.assertEqual(
+            list(metrics['top_clients']),
+            [{'client__nom': 'Diallo', 'client__prenom': 'Awa', 'total_spent': Decimal('354.00'), 'invoice_count': 2}],
+        )
+
+    def test_query_budget(self):
+        """Test que le nombre de requêtes du tableau de bord reste fixe quel que soit l'historique"""
+        for days_ago in range(0, 40, 4):
+            facture = self._sell()
+            Facture.objects.filter(pk=facture.pk).update(
+                date_facture=timezone.now() - timedelta(days=days_ago)
+            )
+
+        self.client.get(reverse('gestionnaire:dashboard'))
+        with self.assertNumQueries(DASHBOARD_QUERY_BUDGET):
+            response = self.client.get(reverse('gestionnaire:dashboard'))
+        self.assertEqual(response.status_code, 200)
+
+
+class SidebarContextTests(TestCase):
+    """Tests du context processor de la sidebar"""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.caissier = Utilisateur.objects.create_user(login='caissier', password='secret', role='Caissier')
+        self.gerant = Utilisateur.objects.create_user(login='gerant', password='secret', role='Gestionnaire')
+
+    def _context(self, user, path='/rapport/'):
+        request = self.factory.get(path)
+        request.user = user
+        return sidebar_context(request)
+
+    def test_items_filtered_by_role(self):
+        """Test que la navigation dépend du rôle et de la page courante"""
+        caissier_ids = [item['id'] for item in self._context(self.caissier)['sidebar_items']]
+        self.assertEqual(caissier_ids, ['dashboard', 'caisse'])
+
+        items = self._context(self.gerant)['sidebar_items']
+        self.assertEqual(len(items), 7)
+        self.assertEqual([item['id'] for item in items if item['is_active']], ['reports'])
+        # Les éléments précalculés ne sont pas modifiés d'une requête à l'autre.
+        other = self._context(self.gerant, path='/caisse/')['sidebar_items']
+        self.assertEqual([item['id'] for item in other if item['is_active']], ['caisse'])
+        self.assertEqual([item['id'] for item in items if item['is_active']], ['reports'])
+
+    def test_configuration_cached_until_saved(self):
+        """Test que la configuration est lue en cache et invalidée à l'enregistrement"""
+        config = Configuration.objects.create(nom_magasin='Boutique Awa')
+        self.assertEqual(self._context(self.gerant)['store_name'], 'Boutique Awa')
+        with self.assertNumQueries(0):
+            self.assertEqual(self._context(self.gerant)['store_name'], 'Boutique Awa')
+
+        config.nom_magasin = 'Supermarché Awa'
+        with self.captureOnCommitCallbacks(execute=True):
+            config.save()
+            # Invalidé seulement après validation : une lecture concurrente ne remet pas l'ancienne valeur.
+            self.assertEqual(self._context(self.gerant)['store_name'], 'Boutique Awa')
+        self.assertEqual(self._context(self.gerant)['store_name'], 'Supermarché Awa')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            config.delete()
+        self.assertEqual(self._context(self.gerant)['store_name'], 'Caisse Plus')
@@ -1,5 +1,15 @@
+from django.core.cache import cache
 from django.db import models
 
+# Clé de cache de la configuration du magasin (lue à chaque page via la sidebar).
+CONFIGURATION_CACHE_KEY = "parametre:configuration"
+# Marqueur mis en cache quand aucune configuration n'existe encore.
+_NO_CONFIGURATION = "absente"
+# Durée de vie maximale, par sécurité si plusieurs processus n'invalident pas
+# un cache partagé (cache local à chaque processus).
+CONFIGURATION_TIMEOUT = 300
+
+
 class Configuration(models.Model):
     nom_magasin = models.CharField(max_length=255, default="Caisse Plus")
     description_accueil = models.CharField(
@@ -20,3 +30,16 @@ class Configuration(models.Model):
 
     def __str__(self):
         return self.nom_magasin
+
+    @classmethod
+    def get_solo(cls):
+        """Configuration du magasin (ou None), lue dans le cache (invalidé par les signaux)"""
+        config = cache.get(CONFIGURATION_CACHE_KEY)
+        if config is None:
+            config = cls.objects.first()
+            cache.set(
+                CONFIGURATION_CACHE_KEY,
+                config if config is not None else _NO_CONFIGURATION,
+                timeout=CONFIGURATION_TIMEOUT,
+            )
+        return None if isinstance(config, str) else config
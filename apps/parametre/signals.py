@@ -0,0 +1,13 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import CONFIGURATION_CACHE_KEY, Configuration
+
+
+@receiver(post_save, sender=Configuration)
+@receiver(post_delete, sender=Configuration)
+def invalidate_configuration(sender, instance, **kwargs):
+    """Invalide la configuration en cache après validation de la transaction"""
+    transaction.on_commit(lambda: cache.delete(CONFIGURATION_CACHE_KEY))
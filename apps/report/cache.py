@@ -0,0 +1,88 @@
+"""
+Cache des rapports.
+
+Les données de ventes sont mises en cache par (période, début du bucket) dans le
+cache Django. Un bucket clos (jours passés) ne change presque plus : il est
+conservé longtemps (CLOSED_BUCKET_TIMEOUT). Le bucket ouvert (celui qui contient aujourd'hui) est indexé
+par un numéro de génération, incrémenté après chaque écriture de facture :
+les entrées périmées ne sont plus lues et sortent du cache d'elles-mêmes.
+
+Une facture d'un jour passé modifiée ou supprimée incrémente aussi la
+génération des buckets clos.
+"""
+import time
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import rollups
+
+CACHE_PREFIX = "report"
+OPEN_GENERATION_KEY = f"{CACHE_PREFIX}:generation:open"
+CLOSED_GENERATION_KEY = f"{CACHE_PREFIX}:generation:closed"
+
+# Durée de vie maximale du bucket ouvert, par sécurité si plusieurs processus
+# n'invalident pas un cache partagé (cache local à chaque processus).
+OPEN_BUCKET_TIMEOUT = 300
+# Durée de vie des buckets clos : une correction d'une facture passée (annulation,
+# remboursement) n'invalide que le cache du processus qui l'a faite.
+CLOSED_BUCKET_TIMEOUT = 3600
+
+
+def _new_generation():
+    # Jamais réutilisée : une clé évincée ne ressuscite pas d'anciennes entrées.
+    return time.time_ns()
+
+
+def _generation(key):
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, _new_generation(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump(closed=False):
+    """Invalide le bucket ouvert, et les buckets clos si `closed`"""
+    keys = [OPEN_GENERATION_KEY]
+    if closed:
+        keys.append(CLOSED_GENERATION_KEY)
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_generation(), timeout=None)
+
+
+def get_bucket(name, bucket_start, closed, builder):
+    """
+    Retourne la valeur en cache pour (name, bucket_start), calculée par
+    `builder` si absente. La valeur doit être sérialisable (pas de QuerySet).
+    """
+    generation = _generation(CLOSED_GENERATION_KEY if closed else OPEN_GENERATION_KEY)
+    key = f"{CACHE_PREFIX}:{name}:{bucket_start.isoformat()}:{generation}"
+    value = cache.get(key)
+    if value is None:
+        value = builder()
+        cache.set(key, value, timeout=CLOSED_BUCKET_TIMEOUT if closed else OPEN_BUCKET_TIMEOUT)
+    return value
+
+
+def totaux(start, end):
+    """
+    rollups.totaux avec cache : les jours complets sont lus dans le cache (clos
+    s'ils sont tous passés), les bords en cours de journée restent calculés.
+    """
+    premier_jour, dernier_jour, partiels = rollups.decouper(start, end)
+    if premier_jour <= dernier_jour:
+        result = get_bucket(
+            f"totaux:{dernier_jour.isoformat()}",
+            premier_jour,
+            dernier_jour < timezone.localdate(),
+            lambda: rollups.rollup_totaux(premier_jour, dernier_jour),
+        ).copy()
+    else:
+        result = rollups.empty_totaux()
+    for partiel_start, partiel_end in partiels:
+        rollups.add_totaux(result, rollups.raw_totaux(partiel_start, partiel_end))
+    return result
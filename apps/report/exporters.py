@@ -0,0 +1,275 @@
+"""
+Extractions de données brutes pour la BI : catalogue, factures et lignes de facture.
+
+Un jeu de données (Dataset) décrit les colonnes lues en base ; un format
+(Exporter) les sérialise en flux d'octets. Les lignes sont lues par lots avec
+un curseur (values_list().iterator()) et chaque lot est envoyé dès qu'il est
+encodé : la mémoire ne dépend pas de la taille de l'extraction.
+
+`since` rend les extractions incrémentales : un entier ne garde que les lignes
+d'identifiant supérieur, une date ou un horodatage ISO celles modifiées
+(ou créées) après cet instant.
+
+Formats : csv, jsonl, ndjson.gz, et parquet si pyarrow est installé.
+"""
+import csv
+import datetime
+import io
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from facturation.models import Article, DetailFacture, Facture
+from .rollups import debut_jour
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+EXPORT_CHUNK_SIZE = 5000
+
+
+class Dataset:
+    """Colonnes exportées d'un modèle ; `since_field` porte l'horodatage incrémental"""
+
+    def __init__(self, model, columns, since_field):
+        self.model = model
+        # (nom de colonne, chemin ORM)
+        self.columns = [column if isinstance(column, tuple) else (column, column) for column in columns]
+        self.since_field = since_field
+
+    @property
+    def names(self):
+        return [name for name, _ in self.columns]
+
+    def field(self, path):
+        """Champ du modèle désigné par un chemin ORM (facture__date_facture)"""
+        model = self.model
+        *relations, name = path.split('__')
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        field = model._meta.get_field(name)
+        return field.target_field if field.is_relation else field
+
+    def fields(self):
+        return [(name, self.field(path)) for name, path in self.columns]
+
+    def rows(self, since=None, chunk_size=EXPORT_CHUNK_SIZE):
+        queryset = self.model.objects.all()
+        if isinstance(since, int):
+            queryset = queryset.filter(pk__gt=since)
+        elif since is not None:
+            queryset = queryset.filter(**{f'{self.since_field}__gt': since})
+        paths = [path for _, path in self.columns]
+        return queryset.order_by('pk').values_list(*paths).iterator(chunk_size=chunk_size)
+
+
+DATASETS = {
+    'articles': Dataset(
+        Article,
+        [
+            'id', 'code_barres', 'nom', 'description', 'prix_HT', 'prix_TTC', 'taux_TVA',
+            'categorie', 'unite_mesure', 'stock_actuel', 'stock_minimum', 'actif', 'date_modification',
+        ],
+        since_field='date_modification',
+    ),
+    'factures': Dataset(
+        Facture,
+        [
+            'id', 'date_facture', 'montant_HT', 'montant_TVA', 'montant_TTC', 'mode_paiement',
+            'statut', 'client_id', 'caissier_id', 'reference_caisse', 'date_modification',
+        ],
+        # Une facture annulée ou remboursée depuis la dernière extraction est renvoyée.
+        since_field='date_modification',
+    ),
+    'lignes': Dataset(
+        DetailFacture,
+        [
+            'id', 'facture_id', ('date_facture', 'facture__date_facture'), 'article_id',
+            'quantite', 'prix_unitaire', 'remise', 'total_ligne',
+        ],
+        since_field='facture__date_modification',
+    ),
+}
+
+
+def parse_since(value):
+    """
+    '1234' -> identifiant ; '2026-01-31' ou '2026-01-31T08:00:00' -> datetime aware.
+    Lève ValueError si la valeur n'est pas reconnue.
+    """
+    value = (value or '').strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    moment = parse_datetime(value)
+    if moment is None:
+        jour = parse_date(value)
+        if jour is None:
+            raise ValueError(f"since invalide : {value!r} (identifiant, date ou horodatage ISO attendu)")
+        return debut_jour(jour)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Exporter:
+    """Format d'export : `stream` produit les octets du fichier, lot par lot"""
+
+    extension = ''
+    content_type = 'application/octet-stream'
+
+    def stream(self, dataset, rows, chunk_size=EXPORT_CHUNK_SIZE):
+        raise NotImplementedError
+
+
+class CsvExporter(Exporter):
+    extension = 'csv'
+    content_type = 'text/csv; charset=utf-8'
+
+    def stream(self, dataset, rows, chunk_size=EXPORT_CHUNK_SIZE):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(dataset.names)
+        for batch in _batches(rows, chunk_size):
+            writer.writerows(batch)
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode('utf-8')
+
+
+class JsonLinesExporter(Exporter):
+    """Un objet JSON par ligne ; décimaux en chaînes (valeur exacte), dates en ISO 8601"""
+
+    extension = 'jsonl'
+    content_type = 'application/x-ndjson'
+
+    def lines(self, dataset, rows, chunk_size):
+        names = dataset.names
+        encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+        for batch in _batches(rows, chunk_size):
+            yield ''.join(encoder.encode(dict(zip(names, row))) + '\n' for row in batch).encode('utf-8')
+
+    def stream(self, dataset, rows, chunk_size=EXPORT_CHUNK_SIZE):
+        return self.lines(dataset, rows, chunk_size)
+
+
+class GzipJsonLinesExporter(JsonLinesExporter):
+    extension = 'ndjson.gz'
+    content_type = 'application/gzip'
+
+    def stream(self, dataset, rows, chunk_size=EXPORT_CHUNK_SIZE):
+        # wbits=31 : conteneur gzip, lisible par gunzip et zcat.
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for data in self.lines(dataset, rows, chunk_size):
+            compressed = compressor.compress(data)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+
+class _Sink(io.RawIOBase):
+    """Fichier en écriture seule dont le contenu est vidé après chaque lot"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+class ParquetExporter(Exporter):
+    """Parquet colonnaire, un groupe de lignes par lot (nécessite pyarrow)"""
+
+    extension = 'parquet'
+    content_type = 'application/vnd.apache.parquet'
+
+    @staticmethod
+    def arrow_type(field):
+        if isinstance(field, models.DecimalField):
+            return pyarrow.decimal128(field.max_digits, field.decimal_places)
+        if isinstance(field, models.BooleanField):
+            return pyarrow.bool_()
+        if isinstance(field, models.IntegerField):
+            return pyarrow.int64()
+        if isinstance(field, models.DateTimeField):
+            return pyarrow.timestamp('us', tz='UTC')
+        if isinstance(field, models.DateField):
+            return pyarrow.date32()
+        return pyarrow.string()
+
+    def stream(self, dataset, rows, chunk_size=EXPORT_CHUNK_SIZE):
+        schema = pyarrow.schema([(name, self.arrow_type(field)) for name, field in dataset.fields()])
+        sink = _Sink()
+        writer = pyarrow.parquet.ParquetWriter(sink, schema, compression='zstd')
+        try:
+            for batch in _batches(rows, chunk_size):
+                columns = list(zip(*batch))
+                writer.write_table(pyarrow.Table.from_arrays(
+                    [pyarrow.array(column, type=field.type) for column, field in zip(columns, schema)],
+                    schema=schema,
+                ))
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+
+
+EXPORTERS = {
+    exporter.extension: exporter
+    for exporter in (CsvExporter(), JsonLinesExporter(), GzipJsonLinesExporter())
+}
+if pyarrow is not None:
+    EXPORTERS[ParquetExporter.extension] = ParquetExporter()
+
+
+def export(dataset_name, fmt, since=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Octets de l'extraction `dataset_name` au format `fmt`.
+    Lève KeyError si le jeu de données ou le format est inconnu.
+    """
+    dataset = DATASETS[dataset_name]
+    exporter = EXPORTERS[fmt]
+    return exporter.stream(dataset, dataset.rows(since, chunk_size), chunk_size)
+
+
+def filename(dataset_name, fmt, since=None):
+    suffix = ''
+    if isinstance(since, int):
+        suffix = f'_depuis_{since}'
+    elif isinstance(since, datetime.datetime):
+        suffix = f"_depuis_{timezone.localtime(since):%Y%m%dT%H%M%S}"
+    return f'{dataset_name}{suffix}.{fmt}'
@@ -0,0 +1,85 @@
+"""
+Lecture incrémentale des factures, par curseur sur l'identifiant.
+
+Chaque page est lue avec `id > curseur ORDER BY id LIMIT n` (parcours de la
+clé primaire, sans OFFSET) et ses lignes en une seule requête supplémentaire.
+Le curseur suivant est l'identifiant de la dernière facture renvoyée : un
+consommateur le conserve et le repasse pour suivre les ventes au fil de l'eau.
+
+Les factures des dernières secondes ne sont pas encore renvoyées : un
+identifiant est attribué avant la validation de sa transaction, et une
+facture validée après une facture d'identifiant supérieur serait sinon
+sautée par le curseur.
+"""
+from datetime import timedelta
+
+from django.db.models import Prefetch, prefetch_related_objects
+from django.utils import timezone
+
+from facturation.models import DetailFacture, Facture
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+SETTLE_DELAY = timedelta(seconds=5)
+
+
+def parse_page_params(after, limit):
+    """(curseur, taille de page) depuis la requête ; lève ValueError si invalides"""
+    after = int(after or 0)
+    limit = int(limit or DEFAULT_PAGE_SIZE)
+    if after < 0 or limit < 1:
+        raise ValueError("after et limit doivent être positifs")
+    return after, min(limit, MAX_PAGE_SIZE)
+
+
+def _serialize_facture(facture):
+    return {
+        'id': facture.id,
+        'date_facture': facture.date_facture.isoformat(),
+        'statut': facture.statut,
+        'mode_paiement': facture.mode_paiement,
+        'montant_HT': str(facture.montant_HT),
+        'montant_TVA': str(facture.montant_TVA),
+        'montant_TTC': str(facture.montant_TTC),
+        'client_id': facture.client_id,
+        'caissier_id': facture.caissier_id,
+        'reference_caisse': facture.reference_caisse,
+        'lignes': [
+            {
+                'id': ligne.id,
+                'article_id': ligne.article_id,
+                'code_barres': ligne.article.code_barres,
+                'nom': ligne.article.nom,
+                'quantite': ligne.quantite,
+                'prix_unitaire': str(ligne.prix_unitaire),
+                'remise': str(ligne.remise),
+                'total_ligne': str(ligne.total_ligne),
+            }
+            for ligne in facture.details.all()
+        ],
+    }
+
+
+def facture_page(after=0, limit=DEFAULT_PAGE_SIZE, settle=SETTLE_DELAY):
+    """
+    Page de factures d'identifiant > `after`, avec leurs lignes.
+    Retourne {'factures', 'next_cursor', 'has_more'} ; `next_cursor` reste
+    `after` si la page est vide.
+    """
+    lignes = DetailFacture.objects.select_related('article').only(
+        'id', 'facture_id', 'article_id', 'quantite', 'prix_unitaire', 'remise', 'total_ligne',
+        'article__code_barres', 'article__nom',
+    ).order_by('id')
+    factures = list(
+        Facture.objects.filter(pk__gt=after, date_facture__lte=timezone.now() - settle)
+        .order_by('pk')[:limit + 1]
+    )
+    # Une facture de plus que demandé indique s'il reste une page.
+    has_more = len(factures) > limit
+    factures = factures[:limit]
+    prefetch_related_objects(factures, Prefetch('details', queryset=lignes))
+    return {
+        'factures': [_serialize_facture(facture) for facture in factures],
+        'next_cursor': factures[-1].id if factures else after,
+        'has_more': has_more,
+    }
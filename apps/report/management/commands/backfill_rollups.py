@@ -0,0 +1,27 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.report import cache as report_cache
+from apps.report import rollups
+
+
+class Command(BaseCommand):
+    help = "Recalcule les agrégats journaliers des ventes à partir des factures"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='Premier jour à recalculer (AAAA-MM-JJ) ; tout l\'historique par défaut',
+        )
+
+    def handle(self, *args, **options):
+        depuis = None
+        if options['since']:
+            try:
+                depuis = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError("Date invalide, format attendu : AAAA-MM-JJ")
+        created = rollups.rebuild(depuis)
+        report_cache.bump(closed=True)
+        self.stdout.write(self.style.SUCCESS(f"{created} ligne(s) d'agrégat recalculée(s)"))
@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.report import exporters
+
+
+class Command(BaseCommand):
+    help = "Extrait les articles, factures ou lignes de facture pour la BI (csv, jsonl, ndjson.gz, parquet)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(exporters.DATASETS))
+        parser.add_argument(
+            '--format', dest='fmt', default='ndjson.gz',
+            help=f"Format de sortie : {', '.join(sorted(exporters.EXPORTERS))}",
+        )
+        parser.add_argument('--since', help='Identifiant, date ou horodatage ISO : seules les lignes suivantes')
+        parser.add_argument('--output', '-o', help='Fichier de sortie ; nom par défaut dans le dossier courant, - pour stdout')
+
+    def handle(self, *args, **options):
+        fmt = options['fmt']
+        if fmt not in exporters.EXPORTERS:
+            raise CommandError(
+                f"Format inconnu : {fmt} (disponibles : {', '.join(sorted(exporters.EXPORTERS))} ; "
+                "parquet nécessite pyarrow)"
+            )
+        try:
+            since = exporters.parse_since(options['since'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        output = options['output'] or exporters.filename(options['dataset'], fmt, since)
+        chunks = exporters.export(options['dataset'], fmt, since)
+        if output == '-':
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+        size = 0
+        with open(output, 'wb') as fichier:
+            for chunk in chunks:
+                fichier.write(chunk)
+                size += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f"{output} écrit ({size / 1024:.1f} Ko)"))
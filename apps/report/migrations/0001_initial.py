@@ -0,0 +1,52 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('facturation', '0010_article_date_modification_facture_reference_caisse'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FactureJournaliere',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('mode_paiement', models.CharField(blank=True, default='', max_length=20)),
+                ('nb_factures', models.IntegerField(default=0)),
+                ('montant_HT', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('montant_TVA', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('montant_TTC', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Facturation journalière',
+                'verbose_name_plural': 'Facturations journalières',
+                'constraints': [models.UniqueConstraint(fields=('jour', 'mode_paiement'), name='report_facture_journaliere_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VenteJournaliere',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('mode_paiement', models.CharField(blank=True, default='', max_length=20)),
+                ('taux_TVA', models.DecimalField(decimal_places=3, default=0, max_digits=5)),
+                ('quantite', models.BigIntegerField(default=0)),
+                ('nb_lignes', models.IntegerField(default=0)),
+                ('total_ht', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_ttc', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='facturation.article')),
+            ],
+            options={
+                'verbose_name': 'Vente journalière',
+                'verbose_name_plural': 'Ventes journalières',
+                'constraints': [models.UniqueConstraint(fields=('jour', 'article', 'mode_paiement', 'taux_TVA'), name='report_vente_journaliere_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='facturejournaliere',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='ventejournaliere',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
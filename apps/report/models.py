@@ -0,0 +1,55 @@
+from django.db import models
+
+
+class VenteJournaliere(models.Model):
+    """Lignes vendues agrégées par jour, article, mode de paiement et taux de TVA"""
+
+    jour = models.DateField()
+    article = models.ForeignKey("facturation.Article", on_delete=models.CASCADE, related_name="+")
+    mode_paiement = models.CharField(max_length=20, blank=True, default="")
+    taux_TVA = models.DecimalField(max_digits=5, decimal_places=3, default=0)
+    quantite = models.BigIntegerField(default=0)
+    nb_lignes = models.IntegerField(default=0)
+    total_ht = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_ttc = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Mise à jour par chaque upsert (voir rollups._upsert).
+    date_modification = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Vente journalière"
+        verbose_name_plural = "Ventes journalières"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["jour", "article", "mode_paiement", "taux_TVA"],
+                name="report_vente_journaliere_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.jour} - article {self.article_id} x {self.quantite}"
+
+
+class FactureJournaliere(models.Model):
+    """Factures agrégées par jour et mode de paiement"""
+
+    jour = models.DateField()
+    mode_paiement = models.CharField(max_length=20, blank=True, default="")
+    nb_factures = models.IntegerField(default=0)
+    montant_HT = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    montant_TVA = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    montant_TTC = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Mise à jour par chaque upsert (voir rollups._upsert).
+    date_modification = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Facturation journalière"
+        verbose_name_plural = "Facturations journalières"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["jour", "mode_paiement"],
+                name="report_facture_journaliere_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.jour} - {self.mode_paiement or 'N/A'} : {self.nb_factures} facture(s)"
@@ -0,0 +1,321 @@
+"""
+Agrégats journaliers des ventes.
+
+Les tables VenteJournaliere et FactureJournaliere sont tenues à jour à chaque
+encaissement et à chaque changement de statut d'une facture. Les rapports et le
+tableau de bord les lisent à la place des factures : leur coût dépend du nombre
+de jours affichés, plus du nombre de factures.
+
+Seules les factures payées sont comptabilisées. Une facture annulée ou
+remboursée est retirée des agrégats ; `rebuild` les recalcule entièrement à
+partir des factures (commande backfill_rollups).
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Coalesce, Round, TruncDate
+from django.utils import timezone
+
+from facturation.models import DetailFacture, Facture
+from .models import FactureJournaliere, VenteJournaliere
+
+CENT = Decimal("0.01")
+
+# Statuts de facture comptés dans les ventes.
+STATUTS_COMPTABILISES = ("payee",)
+
+# Lignes par INSERT ... ON CONFLICT (9 paramètres par ligne).
+UPSERT_BATCH_SIZE = 100
+REBUILD_BATCH_SIZE = 1000
+
+ZERO = Decimal("0")
+
+
+def jour_facture(facture):
+    """Jour (fuseau local) auquel la facture est rattachée"""
+    return timezone.localdate(facture.date_facture)
+
+
+def debut_jour(jour):
+    """Minuit (fuseau local) du jour donné"""
+    return timezone.make_aware(datetime.combine(jour, time.min))
+
+
+def montant_ht(total_ttc, taux):
+    """Base HT d'une ligne TTC, arrondie au centime"""
+    return (total_ttc / (1 + (taux or ZERO))).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def _upsert(model, key_fields, sum_fields, rows):
+    """
+    INSERT ... ON CONFLICT (clé) DO UPDATE SET col = col + excluded.col :
+    une seule requête par lot, sans lecture préalable.
+    La syntaxe est commune à PostgreSQL et SQLite (>= 3.24).
+    La date de modification des lignes touchées est mise à jour au passage.
+    """
+    if not rows:
+        return
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    columns = [model._meta.get_field(name).column for name in key_fields + sum_fields]
+    conflict = ", ".join(qn(model._meta.get_field(name).column) for name in key_fields)
+    updates = ", ".join(
+        f"{qn(column)} = {table}.{qn(column)} + excluded.{qn(column)}"
+        for column in columns[len(key_fields):]
+    )
+    modification = qn(model._meta.get_field("date_modification").column)
+    columns.append(model._meta.get_field("date_modification").column)
+    updates += f", {modification} = excluded.{modification}"
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            sql = (
+                f"INSERT INTO {table} ({', '.join(qn(column) for column in columns)}) "
+                f"VALUES {', '.join([placeholder] * len(batch))} "
+                f"ON CONFLICT ({conflict}) DO UPDATE SET {updates}"
+            )
+            cursor.execute(sql, [value for row in batch for value in (*row, now)])
+
+
+def apply_facture(facture, lines, sign=1):
+    """
+    Ajoute (sign=1) ou retire (sign=-1) une facture des agrégats journaliers.
+
+    `lines` est une liste de tuples (article_id, taux_TVA, quantite, total_ligne), au
+    taux enregistré sur la ligne : une facture est retirée au taux de sa vente.
+    Les lignes sont regroupées puis triées par article : deux caisses mettent
+    toujours à jour les mêmes lignes d'agrégat dans le même ordre.
+    """
+    jour = connection.ops.adapt_datefield_value(jour_facture(facture))
+    mode = facture.mode_paiement or ""
+
+    _upsert(
+        FactureJournaliere,
+        ["jour", "mode_paiement"],
+        ["nb_factures", "montant_HT", "montant_TVA", "montant_TTC"],
+        [
+            (
+                jour,
+                mode,
+                sign,
+                sign * facture.montant_HT,
+                sign * facture.montant_TVA,
+                sign * facture.montant_TTC,
+            )
+        ],
+    )
+
+    grouped = defaultdict(lambda: [0, 0, ZERO, ZERO])
+    for article_id, taux, quantite, total_ligne in lines:
+        taux = Decimal(str(taux or 0)).quantize(Decimal("0.001"))
+        row = grouped[(article_id, taux)]
+        row[0] += quantite
+        row[1] += 1
+        row[2] += montant_ht(total_ligne, taux)
+        row[3] += total_ligne
+
+    _upsert(
+        VenteJournaliere,
+        ["jour", "article", "mode_paiement", "taux_TVA"],
+        ["quantite", "nb_lignes", "total_ht", "total_ttc"],
+        [
+            (
+                jour,
+                article_id,
+                mode,
+                taux,
+                sign * quantite,
+                sign * nb_lignes,
+                sign * total_ht,
+                sign * total_ttc,
+            )
+            for (article_id, taux), (quantite, nb_lignes, total_ht, total_ttc) in sorted(grouped.items())
+        ],
+    )
+
+
+def facture_lines(facture_id):
+    """Lignes d'une facture enregistrée, au format attendu par apply_facture"""
+    return list(
+        DetailFacture.objects.filter(facture_id=facture_id).values_list(
+            "article_id", "taux_TVA", "quantite", "total_ligne"
+        )
+    )
+
+
+def is_counted(statut):
+    return statut in STATUTS_COMPTABILISES
+
+
+def rebuild(depuis=None):
+    """
+    Recalcule les agrégats à partir des factures, à partir du jour `depuis`
+    (tout l'historique par défaut). Retourne le nombre de lignes créées.
+    """
+    factures = Facture.objects.filter(statut__in=STATUTS_COMPTABILISES)
+    details = DetailFacture.objects.filter(facture__statut__in=STATUTS_COMPTABILISES)
+    ventes_existantes = VenteJournaliere.objects.all()
+    factures_existantes = FactureJournaliere.objects.all()
+    if depuis is not None:
+        factures = factures.filter(date_facture__gte=debut_jour(depuis))
+        details = details.filter(facture__date_facture__gte=debut_jour(depuis))
+        ventes_existantes = ventes_existantes.filter(jour__gte=depuis)
+        factures_existantes = factures_existantes.filter(jour__gte=depuis)
+
+    facture_groups = (
+        factures.annotate(jour=TruncDate("date_facture"), mode=Coalesce("mode_paiement", Value("")))
+        .values("jour", "mode")
+        .annotate(
+            nb=Count("id"),
+            ht=Coalesce(Sum("montant_HT"), ZERO),
+            tva=Coalesce(Sum("montant_TVA"), ZERO),
+            ttc=Coalesce(Sum("montant_TTC"), ZERO),
+        )
+        .order_by()
+    )
+    base_expr = ExpressionWrapper(
+        Round(F("total_ligne") / (Value(1) + F("taux_TVA")), 2),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+    detail_groups = (
+        details.annotate(
+            jour=TruncDate("facture__date_facture"),
+            mode=Coalesce("facture__mode_paiement", Value("")),
+        )
+        .values("jour", "mode", "article_id", "taux_TVA")
+        .annotate(
+            qte=Coalesce(Sum("quantite"), 0),
+            nb=Count("id"),
+            ht=Coalesce(Sum(base_expr), ZERO),
+            ttc=Coalesce(Sum("total_ligne"), ZERO),
+        )
+        .order_by()
+    )
+
+    created = 0
+    with transaction.atomic():
+        ventes_existantes.delete()
+        factures_existantes.delete()
+        rows = FactureJournaliere.objects.bulk_create(
+            [
+                FactureJournaliere(
+                    jour=row["jour"],
+                    mode_paiement=row["mode"],
+                    nb_factures=row["nb"],
+                    montant_HT=row["ht"],
+                    montant_TVA=row["tva"],
+                    montant_TTC=row["ttc"],
+                )
+                for row in facture_groups
+            ],
+            batch_size=REBUILD_BATCH_SIZE,
+        )
+        created += len(rows)
+        batch = []
+        for row in detail_groups.iterator(chunk_size=REBUILD_BATCH_SIZE):
+            batch.append(
+                VenteJournaliere(
+                    jour=row["jour"],
+                    article_id=row["article_id"],
+                    mode_paiement=row["mode"],
+                    taux_TVA=row["taux_TVA"],
+                    quantite=row["qte"],
+                    nb_lignes=row["nb"],
+                    total_ht=row["ht"],
+                    total_ttc=row["ttc"],
+                )
+            )
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                VenteJournaliere.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        VenteJournaliere.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+# --- Lecture ---
+
+
+def raw_totaux(start, end):
+    """Totaux calculés directement sur les factures de [start, end)"""
+    factures = Facture.objects.filter(
+        statut__in=STATUTS_COMPTABILISES, date_facture__gte=start, date_facture__lt=end
+    )
+    totals = factures.aggregate(
+        transactions=Count("id"),
+        ht=Coalesce(Sum("montant_HT"), ZERO),
+        tva=Coalesce(Sum("montant_TVA"), ZERO),
+        ttc=Coalesce(Sum("montant_TTC"), ZERO),
+    )
+    totals["produits"] = DetailFacture.objects.filter(facture__in=factures).aggregate(
+        total=Coalesce(Sum("quantite"), 0)
+    )["total"]
+    return totals
+
+
+def rollup_totaux(premier_jour, dernier_jour):
+    """Totaux lus dans les agrégats, jours inclus"""
+    if premier_jour > dernier_jour:
+        return empty_totaux()
+    totals = FactureJournaliere.objects.filter(
+        jour__gte=premier_jour, jour__lte=dernier_jour
+    ).aggregate(
+        transactions=Coalesce(Sum("nb_factures"), 0),
+        ht=Coalesce(Sum("montant_HT"), ZERO),
+        tva=Coalesce(Sum("montant_TVA"), ZERO),
+        ttc=Coalesce(Sum("montant_TTC"), ZERO),
+    )
+    totals["produits"] = VenteJournaliere.objects.filter(
+        jour__gte=premier_jour, jour__lte=dernier_jour
+    ).aggregate(total=Coalesce(Sum("quantite"), 0))["total"]
+    return totals
+
+
+def decouper(start, end):
+    """
+    Découpe [start, end) en jours complets (premier_jour, dernier_jour, inclus)
+    et en intervalles partiels en début et fin de période.
+    Si aucun jour n'est complet, premier_jour est postérieur à dernier_jour.
+    """
+    partiels = []
+    premier_jour = timezone.localdate(start)
+    if debut_jour(premier_jour) != start:
+        lendemain = debut_jour(premier_jour + timedelta(days=1))
+        partiels.append((start, min(lendemain, end)))
+        premier_jour += timedelta(days=1)
+
+    dernier_jour = timezone.localdate(end)
+    fin_complete = debut_jour(dernier_jour)
+    if fin_complete != end and fin_complete >= debut_jour(premier_jour):
+        partiels.append((fin_complete, end))
+    dernier_jour -= timedelta(days=1)
+    return premier_jour, dernier_jour, partiels
+
+
+def empty_totaux():
+    return {"transactions": 0, "ht": ZERO, "tva": ZERO, "ttc": ZERO, "produits": 0}
+
+
+def add_totaux(result, values):
+    for key in result:
+        result[key] += values[key]
+    return result
+
+
+def totaux(start, end):
+    """
+    Totaux des ventes sur [start, end) : transactions, ht, tva, ttc, produits.
+    Les jours complets viennent des agrégats ; un début ou une fin en cours
+    de journée est complété par une requête sur les factures de ce jour.
+    """
+    premier_jour, dernier_jour, partiels = decouper(start, end)
+    result = rollup_totaux(premier_jour, dernier_jour)
+    for partiel_start, partiel_end in partiels:
+        add_totaux(result, raw_totaux(partiel_start, partiel_end))
+    return result
@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from facturation import snapshots
+from facturation.models import Facture
+from . import cache as report_cache
+from . import rollups
+
+# Champs d'une facture qui déterminent sa place dans les agrégats.
+_ROLLUP_FIELDS = ("statut", "mode_paiement", "date_facture", "montant_HT", "montant_TVA", "montant_TTC")
+
+
+@receiver(post_save, sender=Facture)
+def update_rollups_on_change(sender, instance, created, **kwargs):
+    """
+    Répercute une annulation, un remboursement ou une correction de facture.
+    La création est prise en charge par CheckoutService, une fois les lignes
+    enregistrées.
+    """
+    previous = snapshots.previous(instance)
+    if created or previous is None:
+        return
+    if all(getattr(previous, field) == getattr(instance, field) for field in _ROLLUP_FIELDS):
+        return
+    was_counted = rollups.is_counted(previous.statut)
+    is_counted = rollups.is_counted(instance.statut)
+    if not (was_counted or is_counted):
+        return
+    lines = rollups.facture_lines(instance.pk)
+    if was_counted:
+        rollups.apply_facture(previous, lines, sign=-1)
+    if is_counted:
+        rollups.apply_facture(instance, lines, sign=1)
+
+
+@receiver(pre_delete, sender=Facture)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    """Retire la facture des agrégats avant la suppression de ses lignes"""
+    if rollups.is_counted(instance.statut):
+        rollups.apply_facture(instance, rollups.facture_lines(instance.pk), sign=-1)
+
+
+@receiver(post_save, sender=Facture)
+@receiver(post_delete, sender=Facture)
+def invalidate_report_cache(sender, instance, **kwargs):
+    """
+    Invalide le cache des rapports après validation de la transaction.
+    Les périodes closes ne sont invalidées que si la facture date d'un jour passé.
+    """
+    today = timezone.localdate()
+    days = [rollups.jour_facture(instance)]
+    previous = snapshots.previous(instance)
+    if previous is not None:
+        days.append(rollups.jour_facture(previous))
+    closed = any(day < today for day in days)
+    transaction.on_commit(lambda: report_cache.bump(closed=closed))
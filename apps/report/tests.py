@@ -0,0 +1,338 @@
+import gzip
+import json
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.caisse.services import CheckoutService
+from facturation.models import Article, Client, Facture, Utilisateur
+from . import cache as report_cache
+from . import exporters
+from . import extract
+from . import rollups
+from .models import FactureJournaliere, VenteJournaliere
+
+
+class RollupTests(TestCase):
+    """Tests des agrégats journaliers des ventes"""
+
+    def setUp(self):
+        cache.clear()
+        self.client_obj = Client.objects.create(nom='Client de passage', type='anonyme')
+        self.articles = [
+            Article.objects.create(
+                code_barres=f'200000000000{i}',
+                nom=f'Article {i}',
+                prix_HT=Decimal('100.00'),
+                prix_TTC=Decimal('118.00'),
+                taux_TVA=Decimal('0.18'),
+                stock_actuel=50,
+            )
+            for i in range(3)
+        ]
+
+    def _sell(self, quantites, mode_paiement='especes'):
+        items = [
+            {'article_id': article.id, 'quantite': quantite}
+            for article, quantite in zip(self.articles, quantites)
+        ]
+        return CheckoutService.create_facture(
+            items, client=self.client_obj, caissier=None, mode_paiement=mode_paiement
+        )
+
+    def _snapshot(self):
+        factures = sorted(
+            FactureJournaliere.objects.filter(nb_factures__gt=0).values_list(
+                'jour', 'mode_paiement', 'nb_factures', 'montant_HT', 'montant_TVA', 'montant_TTC'
+            )
+        )
+        ventes = sorted(
+            VenteJournaliere.objects.filter(nb_lignes__gt=0).values_list(
+                'jour', 'article_id', 'mode_paiement', 'quantite', 'nb_lignes', 'total_ht', 'total_ttc'
+            )
+        )
+        return factures, ventes
+
+    def test_checkout_updates_rollups(self):
+        """Test que l'encaissement alimente les agrégats du jour"""
+        self._sell([2, 1])
+        self._sell([1], mode_paiement='carte')
+
+        today = timezone.localdate()
+        especes = FactureJournaliere.objects.get(jour=today, mode_paiement='especes')
+        self.assertEqual(especes.nb_factures, 1)
+        self.assertEqual(especes.montant_TTC, Decimal('354.00'))
+        vente = VenteJournaliere.objects.get(jour=today, article=self.articles[0], mode_paiement='especes')
+        self.assertEqual(vente.quantite, 2)
+        self.assertEqual(vente.total_ttc, Decimal('236.00'))
+        self.assertEqual(vente.total_ht, Decimal('200.00'))
+        self.assertEqual(VenteJournaliere.objects.filter(article=self.articles[0]).count(), 2)
+
+    def test_cancellation_and_delete_remove_facture(self):
+        """Test qu'une facture annulée ou supprimée est retirée des agrégats"""
+        kept = self._sell([1])
+        cancelled = self._sell([3, 2])
+        cancelled.statut = 'annulee'
+        cancelled.save()
+
+        totals = rollups.totaux(
+            rollups.debut_jour(timezone.localdate()),
+            rollups.debut_jour(timezone.localdate() + timedelta(days=1)),
+        )
+        self.assertEqual(totals['transactions'], 1)
+        self.assertEqual(totals['ttc'], kept.montant_TTC)
+        self.assertEqual(totals['produits'], 1)
+
+        cancelled.statut = 'payee'
+        cancelled.save()
+        Facture.objects.filter(pk=kept.pk).delete()
+        rollup = FactureJournaliere.objects.get(mode_paiement='especes')
+        self.assertEqual(rollup.nb_factures, 1)
+        self.assertEqual(rollup.montant_TTC, cancelled.montant_TTC)
+
+    def test_vat_rate_change_before_cancellation(self):
+        """Test qu'une facture annulée après un changement de taux est retirée au taux de sa vente"""
+        facture = self._sell([2])
+        Article.objects.filter(pk=self.articles[0].pk).update(taux_TVA=Decimal('0.10'))
+        facture.statut = 'annulee'
+        facture.save()
+
+        self.assertFalse(VenteJournaliere.objects.exclude(quantite=0, nb_lignes=0, total_ttc=0).exists())
+        self.assertEqual(list(VenteJournaliere.objects.values_list('taux_TVA', flat=True)), [Decimal('0.180')])
+
+        self._sell([1])
+        incremental = self._snapshot()
+        call_command('backfill_rollups', stdout=StringIO())
+        self.assertEqual(self._snapshot(), incremental)
+        self.assertEqual(list(VenteJournaliere.objects.values_list('taux_TVA', flat=True)), [Decimal('0.100')])
+
+    def test_rebuild_matches_incremental(self):
+        """Test que la reconstruction redonne les agrégats incrémentaux"""
+        self._sell([2, 1, 4])
+        self._sell([1], mode_paiement='carte')
+        self._sell([5, 5]).delete()
+        incremental = self._snapshot()
+
+        FactureJournaliere.objects.update(nb_factures=0)
+        call_command('backfill_rollups', stdout=StringIO())
+
+        self.assertEqual(self._snapshot(), incremental)
+
+    def test_totaux_completes_partial_days_from_factures(self):
+        """Test qu'une période commençant en cours de journée n'utilise que les factures concernées"""
+        facture = self._sell([1])
+        yesterday = timezone.now() - timedelta(days=1)
+        Facture.objects.filter(pk=facture.pk).update(date_facture=yesterday)
+
+        after = rollups.totaux(yesterday + timedelta(minutes=1), timezone.now())
+        self.assertEqual(after['transactions'], 0)
+        before = rollups.totaux(yesterday - timedelta(minutes=1), timezone.now())
+        self.assertEqual(before['transactions'], 1)
+        self.assertEqual(before['ttc'], facture.montant_TTC)
+
+
+class ReportViewTests(TestCase):
+    """Tests du rapport alimenté par les agrégats"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = Utilisateur.objects.create_user(login='gerant', password='secret', role='Gestionnaire')
+        self.client.force_login(self.user)
+        self.client_obj = client_obj = Client.objects.create(nom='Client de passage', type='anonyme')
+        self.article = article = Article.objects.create(
+            code_barres='3000000000001',
+            nom='Riz',
+            prix_HT=Decimal('100.00'),
+            prix_TTC=Decimal('118.00'),
+            taux_TVA=Decimal('0.18'),
+            stock_actuel=50,
+        )
+        for _ in range(3):
+            CheckoutService.create_facture(
+                [{'article_id': article.id, 'quantite': 2}], client=client_obj, caissier=None
+            )
+
+    def test_report_reads_rollups(self):
+        """Test les totaux du rapport pour chaque période"""
+        for period in ('day', 'week', 'month', 'year'):
+            response = self.client.get(reverse('report:report'), {'period': period})
+            self.assertEqual(response.status_code, 200)
+            stats = {row['label']: row['value'] for row in response.context['stats_ventes']}
+            self.assertEqual(stats['Transactions'], '3')
+            self.assertEqual(stats['Produits vendus'], '6')
+            self.assertEqual(stats['CA Total'], '708 FCFA')
+
+
+    def test_report_cached_until_next_facture(self):
+        """Test que le rapport est servi par le cache jusqu'à la facture suivante"""
+        url = reverse('report:report')
+        self.client.get(url, {'period': 'week'})
+        with CaptureQueriesContext(connection) as cached:
+            self.client.get(url, {'period': 'week'})
+        with CaptureQueriesContext(connection) as export:
+            self.client.get(reverse('report:export_csv'), {'period': 'week'})
+        tables = ' '.join(query['sql'] for query in cached.captured_queries + export.captured_queries)
+        self.assertNotIn('report_facturejournaliere', tables)
+        self.assertNotIn('report_ventejournaliere', tables)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CheckoutService.create_facture(
+                [{'article_id': self.article.id, 'quantite': 1}], client=self.client_obj, caissier=None
+            )
+        response = self.client.get(url, {'period': 'week'})
+        stats = {row['label']: row['value'] for row in response.context['stats_ventes']}
+        self.assertEqual(stats['Transactions'], '4')
+
+    def test_closed_days_invalidated_by_past_facture(self):
+        """Test qu'une facture d'un jour passé invalide les périodes closes"""
+        yesterday = timezone.localdate() - timedelta(days=1)
+        facture = Facture.objects.first()
+        Facture.objects.filter(pk=facture.pk).update(date_facture=rollups.debut_jour(yesterday))
+        call_command('backfill_rollups', stdout=StringIO())
+        start, end = rollups.debut_jour(yesterday), rollups.debut_jour(timezone.localdate())
+
+        self.assertEqual(report_cache.totaux(start, end)['transactions'], 1)
+        with self.assertNumQueries(0):
+            report_cache.totaux(start, end)
+
+        facture.refresh_from_db()
+        facture.statut = 'annulee'
+        with self.captureOnCommitCallbacks(execute=True):
+            facture.save()
+        self.assertEqual(report_cache.totaux(start, end)['transactions'], 0)
+
+
+class ExportDataTests(TestCase):
+    """Tests des extractions BI en flux"""
+
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(login='gerant', password='secret', role='Gestionnaire')
+        self.client.force_login(self.user)
+        client_obj = Client.objects.create(nom='Client de passage', type='anonyme')
+        article = Article.objects.create(
+            code_barres='4000000000001', nom='Riz', prix_HT=Decimal('100.00'),
+            prix_TTC=Decimal('118.00'), taux_TVA=Decimal('0.18'), stock_actuel=50,
+        )
+        self.factures = [
+            CheckoutService.create_facture(
+                [{'article_id': article.id, 'quantite': 2}], client=client_obj, caissier=None
+            )
+            for _ in range(3)
+        ]
+
+    def _get(self, name, **params):
+        response = self.client.get(reverse('report:export_data', args=name.split('.', 1)), params)
+        return response, b''.join(response.streaming_content)
+
+    def test_ndjson_gz_export_is_incremental(self):
+        """Test l'export ndjson.gz complet puis à partir d'un identifiant"""
+        response, content = self._get('factures.ndjson.gz')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        rows = [json.loads(line) for line in gzip.decompress(content).splitlines()]
+        self.assertEqual([row['id'] for row in rows], [facture.id for facture in self.factures])
+        self.assertEqual(rows[0]['montant_TTC'], '236.00')
+        self.assertEqual(rows[0]['statut'], 'payee')
+
+        since = self.factures[0].id
+        response, content = self._get('lignes.ndjson.gz', since=since)
+        self.assertIn(f'lignes_depuis_{since}.ndjson.gz', response['Content-Disposition'])
+        rows = [json.loads(line) for line in gzip.decompress(content).splitlines()]
+        self.assertEqual(len(rows), 2)
+        self.assertTrue(all(row['facture_id'] > since for row in rows))
+        self.assertIn('date_facture', rows[0])
+
+    def test_export_since_timestamp_and_errors(self):
+        """Test le filtre par horodatage, since invalide et format inconnu"""
+        demain = (timezone.localdate() + timedelta(days=1)).isoformat()
+        _, content = self._get('articles.jsonl', since=demain)
+        self.assertEqual(content, b'')
+        _, content = self._get('articles.csv', since='2000-01-01T00:00:00')
+        self.assertEqual(content.decode().splitlines()[1].split(',')[1], '4000000000001')
+
+        url = reverse('report:export_data', args=['factures', 'jsonl'])
+        self.assertEqual(self.client.get(url, {'since': 'hier'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('report:export_data', args=['factures', 'xml'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('report:export_data', args=['clients', 'csv'])).status_code, 404)
+
+    @skipIf(exporters.pyarrow is None, 'pyarrow non installé')
+    def test_parquet_export(self):
+        """Test l'export parquet typé, un groupe de lignes par lot"""
+        chunks = list(exporters.export('factures', 'parquet', chunk_size=2))
+        table = exporters.pyarrow.parquet.read_table(exporters.pyarrow.BufferReader(b''.join(chunks)))
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(table.column('montant_TTC').to_pylist()[0], Decimal('236.00'))
+        self.assertEqual(str(table.schema.field('date_facture').type), 'timestamp[us, tz=UTC]')
+
+
+class FacturesFeedTests(TestCase):
+    """Tests de la lecture incrémentale des factures"""
+
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(login='gerant', password='secret', role='Gestionnaire')
+        self.client.force_login(self.user)
+        client_obj = Client.objects.create(nom='Client de passage', type='anonyme')
+        articles = [
+            Article.objects.create(
+                code_barres=f'500000000000{i}', nom=f'Article {i}', prix_HT=Decimal('100.00'),
+                prix_TTC=Decimal('118.00'), taux_TVA=Decimal('0.18'), stock_actuel=50,
+            )
+            for i in range(2)
+        ]
+        self.factures = [
+            CheckoutService.create_facture(
+                [{'article_id': article.id, 'quantite': 1} for article in articles],
+                client=client_obj, caissier=None,
+            )
+            for _ in range(5)
+        ]
+        # Factures validées depuis plus que le délai de stabilisation.
+        Facture.objects.update(date_facture=timezone.now() - timedelta(minutes=1))
+
+    def test_pages_follow_cursor(self):
+        """Test le parcours par curseur, une requête de factures et une de lignes par page"""
+        ids = []
+        after = 0
+        while True:
+            with self.assertNumQueries(2):
+                page = extract.facture_page(after, limit=2)
+            ids += [facture['id'] for facture in page['factures']]
+            after = page['next_cursor']
+            if not page['has_more']:
+                break
+        self.assertEqual(ids, [facture.id for facture in self.factures])
+        self.assertEqual(
+            extract.facture_page(after, limit=2), {'factures': [], 'next_cursor': after, 'has_more': False}
+        )
+
+    def test_recent_factures_wait_for_settle_delay(self):
+        """Test qu'une facture trop récente n'est pas encore renvoyée"""
+        Facture.objects.filter(pk=self.factures[-1].pk).update(date_facture=timezone.now())
+        page = extract.facture_page(self.factures[-2].id)
+        self.assertEqual(page['factures'], [])
+        self.assertEqual(page['next_cursor'], self.factures[-2].id)
+
+    def test_feed_view(self):
+        """Test l'API JSON : lignes imbriquées, taille de page bornée, paramètres invalides"""
+        url = reverse('report:factures_feed')
+        data = self.client.get(url, {'after': self.factures[0].id, 'limit': 1}).json()
+        self.assertTrue(data['has_more'])
+        self.assertEqual(data['next_cursor'], self.factures[1].id)
+        facture = data['factures'][0]
+        self.assertEqual(facture['montant_TTC'], '236.00')
+        self.assertEqual([ligne['code_barres'] for ligne in facture['lignes']], ['5000000000000', '5000000000001'])
+
+        with patch.object(extract, 'MAX_PAGE_SIZE', 3):
+            data = self.client.get(url, {'limit': 1000}).json()
+        self.assertEqual(len(data['factures']), 3)
+        self.assertEqual(self.client.get(url, {'after': 'abc'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'limit': 0}).status_code, 400)
@@ -7,4 +7,6 @@ urlpatterns = [
     path('', views.report_view, name='report'),
     path('export/csv/', views.export_report_csv, name='export_csv'),
     path('export/pdf/', views.export_report_pdf, name='export_pdf'),
+    path('api/factures/', views.factures_feed, name='factures_feed'),
+    path('export/<slug:dataset>.<path:fmt>', views.export_data, name='export_data'),
 ]
@@ -6,15 +6,20 @@ import io
 import json
 import calendar
 
-from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum, Value
-from django.db.models.functions import Coalesce, TruncDate, TruncHour, TruncMonth
-from django.http import HttpResponse
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncHour, TruncMonth
+from django.http import HttpResponse, HttpResponseBadRequest, Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.utils import timezone
 from django.utils.timesince import timesince
 
 from facturation.models import Article, DetailFacture, Facture
 from apps.gestionnaire.decorators import gestionnaire_required
+from . import cache as report_cache
+from . import exporters
+from . import extract
+from . import rollups
+from .models import FactureJournaliere, VenteJournaliere
 
 try:
     from reportlab.lib import colors
@@ -39,7 +44,7 @@ def _format_fcfa(amount: Decimal) -> str:
 
 
 def _get_period_range(period: str):
-    now = timezone.now()
+    now = timezone.localtime()
     if period == "day":
         start = now.replace(hour=0, minute=0, second=0, microsecond=0)
         end = now
@@ -66,6 +71,135 @@ def _get_previous_period_range(period: str, start, end):
     return prev_start, prev_end
 
 
+def _period_rollups(start, end):
+    """Totaux et agrégats journaliers de la période en cours (jours entiers jusqu'à aujourd'hui)"""
+    premier_jour, dernier_jour = timezone.localdate(start), timezone.localdate(end)
+    totals = rollups.totaux(start, rollups.debut_jour(dernier_jour + timedelta(days=1)))
+    factures_jour = FactureJournaliere.objects.filter(jour__gte=premier_jour, jour__lte=dernier_jour)
+    ventes = VenteJournaliere.objects.filter(jour__gte=premier_jour, jour__lte=dernier_jour)
+    return totals, factures_jour, ventes
+
+
+def _tva_groups(ventes):
+    return (
+        ventes.values("taux_TVA")
+        .annotate(
+            base=Coalesce(Sum("total_ht"), Decimal("0")),
+            ttc=Coalesce(Sum("total_ttc"), Decimal("0")),
+            lignes=Sum("nb_lignes"),
+        )
+        .filter(lignes__gt=0)
+        .order_by("taux_TVA")
+    )
+
+
+def _payment_groups(factures_jour):
+    return (
+        factures_jour.values("mode_paiement")
+        .annotate(total=Coalesce(Sum("montant_TTC"), Decimal("0")), nb=Sum("nb_factures"))
+        .filter(nb__gt=0)
+        .order_by("mode_paiement")
+    )
+
+
+def _sales_series(period, start, end, factures_jour):
+    """Ventes et transactions par heure (jour), par mois (année) ou par jour"""
+    if period == "day":
+        # Seule série lue sur les factures : les agrégats sont journaliers.
+        factures = Facture.objects.filter(
+            statut__in=rollups.STATUTS_COMPTABILISES, date_facture__gte=start, date_facture__lte=end
+        )
+        bucket_key = "hour"
+        sales_by_day_qs = (
+            factures.annotate(hour=TruncHour("date_facture"))
+            .values(bucket_key)
+            .annotate(
+                total=Coalesce(Sum("montant_TTC"), Decimal("0")),
+                transactions=Coalesce(Count("id"), 0),
+            )
+            .order_by(bucket_key)
+        )
+    elif period == "year":
+        bucket_key = "month"
+        sales_by_day_qs = (
+            factures_jour.annotate(month=TruncMonth("jour"))
+            .values(bucket_key)
+            .annotate(
+                total=Coalesce(Sum("montant_TTC"), Decimal("0")),
+                transactions=Coalesce(Sum("nb_factures"), 0),
+            )
+            .order_by(bucket_key)
+        )
+    else:
+        bucket_key = "jour"
+        sales_by_day_qs = (
+            factures_jour.values(bucket_key)
+            .annotate(
+                total=Coalesce(Sum("montant_TTC"), Decimal("0")),
+                transactions=Coalesce(Sum("nb_factures"), 0),
+            )
+            .order_by(bucket_key)
+        )
+    return {
+        row[bucket_key]: (row["total"] or Decimal("0"), row["transactions"] or 0)
+        for row in sales_by_day_qs
+        if row[bucket_key]
+    }
+
+
+def _build_sales_summary(period, start, end):
+    """Données de ventes de la période en cours, avant mise en forme"""
+    totals, factures_jour, ventes = _period_rollups(start, end)
+    derniers_details = (
+        DetailFacture.objects.filter(facture__date_facture__gte=start, facture__date_facture__lte=end)
+        .select_related("article", "facture")
+        .order_by("-facture__date_facture")[:2]
+    )
+    return {
+        "totals": totals,
+        "tva": list(_tva_groups(ventes)),
+        "paiements": list(_payment_groups(factures_jour)),
+        "categories": list(
+            ventes.values("article__categorie")
+            .annotate(total=Coalesce(Sum("total_ttc"), Decimal("0")), lignes=Sum("nb_lignes"))
+            .filter(lignes__gt=0)
+            .order_by("article__categorie")
+        ),
+        "series": _sales_series(period, start, end, factures_jour),
+        "mouvements": [
+            (detail.article.nom, detail.quantite, detail.facture.date_facture)
+            for detail in derniers_details
+        ],
+    }
+
+
+def _sales_summary(period, start, end):
+    """Résumé des ventes de la période en cours, mis en cache jusqu'à la prochaine facture"""
+    return report_cache.get_bucket(
+        f"ventes:{period}", start, False, lambda: _build_sales_summary(period, start, end)
+    )
+
+
+def _stock_summary():
+    """Valeur du stock et répartition normal / bas / rupture, en une requête"""
+    stock_value_expr = ExpressionWrapper(
+        F("prix_TTC") * F("stock_actuel"),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+    return Article.objects.aggregate(
+        stock_total=Coalesce(Sum(stock_value_expr), Decimal("0")),
+        rupture=Count("id", filter=Q(stock_actuel=0)),
+        stock_bas=Count("id", filter=Q(stock_actuel__gt=0, stock_actuel__lte=F("stock_minimum"))),
+        stock_normal=Count("id", filter=Q(stock_actuel__gt=F("stock_minimum"))),
+    )
+
+
+def _tva_rate_label(rate):
+    rate_percent = ((rate or Decimal("0")) * Decimal("100")).quantize(Decimal("0.1"), rounding=ROUND_HALF_UP)
+    rate_label = str(rate_percent).rstrip("0").rstrip(".").replace(".", ",")
+    return f"TVA {rate_label}%"
+
+
 @login_required
 @gestionnaire_required
 def report_view(request):
@@ -73,25 +207,23 @@ def report_view(request):
     start, end = _get_period_range(period)
     prev_start, prev_end = _get_previous_period_range(period, start, end)
 
-    factures = Facture.objects.filter(date_facture__gte=start, date_facture__lte=end)
-    transactions = factures.count()
-
-    details = DetailFacture.objects.filter(facture__in=factures).select_related("article")
-    produits_vendus = details.aggregate(total=Coalesce(Sum("quantite"), 0))["total"]
-    ca_ttc = factures.aggregate(total=Coalesce(Sum("montant_TTC"), Decimal("0")))["total"]
-    ca_ht = factures.aggregate(total=Coalesce(Sum("montant_HT"), Decimal("0")))["total"]
+    summary = _sales_summary(period, start, end)
+    totals = summary["totals"]
+    transactions = totals["transactions"]
+    produits_vendus = totals["produits"]
+    ca_ttc = totals["ttc"]
+    ca_ht = totals["ht"]
 
     panier_moyen = Decimal("0")
     if transactions:
         panier_moyen = (ca_ttc / Decimal(transactions))
 
-    tva_collectee = factures.aggregate(total=Coalesce(Sum("montant_TVA"), Decimal("0")))["total"]
+    tva_collectee = totals["tva"]
 
-    prev_factures = Facture.objects.filter(date_facture__gte=prev_start, date_facture__lt=prev_end)
-    prev_transactions = prev_factures.count()
-    prev_details = DetailFacture.objects.filter(facture__in=prev_factures)
-    prev_produits_vendus = prev_details.aggregate(total=Coalesce(Sum("quantite"), 0))["total"]
-    prev_ca_ttc = prev_factures.aggregate(total=Coalesce(Sum("montant_TTC"), Decimal("0")))["total"]
+    previous = report_cache.totaux(prev_start, prev_end)
+    prev_transactions = previous["transactions"]
+    prev_produits_vendus = previous["produits"]
+    prev_ca_ttc = previous["ttc"]
     prev_panier_moyen = (prev_ca_ttc / Decimal(prev_transactions)) if prev_transactions else Decimal("0")
 
     def _trend(current: Decimal, previous: Decimal):
@@ -103,56 +235,32 @@ def report_view(request):
             return label, diff >= 0
         return "N/A", None
 
-    stock_value_expr = ExpressionWrapper(
-        F("prix_TTC") * F("stock_actuel"),
-        output_field=DecimalField(max_digits=12, decimal_places=2),
-    )
-    stock_total = Article.objects.aggregate(total=Coalesce(Sum(stock_value_expr), Decimal("0")))["total"]
-    rupture = Article.objects.filter(stock_actuel=0).count()
-    stock_bas = Article.objects.filter(stock_actuel__gt=0, stock_actuel__lte=F("stock_minimum")).count()
-    stock_normal = Article.objects.filter(stock_actuel__gt=F("stock_minimum")).count()
+    stock = _stock_summary()
     rupture_articles = list(
         Article.objects.filter(stock_actuel=0).order_by("nom").values_list("nom", flat=True)[:3]
     )
 
     mouvements = []
     now = timezone.now()
-    for detail in details.select_related("facture").order_by("-facture__date_facture")[:2]:
+    for nom, quantite, date_facture in summary["mouvements"]:
         mouvements.append(
             {
-                "name": detail.article.nom,
-                "desc": f"-{detail.quantite} unités • Vente",
-                "time": f"Il y a {timesince(detail.facture.date_facture, now)}",
+                "name": nom,
+                "desc": f"-{quantite} unités • Vente",
+                "time": f"Il y a {timesince(date_facture, now)}",
             }
         )
 
     tva = []
-    if details.exists():
-        tva_rate_expr = ExpressionWrapper(
-            F("article__taux_TVA"),
-            output_field=DecimalField(max_digits=6, decimal_places=3),
-        )
-        base_expr = ExpressionWrapper(
-            F("total_ligne") / (Value(1) + F("article__taux_TVA")),
-            output_field=DecimalField(max_digits=12, decimal_places=2),
-        )
-        tva_groups = (
-            details.values("article__taux_TVA")
-            .annotate(base=Coalesce(Sum(base_expr), Decimal("0")), ttc=Coalesce(Sum("total_ligne"), Decimal("0")))
-            .order_by("article__taux_TVA")
+    for row in summary["tva"]:
+        amount = row["ttc"] - row["base"]
+        tva.append(
+            {
+                "rate": _tva_rate_label(row["taux_TVA"]),
+                "base": _format_fcfa(row["base"]),
+                "amount": _format_fcfa(amount),
+            }
         )
-        for row in tva_groups:
-            rate = row["article__taux_TVA"] or Decimal("0")
-            rate_percent = (rate * Decimal("100")).quantize(Decimal("0.1"), rounding=ROUND_HALF_UP)
-            rate_label = str(rate_percent).rstrip("0").rstrip(".").replace(".", ",")
-            amount = row["ttc"] - row["base"]
-            tva.append(
-                {
-                    "rate": f"TVA {rate_label}%",
-                    "base": _format_fcfa(row["base"]),
-                    "amount": _format_fcfa(amount),
-                }
-            )
 
     color_hex = {
         "bg-blue-500": "#3b82f6",
@@ -173,12 +281,7 @@ def report_view(request):
     }
     paiements = []
     payments_chart = []
-    payment_groups = (
-        factures.values("mode_paiement")
-        .annotate(total=Coalesce(Sum("montant_TTC"), Decimal("0")))
-        .order_by("mode_paiement")
-    )
-    for row in payment_groups:
+    for row in summary["paiements"]:
         key = row["mode_paiement"] or "mixte"
         label = dict(Facture.MODE_PAIEMENT_CHOICES).get(key, "Autre")
         total = row["total"] or Decimal("0")
@@ -202,17 +305,6 @@ def report_view(request):
     month_labels = ["Jan", "Fév", "Mar", "Avr", "Mai", "Juin", "Juil", "Août", "Sep", "Oct", "Nov", "Déc"]
 
     if period == "day":
-        trunc = TruncHour("date_facture")
-        bucket_key = "hour"
-        sales_by_day_qs = (
-            factures.annotate(hour=trunc)
-            .values(bucket_key)
-            .annotate(
-                total=Coalesce(Sum("montant_TTC"), Decimal("0")),
-                transactions=Coalesce(Count("id"), 0),
-            )
-            .order_by(bucket_key)
-        )
         start_hour = start.replace(minute=0, second=0, microsecond=0)
         end_hour = end.replace(minute=0, second=0, microsecond=0)
         buckets = []
@@ -227,18 +319,7 @@ def report_view(request):
         def _lookup_key(bucket):
             return bucket
     elif period == "year":
-        trunc = TruncMonth("date_facture")
-        bucket_key = "month"
-        sales_by_day_qs = (
-            factures.annotate(month=trunc)
-            .values(bucket_key)
-            .annotate(
-                total=Coalesce(Sum("montant_TTC"), Decimal("0")),
-                transactions=Coalesce(Count("id"), 0),
-            )
-            .order_by(bucket_key)
-        )
-        buckets = [start.replace(month=m, day=1, hour=0, minute=0, second=0, microsecond=0) for m in range(1, 13)]
+        buckets = [start.date().replace(month=m, day=1) for m in range(1, 13)]
 
         def _label(bucket):
             return month_labels[bucket.month - 1]
@@ -246,17 +327,6 @@ def report_view(request):
         def _lookup_key(bucket):
             return bucket
     else:
-        trunc = TruncDate("date_facture")
-        bucket_key = "day"
-        sales_by_day_qs = (
-            factures.annotate(day=trunc)
-            .values(bucket_key)
-            .annotate(
-                total=Coalesce(Sum("montant_TTC"), Decimal("0")),
-                transactions=Coalesce(Count("id"), 0),
-            )
-            .order_by(bucket_key)
-        )
         if period == "week":
             start_day = start.date()
             buckets = [start_day + timedelta(days=i) for i in range(7)]
@@ -284,30 +354,24 @@ def report_view(request):
         def _lookup_key(bucket):
             return bucket
 
-    rows_by_bucket = {row[bucket_key]: row for row in sales_by_day_qs if row[bucket_key]}
     sales_by_day = []
     for bucket in buckets:
-        row = rows_by_bucket.get(_lookup_key(bucket))
+        total, bucket_transactions = summary["series"].get(_lookup_key(bucket), (0, 0))
         sales_by_day.append(
             {
                 "label": _label(bucket),
-                "value": float(row["total"] or 0) if row else 0.0,
-                "transactions": int(row["transactions"] or 0) if row else 0,
+                "value": float(total),
+                "transactions": int(bucket_transactions),
             }
         )
 
-    sales_by_category_qs = (
-        details.values("article__categorie")
-        .annotate(total=Coalesce(Sum("total_ligne"), Decimal("0")))
-        .order_by("article__categorie")
-    )
     category_labels = dict(Article.CATEGORIE_CHOICES)
     sales_by_category = [
         {
             "label": category_labels.get(row["article__categorie"], row["article__categorie"] or "Autres"),
             "value": float(row["total"] or 0),
         }
-        for row in sales_by_category_qs
+        for row in summary["categories"]
     ]
 
 
@@ -346,10 +410,10 @@ def report_view(request):
             {"label": "CA TTC", "value": _format_fcfa(ca_ttc), "sub": "Toutes taxes comprises"},
         ],
         "tva": tva,
-        "stock_total": _format_fcfa(stock_total),
-        "stock_normal": stock_normal,
-        "stock_bas": stock_bas,
-        "rupture": rupture,
+        "stock_total": _format_fcfa(stock["stock_total"]),
+        "stock_normal": stock["stock_normal"],
+        "stock_bas": stock["stock_bas"],
+        "rupture": stock["rupture"],
         "rupture_articles": rupture_articles,
         "period": period,
         "sales_evolution_title": {
@@ -369,56 +433,28 @@ def _build_report_context(request):
     period = request.GET.get("period", "day")
     start, end = _get_period_range(period)
 
-    factures = Facture.objects.filter(date_facture__gte=start, date_facture__lte=end)
-    transactions = factures.count()
-
-    details = DetailFacture.objects.filter(facture__in=factures).select_related("article")
-    produits_vendus = details.aggregate(total=Coalesce(Sum("quantite"), 0))["total"]
-    ca_ttc = factures.aggregate(total=Coalesce(Sum("montant_TTC"), Decimal("0")))["total"]
-    ca_ht = factures.aggregate(total=Coalesce(Sum("montant_HT"), Decimal("0")))["total"]
+    summary = _sales_summary(period, start, end)
+    totals = summary["totals"]
+    transactions = totals["transactions"]
+    produits_vendus = totals["produits"]
+    ca_ttc = totals["ttc"]
+    ca_ht = totals["ht"]
     panier_moyen = (ca_ttc / Decimal(transactions)) if transactions else Decimal("0")
-    tva_collectee = factures.aggregate(total=Coalesce(Sum("montant_TVA"), Decimal("0")))["total"]
-
-    stock_value_expr = ExpressionWrapper(
-        F("prix_TTC") * F("stock_actuel"),
-        output_field=DecimalField(max_digits=12, decimal_places=2),
-    )
-    stock_total = Article.objects.aggregate(total=Coalesce(Sum(stock_value_expr), Decimal("0")))["total"]
-    rupture = Article.objects.filter(stock_actuel=0).count()
-    stock_bas = Article.objects.filter(stock_actuel__gt=0, stock_actuel__lte=F("stock_minimum")).count()
-    stock_normal = Article.objects.filter(stock_actuel__gt=F("stock_minimum")).count()
+    tva_collectee = totals["tva"]
 
     tva = []
-    if details.exists():
-        base_expr = ExpressionWrapper(
-            F("total_ligne") / (Value(1) + F("article__taux_TVA")),
-            output_field=DecimalField(max_digits=12, decimal_places=2),
-        )
-        tva_groups = (
-            details.values("article__taux_TVA")
-            .annotate(base=Coalesce(Sum(base_expr), Decimal("0")), ttc=Coalesce(Sum("total_ligne"), Decimal("0")))
-            .order_by("article__taux_TVA")
+    for row in summary["tva"]:
+        amount = row["ttc"] - row["base"]
+        tva.append(
+            {
+                "rate": _tva_rate_label(row["taux_TVA"]),
+                "base": row["base"],
+                "amount": amount,
+            }
         )
-        for row in tva_groups:
-            rate = row["article__taux_TVA"] or Decimal("0")
-            rate_percent = (rate * Decimal("100")).quantize(Decimal("0.1"), rounding=ROUND_HALF_UP)
-            rate_label = str(rate_percent).rstrip("0").rstrip(".").replace(".", ",")
-            amount = row["ttc"] - row["base"]
-            tva.append(
-                {
-                    "rate": f"TVA {rate_label}%",
-                    "base": row["base"],
-                    "amount": amount,
-                }
-            )
 
-    paiement_groups = (
-        factures.values("mode_paiement")
-        .annotate(total=Coalesce(Sum("montant_TTC"), Decimal("0")))
-        .order_by("mode_paiement")
-    )
     paiements = []
-    for row in paiement_groups:
+    for row in summary["paiements"]:
         key = row["mode_paiement"] or "mixte"
         label = dict(Facture.MODE_PAIEMENT_CHOICES).get(key, "Autre")
         paiements.append({"label": label, "amount": row["total"]})
@@ -435,12 +471,7 @@ def _build_report_context(request):
             "panier_moyen": panier_moyen,
             "produits_vendus": produits_vendus,
         },
-        "stock": {
-            "stock_total": stock_total,
-            "stock_normal": stock_normal,
-            "stock_bas": stock_bas,
-            "rupture": rupture,
-        },
+        "stock": _stock_summary(),
         "tva_detail": tva,
         "paiements": paiements,
     }
@@ -492,6 +523,42 @@ def export_report_csv(request):
     return response
 
 
+@login_required
+@gestionnaire_required
+def export_data(request, dataset, fmt):
+    """
+    Extraction brute (articles, factures, lignes) au format demandé, en flux.
+    ?since=<id|date ISO> limite l'extraction aux nouvelles lignes.
+    """
+    if dataset not in exporters.DATASETS or fmt not in exporters.EXPORTERS:
+        raise Http404("Extraction inconnue")
+    try:
+        since = exporters.parse_since(request.GET.get("since"))
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    response = StreamingHttpResponse(
+        exporters.export(dataset, fmt, since),
+        content_type=exporters.EXPORTERS[fmt].content_type,
+    )
+    response["Content-Disposition"] = f"attachment; filename={exporters.filename(dataset, fmt, since)}"
+    return response
+
+
+@login_required
+@gestionnaire_required
+def factures_feed(request):
+    """
+    Factures et leurs lignes, par page, dans l'ordre des identifiants.
+    ?after=<next_cursor de la page précédente>&limit=<taille de page>
+    """
+    try:
+        after, limit = extract.parse_page_params(request.GET.get("after"), request.GET.get("limit"))
+    except ValueError:
+        return JsonResponse({"error": "Paramètres after/limit invalides"}, status=400)
+    return JsonResponse(extract.facture_page(after, limit))
+
+
 @login_required
 @gestionnaire_required
 def export_report_pdf(request):
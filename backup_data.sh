@@ -2,6 +2,8 @@
 set -euo pipefail
 
 # Script de sauvegarde des données pour transfert entre machines
+# Usage : ./backup_data.sh                 sauvegarde complète
+#         ./backup_data.sh --incremental   lignes nouvelles ou modifiées depuis la dernière archive
 
 echo "🔧 Sauvegarde des données de l'application..."
 
@@ -18,23 +20,25 @@ fi
 # Créer le dossier de sauvegarde si inexistant
 mkdir -p apps/utilisateurs/fixtures
 
-echo "💾 Export des utilisateurs..."
-"$PYTHON_BIN" manage.py dumpdata facturation.Utilisateur --indent 2 > apps/utilisateurs/fixtures/users.json
-
-echo "💾 Export des articles..."
-"$PYTHON_BIN" manage.py dumpdata facturation.Article --indent 2 > apps/utilisateurs/fixtures/articles.json
-
-echo "💾 Export des clients..."
-"$PYTHON_BIN" manage.py dumpdata facturation.Client --indent 2 > apps/utilisateurs/fixtures/clients.json
-
-echo "💾 Export des factures..."
-"$PYTHON_BIN" manage.py dumpdata facturation.Facture --indent 2 > apps/utilisateurs/fixtures/factures.json
-
-echo "💾 Export des détails de factures..."
-"$PYTHON_BIN" manage.py dumpdata facturation.DetailFacture --indent 2 > apps/utilisateurs/fixtures/details.json
+DOSSIER=apps/utilisateurs/fixtures
+
+if [ "${1:-}" = "--incremental" ] && [ -f "$DOSSIER/sauvegarde.gz" ]; then
+  # Chaînée sur la dernière archive : la complète trie avant les incrémentales datées.
+  PRECEDENTE=$(ls "$DOSSIER"/sauvegarde.gz "$DOSSIER"/sauvegarde_incr_*.gz 2>/dev/null | sort | tail -n 1)
+  SORTIE="$DOSSIER/sauvegarde_incr_$(date +%Y%m%d_%H%M%S).gz"
+  echo "💾 Export des lignes nouvelles ou modifiées depuis $PRECEDENTE..."
+  "$PYTHON_BIN" manage.py backup --incremental "$PRECEDENTE" --output "$SORTIE"
+else
+  # Une seule archive compressée pour toutes les tables, en un seul processus.
+  # Les incrémentales de l'ancienne archive complète ne s'y enchaînent plus.
+  SORTIE="$DOSSIER/sauvegarde.gz"
+  echo "💾 Export des données..."
+  "$PYTHON_BIN" manage.py backup --output "$SORTIE"
+  rm -f "$DOSSIER"/sauvegarde_incr_*.gz
+fi
 
 echo ""
 echo "✅ Sauvegarde terminée !"
 echo ""
-echo "Fichiers créés dans apps/utilisateurs/fixtures/:"
-ls -lh apps/utilisateurs/fixtures/*.json
+echo "Fichier créé dans $DOSSIER/:"
+ls -lh "$SORTIE"
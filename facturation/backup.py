@@ -0,0 +1,463 @@
+"""
+Sauvegarde et restauration des données de l'application en archives.
+
+Une archive est un flux gzip de lignes JSON :
+  - un en-tête {"format", "version", "type", "id", "parent", "date", "modeles",
+    "marques"} ; "marques" donne le plus grand identifiant de chaque table ;
+  - pour chaque modèle, une ligne {"modele", "champs", "mode"} suivie de lots de
+    lignes (un tableau JSON de valeurs par lot, dans l'ordre des champs) ;
+  - une ligne de fin {"fin": {modèle: nombre de lignes}}, qui permet de
+    détecter une archive tronquée.
+
+Une sauvegarde complète contient toutes les lignes. Une sauvegarde incrémentale
+part de l'en-tête de la précédente ("parent") : pour les modèles de
+INCREMENTAL_FIELDS, elle ne contient que les lignes créées (identifiant au-delà
+de la marque) ou modifiées (date au-delà de celle de la parente), plus les
+plages d'identifiants encore présents ("plages") pour rejouer les suppressions.
+Les autres tables, petites, sont recopiées entières.
+
+La sauvegarde lit chaque table par lots avec un curseur (values_list().iterator()),
+dans une seule transaction pour un instantané cohérent. La restauration rejoue
+une sauvegarde complète puis ses incrémentales dans l'ordre ; elle insère par
+lots (COPY sous PostgreSQL, INSERT groupés ailleurs), contrôle les clés
+étrangères une seule fois à la fin et recale les séquences des clés primaires.
+
+Sont sauvegardés les modèles de facturation et des applications du projet
+(apps.*) ; les tables de Django (sessions, permissions, types de contenu) sont
+recréées par les migrations.
+"""
+import datetime
+import functools
+import gzip
+import json
+import uuid
+from decimal import Decimal
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+FORMAT = "caisse-plus-backup"
+VERSION = 2
+# Version 1 : archives complètes, sans identifiant ni marques.
+SUPPORTED_VERSIONS = (1, 2)
+BACKUP_CHUNK_SIZE = 5000
+# Compression rapide : l'archive reste environ 10 fois plus petite que le JSON indenté.
+COMPRESS_LEVEL = 3
+
+COMPLETE = "complete"
+INCREMENTAL = "incrementale"
+
+# Date qui change avec la ligne (ou qui ne change plus, pour les tables en ajout seul).
+INCREMENTAL_FIELDS = {
+    "facturation.article": "date_modification",
+    "facturation.facture": "date_modification",
+    "facturation.detailfacture": "facture__date_modification",
+    "facturation.audit": "date_action",
+    "caisse.articlesupprime": "date_suppression",
+    "caisse.cleidempotence": "date_creation",
+    "report.ventejournaliere": "date_modification",
+    "report.facturejournaliere": "date_modification",
+    "clients.statistiqueclient": "date_modification",
+}
+# Recul sur la date de la parente : une transaction validée après son instantané
+# peut porter une date antérieure.
+INCREMENTAL_OVERLAP = datetime.timedelta(minutes=10)
+# Identifiants par DELETE ... IN (limite de paramètres de SQLite).
+DELETE_BATCH_SIZE = 500
+
+
+class BackupError(Exception):
+    """Archive illisible ou incompatible avec la base"""
+
+
+def backup_models():
+    """Modèles sauvegardés, dans l'ordre du registre d'applications"""
+    selected = []
+    for app_config in apps.get_app_configs():
+        if app_config.name != "facturation" and not app_config.name.startswith("apps."):
+            continue
+        for model in app_config.get_models(include_auto_created=True):
+            if model._meta.proxy or not model._meta.managed:
+                continue
+            selected.append(model)
+    labels = {model._meta.label_lower for model in selected}
+    # Tables de liaison vers des modèles non sauvegardés (groupes, permissions) : ignorées.
+    return [
+        model for model in selected
+        if not model._meta.auto_created
+        or all(
+            field.related_model._meta.label_lower in labels
+            for field in model._meta.concrete_fields if field.is_relation
+        )
+    ]
+
+
+def _columns(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"Valeur non sérialisable : {type(value).__name__}")
+
+
+def _converter(field):
+    """Conversion JSON -> valeur Python d'une colonne, ou None si inutile"""
+    if isinstance(field, models.DecimalField):
+        return Decimal
+    if isinstance(field, models.DateTimeField):
+        return datetime.datetime.fromisoformat
+    if isinstance(field, models.DateField):
+        return datetime.date.fromisoformat
+    if isinstance(field, models.TimeField):
+        return datetime.time.fromisoformat
+    if isinstance(field, models.UUIDField):
+        return uuid.UUID
+    return None
+
+
+def _id_ranges(model):
+    """Plages [premier, dernier] d'identifiants consécutifs présents dans la table"""
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    pk = qn(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        # Îlots d'identifiants : l'écart avec le rang est constant sur une suite sans trou.
+        cursor.execute(
+            f"SELECT MIN(ident), MAX(ident) FROM ("
+            f"SELECT {pk} AS ident, {pk} - ROW_NUMBER() OVER (ORDER BY {pk}) AS ilot FROM {table}"
+            f") AS ilots GROUP BY ilot ORDER BY 1"
+        )
+        return [[first, last] for first, last in cursor.fetchall()]
+
+
+def _subtract(ranges, keep):
+    """Parties des plages `ranges` non couvertes par `keep` (listes triées et disjointes)"""
+    result = []
+    start = 0
+    for first, last in ranges:
+        while start < len(keep) and keep[start][1] < first:
+            start += 1
+        index = start
+        while first <= last:
+            if index >= len(keep) or keep[index][0] > last:
+                result.append([first, last])
+                break
+            if keep[index][0] > first:
+                result.append([first, keep[index][0] - 1])
+            first = keep[index][1] + 1
+            index += 1
+    return result
+
+
+def backup(fileobj, chunk_size=BACKUP_CHUNK_SIZE, on_progress=None, parent=None):
+    """
+    Écrit l'archive dans `fileobj` (fichier binaire). Retourne {modèle: lignes}.
+    Avec `parent` (en-tête de la sauvegarde précédente, voir read_header),
+    l'archive est incrémentale.
+    `on_progress(label, count)` est appelé après chaque lot.
+    """
+    if parent is not None and parent.get("version") != VERSION:
+        raise BackupError("Sauvegarde parente d'un ancien format : faites d'abord une sauvegarde complète")
+    encoder = json.JSONEncoder(default=_default, ensure_ascii=False, separators=(",", ":"))
+    selected = backup_models()
+    counts = {}
+    # Prise avant l'instantané : la sauvegarde suivante repart de cette date.
+    instant = timezone.now()
+    if parent is not None:
+        since = datetime.datetime.fromisoformat(parent["date"]) - INCREMENTAL_OVERLAP
+        parent_marks = parent["marques"]
+    with gzip.GzipFile(fileobj=fileobj, mode="wb", compresslevel=COMPRESS_LEVEL, mtime=0) as archive:
+
+        def write(record):
+            archive.write(encoder.encode(record).encode("utf-8"))
+            archive.write(b"\n")
+
+        outermost = not connection.in_atomic_block
+        with transaction.atomic():
+            if connection.vendor == "postgresql" and outermost:
+                # Instantané unique pour toutes les tables.
+                with connection.cursor() as cursor:
+                    cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+            marks = {
+                model._meta.label_lower: model._base_manager.aggregate(mark=Max("pk"))["mark"]
+                for model in selected
+            }
+            write({
+                "format": FORMAT,
+                "version": VERSION,
+                "type": COMPLETE if parent is None else INCREMENTAL,
+                "id": uuid.uuid4().hex,
+                "parent": None if parent is None else parent["id"],
+                "date": instant.isoformat(),
+                "modeles": [model._meta.label_lower for model in selected],
+                "marques": marks,
+            })
+            for model in selected:
+                label = model._meta.label_lower
+                columns = _columns(model)
+                rows = model._base_manager.order_by("pk")
+                section = {"modele": label, "champs": columns, "mode": COMPLETE}
+                field = INCREMENTAL_FIELDS.get(label)
+                if parent is not None and field and parent_marks.get(label) is not None:
+                    rows = rows.filter(Q(**{f"{field}__gt": since}) | Q(pk__gt=parent_marks[label]))
+                    section.update(mode=INCREMENTAL, plages=_id_ranges(model))
+                write(section)
+                count = 0
+                chunk = []
+                for row in rows.values_list(*columns).iterator(chunk_size=chunk_size):
+                    chunk.append(row)
+                    if len(chunk) >= chunk_size:
+                        write(chunk)
+                        count += len(chunk)
+                        chunk = []
+                        if on_progress is not None:
+                            on_progress(label, count)
+                if chunk:
+                    write(chunk)
+                    count += len(chunk)
+                counts[label] = count
+                if on_progress is not None:
+                    on_progress(label, count)
+        write({"fin": counts})
+    return counts
+
+
+def _read_records(fileobj):
+    try:
+        with gzip.GzipFile(fileobj=fileobj, mode="rb") as archive:
+            for line in archive:
+                yield json.loads(line)
+    except (OSError, EOFError, ValueError) as e:
+        raise BackupError(f"Archive illisible : {e}")
+
+
+def _check_header(header):
+    if not isinstance(header, dict) or header.get("format") != FORMAT:
+        raise BackupError("Ce fichier n'est pas une sauvegarde de l'application")
+    if header.get("version") not in SUPPORTED_VERSIONS:
+        raise BackupError(f"Version d'archive non prise en charge : {header.get('version')}")
+    return header
+
+
+def read_header(fileobj):
+    """En-tête de l'archive : sert de `parent` à la sauvegarde incrémentale suivante"""
+    records = _read_records(fileobj)
+    try:
+        return _check_header(next(records, None))
+    finally:
+        records.close()
+
+
+# Colonnes dont la valeur JSON est déjà celle attendue par la base.
+PASSTHROUGH_TYPES = {
+    "AutoField", "BigAutoField", "SmallAutoField", "IntegerField", "BigIntegerField",
+    "SmallIntegerField", "PositiveIntegerField", "PositiveBigIntegerField",
+    "PositiveSmallIntegerField", "CharField", "TextField", "SlugField", "FileField",
+}
+
+
+def _field(model, attname):
+    for field in model._meta.concrete_fields:
+        if field.attname == attname:
+            return field.target_field if field.is_relation else field
+    raise BackupError(f"{model._meta.label_lower} : colonne inconnue {attname}")
+
+
+def _preparers(model, columns):
+    """(index, conversion) des colonnes à convertir en valeur de base de données"""
+    # Connexion réelle : le proxy `connection` coûte une résolution par valeur.
+    db = transaction.get_connection()
+    preparers = []
+    for index, attname in enumerate(columns):
+        field = _field(model, attname)
+        if field.get_internal_type() in PASSTHROUGH_TYPES:
+            continue
+        convert = _converter(field)
+
+        def prepare(value, field=field, convert=convert):
+            if convert is not None:
+                value = convert(value)
+            return field.get_db_prep_save(value, db)
+
+        if isinstance(field, (models.DecimalField, models.DateField)) and not isinstance(field, models.DateTimeField):
+            # Prix, montants et jours se répètent beaucoup d'une ligne à l'autre.
+            prepare = functools.lru_cache(maxsize=4096)(prepare)
+        preparers.append((index, prepare))
+    return preparers
+
+
+def _insert(model, columns, rows):
+    """
+    Insère les lignes sans passer par les modèles : ni signaux ni pre_save
+    (auto_now et auto_now_add garderaient sinon la date de restauration).
+    """
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    names = ", ".join(qn(column) for column in columns)
+    with connection.cursor() as cursor:
+        if hasattr(cursor.cursor, "copy"):
+            # psycopg 3 : COPY, le plus rapide sous PostgreSQL.
+            with cursor.cursor.copy(f"COPY {table} ({names}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(row)
+        else:
+            placeholders = ", ".join(["%s"] * len(columns))
+            cursor.executemany(f"INSERT INTO {table} ({names}) VALUES ({placeholders})", rows)
+
+
+def _delete(model, ids=None, ranges=None):
+    """
+    Supprime des lignes en SQL direct, toutes si ni `ids` ni `ranges`. Pas de
+    cascade de l'ORM : les lignes liées sont elles aussi décrites par l'archive.
+    """
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    pk = qn(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        if ids is None and ranges is None:
+            cursor.execute(f"DELETE FROM {table}")
+            return
+        ids = ids or []
+        for start in range(0, len(ids), DELETE_BATCH_SIZE):
+            batch = ids[start:start + DELETE_BATCH_SIZE]
+            cursor.execute(f"DELETE FROM {table} WHERE {pk} IN ({', '.join(['%s'] * len(batch))})", batch)
+        for first, last in ranges or ():
+            cursor.execute(f"DELETE FROM {table} WHERE {pk} BETWEEN %s AND %s", [first, last])
+
+
+def _check_columns(model, columns):
+    expected = _columns(model)
+    if sorted(columns) != sorted(expected):
+        missing = sorted(set(expected) - set(columns))
+        extra = sorted(set(columns) - set(expected))
+        raise BackupError(
+            f"{model._meta.label_lower} : colonnes différentes de la base (manquantes {missing}, en trop {extra}) ; "
+            "appliquez les mêmes migrations que la base sauvegardée"
+        )
+
+
+def _header_models(header):
+    try:
+        return [apps.get_model(label) for label in header["modeles"]]
+    except LookupError as e:
+        raise BackupError(str(e))
+
+
+def _prepare_tables(selected, replace):
+    """Vide les tables (`replace`) ou vérifie qu'elles sont vides, avant une sauvegarde complète"""
+    with connection.cursor() as cursor:
+        postgresql = connection.vendor == "postgresql"
+        if replace:
+            if postgresql:
+                # TRUNCATE refuse une table dont des contrôles sont encore en attente.
+                cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+            # Sous PostgreSQL, TRUNCATE vide aussi les tables qui référencent
+            # les utilisateurs (journal de l'admin, groupes).
+            tables = [model._meta.db_table for model in selected]
+            for sql in connection.ops.sql_flush(no_style(), tables, allow_cascade=True):
+                cursor.execute(sql)
+        if postgresql:
+            cursor.execute("SET CONSTRAINTS ALL DEFERRED")
+    if not replace:
+        non_empty = [model._meta.label_lower for model in selected if model._base_manager.exists()]
+        if non_empty:
+            raise BackupError(f"Tables non vides : {', '.join(non_empty)} (utilisez --replace)")
+
+
+def _load(records, incremental, on_progress):
+    """Charge les sections d'une archive (après l'en-tête). Retourne {modèle: lignes}"""
+    counts = {}
+    model = columns = preparers = None
+    pk_index = None
+    finished = None
+    for record in records:
+        if isinstance(record, list):
+            if model is None:
+                raise BackupError("Archive corrompue : lot de lignes sans modèle")
+            if preparers:
+                for row in record:
+                    for index, prepare in preparers:
+                        if row[index] is not None:
+                            row[index] = prepare(row[index])
+            if pk_index is not None:
+                # Ligne modifiée depuis la parente : remplacée.
+                _delete(model, ids=[row[pk_index] for row in record])
+            _insert(model, columns, record)
+            counts[model._meta.label_lower] += len(record)
+            if on_progress is not None:
+                on_progress(model._meta.label_lower, counts[model._meta.label_lower])
+        elif "modele" in record:
+            model = apps.get_model(record["modele"])
+            columns = record["champs"]
+            _check_columns(model, columns)
+            preparers = _preparers(model, columns)
+            counts[model._meta.label_lower] = 0
+            pk_index = None
+            if record.get("mode", COMPLETE) == INCREMENTAL:
+                # Lignes supprimées depuis la parente : absentes des plages.
+                _delete(model, ranges=_subtract(_id_ranges(model), record["plages"]))
+                pk_index = columns.index(model._meta.pk.attname)
+            elif incremental:
+                _delete(model)
+        elif "fin" in record:
+            finished = record["fin"]
+    if finished is None:
+        raise BackupError("Archive tronquée : ligne de fin absente")
+    if finished != counts:
+        raise BackupError("Archive incohérente : nombre de lignes différent de l'en-tête de fin")
+    return counts
+
+
+def restore(*fileobjs, replace=False, on_progress=None):
+    """
+    Restaure une sauvegarde complète puis, dans l'ordre, les sauvegardes
+    incrémentales qui la suivent. La base doit être migrée, tables vides sauf
+    `replace`. Tout est fait dans une transaction : une archive invalide ou
+    hors séquence ne laisse rien. Retourne {modèle: lignes chargées}.
+    """
+    if not fileobjs:
+        raise BackupError("Aucune archive à restaurer")
+    counts = {}
+    restored = {}
+
+    with transaction.atomic():
+        with connection.constraint_checks_disabled():
+            previous = None
+            for fileobj in fileobjs:
+                records = _read_records(fileobj)
+                header = _check_header(next(records, None))
+                selected = _header_models(header)
+                incremental = header.get("type", COMPLETE) == INCREMENTAL
+                if previous is None:
+                    if incremental:
+                        raise BackupError("La première archive doit être une sauvegarde complète")
+                    _prepare_tables(selected, replace)
+                elif not incremental or header.get("parent") != previous.get("id"):
+                    raise BackupError(
+                        "Archive hors séquence : chaque sauvegarde incrémentale doit suivre sa parente"
+                    )
+                for model in selected:
+                    restored.setdefault(model._meta.label_lower, model)
+                for label, count in _load(records, incremental, on_progress).items():
+                    counts[label] = counts.get(label, 0) + count
+                previous = header
+
+        # Clés étrangères contrôlées une seule fois, après le chargement.
+        connection.check_constraints(table_names=[model._meta.db_table for model in restored.values()])
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), list(restored.values())):
+                cursor.execute(sql)
+
+    # Toute la base a changé : caches des rapports, du catalogue et de la configuration.
+    cache.clear()
+    return counts
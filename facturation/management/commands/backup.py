@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from facturation import backup
+
+
+class Command(BaseCommand):
+    help = "Sauvegarde toutes les données de l'application dans une archive compressée"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', '-o',
+            help='Fichier de sortie (sauvegarde_AAAAMMJJ_HHMMSS.gz par défaut)',
+        )
+        parser.add_argument(
+            '--incremental', '-i',
+            metavar='PRECEDENTE',
+            help='Sauvegarde incrémentale : seules les lignes créées ou modifiées depuis cette archive',
+        )
+        parser.add_argument('--chunk-size', type=int, default=backup.BACKUP_CHUNK_SIZE, help='Lignes par lot')
+
+    def handle(self, *args, **options):
+        parent = None
+        if options['incremental']:
+            try:
+                with open(options['incremental'], 'rb') as fichier:
+                    parent = backup.read_header(fichier)
+            except OSError as e:
+                raise CommandError(f"Lecture impossible de {options['incremental']}: {e}")
+            except backup.BackupError as e:
+                raise CommandError(str(e))
+        suffix = '_incr' if parent else ''
+        output = options['output'] or f"sauvegarde_{timezone.localtime():%Y%m%d_%H%M%S}{suffix}.gz"
+        started = time.perf_counter()
+        try:
+            with open(output, 'wb') as fichier:
+                counts = backup.backup(fichier, chunk_size=max(1, options['chunk_size']), parent=parent)
+                size = fichier.tell()
+        except backup.BackupError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        for label, count in counts.items():
+            if count:
+                self.stdout.write(f"  {label}: {count} ligne(s)")
+        self.stdout.write(self.style.SUCCESS(
+            f"{output} écrit : {sum(counts.values())} ligne(s), {size / (1024 * 1024):.1f} Mo en {elapsed:.1f} s"
+        ))
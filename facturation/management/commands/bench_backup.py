@@ -0,0 +1,135 @@
+import os
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from facturation import backup
+from facturation.models import Article, Client, DetailFacture, Facture
+
+SEED_BATCH_SIZE = 5000
+LINES_PER_FACTURE = 5
+# Ventes d'une journée pour la mesure incrémentale, en part de l'historique.
+DAY_SHARE = 100
+
+
+class Command(BaseCommand):
+    help = "Mesure la sauvegarde et la restauration sur un grand nombre de lignes de facture"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=1_000_000, help='Lignes de facture générées')
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Mesure aussi dumpdata/loaddata (JSON indenté) sur les mêmes factures',
+        )
+
+    def handle(self, *args, **options):
+        lines = max(LINES_PER_FACTURE, options['lines'])
+
+        # Tout est fait dans une transaction annulée : la base n'est pas modifiée.
+        with transaction.atomic(), tempfile.TemporaryDirectory() as tmp:
+            started = time.perf_counter()
+            client, articles = self._seed(lines)
+            # Historique de la veille : hors de la fenêtre de la sauvegarde incrémentale.
+            hier = timezone.now() - timedelta(days=1)
+            Facture.objects.update(date_modification=hier)
+            Article.objects.update(date_modification=hier)
+            # Contrôles de clés étrangères différés de la génération, hors mesure.
+            connection.check_constraints()
+            self.stdout.write(f"{'génération':>18} : {lines} lignes en {time.perf_counter() - started:.1f} s")
+
+            archive = os.path.join(tmp, 'sauvegarde.gz')
+            started = time.perf_counter()
+            with open(archive, 'wb') as fichier:
+                counts = backup.backup(fichier)
+            self._report('backup', started, sum(counts.values()), archive)
+
+            started = time.perf_counter()
+            with open(archive, 'rb') as fichier:
+                counts = backup.restore(fichier, replace=True)
+            self._report('restore', started, sum(counts.values()))
+            if DetailFacture.objects.count() < lines:
+                self.stderr.write(self.style.ERROR('Restauration incomplète'))
+
+            # Une journée de ventes, puis la sauvegarde incrémentale de la nuit.
+            with open(archive, 'rb') as fichier:
+                parent = backup.read_header(fichier)
+            self._seed(max(LINES_PER_FACTURE, lines // DAY_SHARE), client, articles)
+            connection.check_constraints()
+            increment = os.path.join(tmp, 'sauvegarde_incr.gz')
+            started = time.perf_counter()
+            with open(increment, 'wb') as fichier:
+                counts = backup.backup(fichier, parent=parent)
+            self._report('backup incr.', started, sum(counts.values()), increment)
+
+            started = time.perf_counter()
+            with open(archive, 'rb') as complete, open(increment, 'rb') as fichier:
+                counts = backup.restore(complete, fichier, replace=True)
+            self._report('restore + incr.', started, sum(counts.values()))
+
+            if options['compare']:
+                self._legacy(tmp)
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Benchmark terminé (données annulées)'))
+
+    def _report(self, label, started, rows, path=None):
+        elapsed = time.perf_counter() - started
+        size = f", {os.path.getsize(path) / (1024 * 1024):.1f} Mo" if path else ''
+        self.stdout.write(f'{label:>18} : {rows} lignes en {elapsed:.1f} s -> {rows / elapsed:,.0f} lignes/s{size}')
+
+    def _seed(self, lines, client=None, articles=None):
+        if client is None:
+            client = Client.objects.create(nom='Client bench', type='anonyme')
+            articles = Article.objects.bulk_create([
+                Article(
+                    code_barres=f'BENCHB{i:08d}', nom=f'Article bench {i}',
+                    prix_HT=Decimal('100.00'), prix_TTC=Decimal('118.00'), taux_TVA=Decimal('0.180'),
+                )
+                for i in range(100)
+            ])
+        remaining = lines
+        while remaining > 0:
+            count = min(SEED_BATCH_SIZE, remaining)
+            factures = Facture.objects.bulk_create([
+                Facture(
+                    client=client, montant_HT=Decimal('500.00'), montant_TVA=Decimal('90.00'),
+                    montant_TTC=Decimal('590.00'), mode_paiement='especes',
+                )
+                for _ in range(-(-count // LINES_PER_FACTURE))
+            ])
+            DetailFacture.objects.bulk_create([
+                DetailFacture(
+                    facture=factures[i // LINES_PER_FACTURE], article=articles[i % len(articles)],
+                    quantite=1, prix_unitaire=Decimal('118.00'), total_ligne=Decimal('118.00'), taux_TVA=Decimal('0.180'),
+                )
+                for i in range(count)
+            ])
+            remaining -= count
+        return client, articles
+
+    def _legacy(self, tmp):
+        """Référence : dumpdata --indent 2 puis loaddata, comme backup_data.sh et restore_data.sh"""
+        fixture = os.path.join(tmp, 'details.json')
+        rows = Facture.objects.count() + DetailFacture.objects.count()
+        started = time.perf_counter()
+        call_command(
+            'dumpdata', 'facturation.Facture', 'facturation.DetailFacture',
+            indent=2, output=fixture, verbosity=0,
+        )
+        self._report('dumpdata', started, rows, fixture)
+
+        # Sans passer par les signaux de suppression des factures (agrégats).
+        with connection.cursor() as cursor:
+            for model in (DetailFacture, Facture):
+                cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+        started = time.perf_counter()
+        call_command('loaddata', fixture, verbosity=0)
+        self._report('loaddata', started, rows)
@@ -0,0 +1,203 @@
+import json
+import random
+import statistics
+import subprocess
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client as HttpClient
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.articles import cache as article_statistics
+from apps.caisse import search
+from apps.caisse.services import CheckoutService
+from apps.report import cache as report_cache
+from apps.report import exporters
+from facturation.models import Article, Client, DetailFacture, Facture, Utilisateur
+
+REPORT_PERIODS = ("day", "week", "month", "year")
+EXPORTS = (("articles", "csv"), ("factures", "csv"), ("lignes", "ndjson.gz"))
+# Écart de médiane ignoré par --compare, quel que soit le pourcentage (bruit de mesure).
+NOISE_MS = 1.0
+
+
+def _commit():
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure les chemins critiques (recherche d'articles, encaissement, rapports, tableau "
+        "de bord, clients, extractions) sur les données de la base et écrit les résultats en JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=10, help='Mesures par chemin (défaut 10)')
+        parser.add_argument(
+            '--export-repeat', type=int, default=3, help='Mesures par extraction, plus longues (défaut 3)'
+        )
+        parser.add_argument('--only', help='Chemins mesurés, séparés par des virgules (préfixes acceptés)')
+        parser.add_argument('--output', help='Fichier JSON des résultats')
+        parser.add_argument('--compare', help='Résultats JSON de référence (commit précédent)')
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=20,
+            help='Ralentissement de la médiane toléré avec --compare, en %% (défaut 20)',
+        )
+
+    def handle(self, *args, **options):
+        reference = None
+        if options['compare']:
+            try:
+                reference = json.loads(Path(options['compare']).read_text(encoding='utf-8'))
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Résultats de référence illisibles : {e}')
+        if not Article.objects.filter(actif=True, stock_actuel__gt=0).exists() or not Client.objects.exists():
+            raise CommandError('Base vide : générer des données avec la commande seed_load')
+
+        repeat = max(1, options['repeat'])
+        only = [name.strip() for name in (options['only'] or '').split(',') if name.strip()]
+        results = {}
+        # Tout est fait dans une transaction annulée : les encaissements mesurés ne sont pas conservés.
+        with transaction.atomic(), override_settings(ALLOWED_HOSTS=['testserver']):
+            volumes = {
+                'articles': Article.objects.count(),
+                'clients': Client.objects.count(),
+                'factures': Facture.objects.count(),
+                'lignes': DetailFacture.objects.count(),
+            }
+            self.stdout.write(', '.join(f'{count} {name}' for name, count in volumes.items()))
+            self.stdout.write(
+                f"{'chemin':<28} {'1er ms':>9} {'médiane ms':>11} {'p95 ms':>9} {'requêtes':>9}"
+            )
+            for name, run, times in self._benchmarks(repeat, options['export_repeat']):
+                if only and not any(name.startswith(prefix) for prefix in only):
+                    continue
+                results[name] = self._measure(run, times)
+                row = results[name]
+                self.stdout.write(
+                    f"{name:<28} {row['premier_ms']:>9.1f} {row['mediane_ms']:>11.1f} "
+                    f"{row['p95_ms']:>9.1f} {row['requetes']:>9}"
+                )
+            transaction.set_rollback(True)
+        # Caches remplis pendant la transaction annulée.
+        report_cache.bump(closed=True)
+        article_statistics.bump()
+
+        output = {
+            'date': timezone.now().isoformat(),
+            'commit': _commit(),
+            'base': connection.vendor,
+            'volumes': volumes,
+            'repeat': repeat,
+            'resultats': results,
+        }
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(output, indent=2, ensure_ascii=False), encoding='utf-8')
+            self.stdout.write(f"Résultats écrits dans {options['output']}")
+        if reference is not None:
+            self._compare(reference, output, options['tolerance'])
+        self.stdout.write(self.style.SUCCESS('Benchmark terminé (données annulées)'))
+
+    def _benchmarks(self, repeat, export_repeat):
+        """(nom, fonction mesurée, nombre de mesures) de chaque chemin"""
+        rnd = random.Random(1)
+        user = Utilisateur.objects.create_user(login=f'bench-{time.time_ns()}', role='Gestionnaire')
+        http = HttpClient()
+        http.force_login(user)
+
+        def get(name, **params):
+            def run():
+                response = http.get(reverse(name), params)
+                if response.status_code != 200:
+                    raise CommandError(f'{name} : réponse HTTP {response.status_code}')
+                for _ in response:
+                    pass
+            return run
+
+        articles = list(
+            Article.objects.filter(actif=True, stock_actuel__gt=0).values_list('id', 'nom', 'code_barres')[:500]
+        )
+        queries = [nom.split()[0][:4] for _, nom, _ in rnd.sample(articles, min(len(articles), 5))]
+        queries.append(articles[0][2][:6])
+        clients = list(Client.objects.values_list('id', flat=True)[:200])
+
+        def search_articles():
+            for query in queries:
+                list(search.search_articles(query))
+
+        def create_facture():
+            items = [{'article_id': article_id, 'quantite': 1} for article_id, _, _ in rnd.sample(articles, 5)]
+            client = Client(pk=rnd.choice(clients))
+            CheckoutService.create_facture(items, client=client, caissier=user)
+
+        def export(dataset, fmt):
+            def run():
+                for _ in exporters.export(dataset, fmt):
+                    pass
+            return run
+
+        yield 'search_articles', search_articles, repeat
+        yield 'create_facture', create_facture, repeat
+        for period in REPORT_PERIODS:
+            yield f'report_view[{period}]', get('report:report', period=period), repeat
+        yield 'dashboard_view', get('gestionnaire:dashboard'), repeat
+        yield 'clients_view', get('clients:index'), repeat
+        yield 'clients_view[total_spent]', get('clients:index', sort='total_spent', dir='desc'), repeat
+        yield 'liste_articles', get('articles:liste_articles'), repeat
+        for dataset, fmt in EXPORTS:
+            yield f'export[{dataset}.{fmt}]', export(dataset, fmt), max(1, export_repeat)
+
+    def _measure(self, run, times):
+        """Première mesure (caches invalidés) à part, puis médiane et p95 des suivantes"""
+        report_cache.bump(closed=True)
+        article_statistics.bump()
+        timings = []
+        queries = 0
+        for _ in range(times + 1):
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - started) * 1000)
+            queries = len(ctx.captured_queries)
+        first, timings = timings[0], sorted(timings[1:])
+        return {
+            'premier_ms': round(first, 2),
+            'mediane_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+            'min_ms': round(timings[0], 2),
+            'requetes': queries,
+        }
+
+    def _compare(self, reference, output, tolerance):
+        """Médianes comparées aux résultats de référence ; échoue au-delà de `tolerance` %"""
+        self.stdout.write(f"Comparaison avec {reference.get('commit') or 'la référence'} :")
+        regressions = []
+        for name, row in output['resultats'].items():
+            before = reference.get('resultats', {}).get(name)
+            if before is None:
+                continue
+            delta = row['mediane_ms'] - before['mediane_ms']
+            percent = delta / before['mediane_ms'] * 100 if before['mediane_ms'] else 0
+            regression = percent > tolerance and delta > NOISE_MS
+            line = f"{name:<28} {before['mediane_ms']:>9.1f} -> {row['mediane_ms']:>9.1f} ms ({percent:+.0f} %)"
+            if regression:
+                regressions.append(name)
+                line = self.style.ERROR(f'{line} régression')
+            self.stdout.write(line)
+        if reference.get('volumes') != output['volumes']:
+            self.stdout.write(self.style.WARNING('Volumes différents de la référence : comparaison indicative'))
+        if regressions:
+            raise CommandError(f"{len(regressions)} chemin(s) ralenti(s) de plus de {tolerance:g} % : {', '.join(regressions)}")
@@ -0,0 +1,149 @@
+import json
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from facturation.models import Article, DetailFacture, Facture
+
+DEFAULT_THRESHOLD = 10000
+# Ligne d'EXPLAIN QUERY PLAN de SQLite pour un parcours complet sans index.
+SQLITE_FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+
+def hot_queries():
+    """
+    Requêtes les plus fréquentes de l'application, avec des paramètres tirés
+    de la base (dernière facture, son client, sa journée).
+    """
+    derniere = (
+        Facture.objects.order_by("-date_facture")
+        .values("id", "client_id", "date_facture")
+        .first()
+    ) or {"id": 0, "client_id": 0, "date_facture": timezone.now()}
+    debut = timezone.localtime(derniere["date_facture"]).replace(hour=0, minute=0, second=0, microsecond=0)
+    fin = debut + timedelta(days=1)
+    categorie = Article.objects.values_list("categorie", flat=True).first() or ""
+    return [
+        (
+            "Ventes d'une journée (rapports)",
+            Facture.objects.filter(statut="payee", date_facture__gte=debut, date_facture__lt=fin),
+        ),
+        ("Dernières factures (caisse)", Facture.objects.order_by("-date_facture")[:20]),
+        (
+            "Historique d'un client",
+            Facture.objects.filter(client_id=derniere["client_id"]).order_by("-date_facture")[:10],
+        ),
+        (
+            "Lignes d'une facture par article (agrégats)",
+            DetailFacture.objects.filter(facture_id=derniere["id"]).values_list("article_id", "quantite"),
+        ),
+        (
+            "Lignes d'une journée (rapports)",
+            DetailFacture.objects.filter(facture__date_facture__gte=debut, facture__date_facture__lt=fin)
+            .order_by("-facture__date_facture")[:2],
+        ),
+        (
+            "Articles actifs d'une catégorie",
+            Article.objects.filter(actif=True, categorie=categorie),
+        ),
+        ("Catalogue actif trié par nom", Article.objects.filter(actif=True).order_by("nom")[:50]),
+        (
+            "Articles en stock faible",
+            Article.objects.filter(actif=True, stock_actuel__lte=F("stock_minimum")),
+        ),
+    ]
+
+
+def _postgresql_plan(queryset):
+    """(lignes lues par parcours séquentiel, index utilisés, plan texte) d'après EXPLAIN ANALYZE"""
+    plan = json.loads(queryset.explain(analyze=True, format="json"))[0]["Plan"]
+    scans, indexes, lines = [], [], []
+
+    def walk(node, depth):
+        label = node["Node Type"]
+        if "Index Name" in node:
+            indexes.append(node["Index Name"])
+            label += f" using {node['Index Name']}"
+        if "Relation Name" in node:
+            label += f" on {node['Relation Name']}"
+        if node["Node Type"] == "Seq Scan":
+            read = (node.get("Actual Rows", 0) + node.get("Rows Removed by Filter", 0)) * node.get("Actual Loops", 1)
+            scans.append((node["Relation Name"], read))
+            label += f" ({read} lignes lues)"
+        lines.append("  " * depth + label)
+        for child in node.get("Plans", ()):
+            walk(child, depth + 1)
+
+    walk(plan, 0)
+    return scans, indexes, lines
+
+
+def _sqlite_plan(queryset):
+    """
+    Même résultat avec EXPLAIN QUERY PLAN : SQLite n'exécute pas la requête,
+    un parcours complet compte donc toutes les lignes de la table.
+    """
+    scans, indexes, lines = [], [], []
+    for line in queryset.explain().splitlines():
+        detail = line.split(" ", 3)[-1]
+        lines.append(detail)
+        match = SQLITE_FULL_SCAN.match(detail)
+        if match:
+            table = match.group(1)
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(table)}")
+                scans.append((table, cursor.fetchone()[0]))
+        elif " USING " in detail and " INDEX " in detail:
+            indexes.append(detail.rsplit(" INDEX ", 1)[1].split()[0])
+    return scans, indexes, lines
+
+
+class Command(BaseCommand):
+    help = (
+        "Exécute EXPLAIN ANALYZE sur les requêtes fréquentes et échoue si l'une "
+        "d'elles parcourt séquentiellement plus de --threshold lignes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold',
+            type=int,
+            default=DEFAULT_THRESHOLD,
+            help=f'Lignes lues par parcours séquentiel au-delà desquelles la commande échoue (défaut {DEFAULT_THRESHOLD})',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor == "postgresql":
+            explain = _postgresql_plan
+        elif connection.vendor == "sqlite":
+            explain = _sqlite_plan
+        else:
+            raise CommandError(f"Base {connection.vendor} non prise en charge")
+
+        threshold = options['threshold']
+        failures = []
+        for label, queryset in hot_queries():
+            scans, indexes, lines = explain(queryset)
+            too_large = [(table, rows) for table, rows in scans if rows > threshold]
+            if too_large:
+                failures.append(label)
+                status = self.style.ERROR("ÉCHEC")
+                summary = ", ".join(f"parcours séquentiel de {table} ({rows} lignes)" for table, rows in too_large)
+            else:
+                status = self.style.SUCCESS("OK")
+                summary = ", ".join(dict.fromkeys(indexes)) or "aucun index"
+            self.stdout.write(f"{status} {label} : {summary}")
+            if options['verbosity'] > 1:
+                for line in lines:
+                    self.stdout.write(f"    {line}")
+
+        if failures:
+            raise CommandError(
+                f"{len(failures)} requête(s) au-delà de {threshold} lignes en parcours séquentiel : "
+                + ", ".join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS("Toutes les requêtes fréquentes utilisent leurs index"))
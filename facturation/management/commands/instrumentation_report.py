@@ -0,0 +1,117 @@
+import json
+import math
+from collections import defaultdict
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+def percentile(values, p):
+    """Centile `p` (rang le plus proche) d'une liste de valeurs triée"""
+    if not values:
+        return 0
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+def log_files(path):
+    """Journal et ses copies renouvelées (requetes.jsonl.1, .2...), du plus ancien au plus récent"""
+    path = Path(path)
+    rotated = sorted(
+        (candidate for candidate in path.parent.glob(f"{path.name}.*") if candidate.suffix[1:].isdigit()),
+        key=lambda candidate: int(candidate.suffix[1:]),
+        reverse=True,
+    )
+    return rotated + ([path] if path.exists() else [])
+
+
+def read_records(files, since=None):
+    for file in files:
+        with open(file, encoding="utf-8") as log:
+            for line in log:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Ligne tronquée (processus interrompu pendant l'écriture).
+                    continue
+                if since is not None and parse_datetime(record["date"]) < since:
+                    continue
+                yield record
+
+
+def summarize(records):
+    """Statistiques par vue, de la plus lente (p95 du temps total) à la plus rapide"""
+    endpoints = defaultdict(lambda: {"total": [], "db": [], "requetes": [], "plus_lentes": {}})
+    for record in records:
+        endpoint = endpoints[record["vue"] or record["chemin"]]
+        endpoint["total"].append(record["total_ms"])
+        endpoint["db"].append(record["db_ms"])
+        endpoint["requetes"].append(record["requetes"])
+        for statement in record.get("plus_lentes", ()):
+            slowest = endpoint["plus_lentes"]
+            slowest[statement["sql"]] = max(slowest.get(statement["sql"], 0), statement["ms"])
+
+    rows = []
+    for name, endpoint in endpoints.items():
+        total, db, requetes = sorted(endpoint["total"]), sorted(endpoint["db"]), sorted(endpoint["requetes"])
+        rows.append({
+            "vue": name,
+            "appels": len(total),
+            "p50_ms": percentile(total, 50),
+            "p95_ms": percentile(total, 95),
+            "max_ms": total[-1],
+            "db_p95_ms": percentile(db, 95),
+            "requetes_p95": percentile(requetes, 95),
+            "plus_lentes": sorted(endpoint["plus_lentes"].items(), key=lambda item: item[1], reverse=True),
+        })
+    rows.sort(key=lambda row: row["p95_ms"], reverse=True)
+    return rows
+
+
+class Command(BaseCommand):
+    help = "Vues les plus lentes (p95 du temps total) d'après le journal de l'instrumentation des requêtes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--log',
+            default=settings.INSTRUMENTATION_LOG,
+            help='Journal JSON lines du middleware (défaut : INSTRUMENTATION_LOG)',
+        )
+        parser.add_argument('--hours', type=float, help='Seulement les requêtes des N dernières heures')
+        parser.add_argument('--top', type=int, default=10, help='Nombre de vues affichées (défaut 10)')
+        parser.add_argument('--json', action='store_true', help='Sortie JSON au lieu du tableau')
+
+    def handle(self, *args, **options):
+        if not options['log']:
+            raise CommandError('Aucun journal : INSTRUMENTATION_LOG est vide')
+        files = log_files(options['log'])
+        if not files:
+            raise CommandError(f"Journal introuvable : {options['log']}")
+        since = timezone.now() - timedelta(hours=options['hours']) if options['hours'] else None
+        rows = summarize(read_records(files, since))[:options['top']]
+
+        if options['json']:
+            for row in rows:
+                row["plus_lentes"] = [{"sql": sql, "ms": ms} for sql, ms in row["plus_lentes"][:3]]
+            self.stdout.write(json.dumps(rows, ensure_ascii=False, indent=2))
+            return
+        if not rows:
+            self.stdout.write('Aucune requête enregistrée sur la période')
+            return
+
+        width = max(len(row["vue"]) for row in rows)
+        self.stdout.write(
+            f"{'Vue':<{width}}  {'Appels':>7}  {'p50 ms':>9}  {'p95 ms':>9}  {'max ms':>9}  "
+            f"{'SQL p95 ms':>10}  {'Requêtes p95':>12}"
+        )
+        for row in rows:
+            self.stdout.write(
+                f"{row['vue']:<{width}}  {row['appels']:>7}  {row['p50_ms']:>9.1f}  {row['p95_ms']:>9.1f}  "
+                f"{row['max_ms']:>9.1f}  {row['db_p95_ms']:>10.1f}  {row['requetes_p95']:>12}"
+            )
+            if options['verbosity'] > 1:
+                for sql, ms in row["plus_lentes"][:3]:
+                    self.stdout.write(f"    {ms:>9.1f} ms  {sql}")
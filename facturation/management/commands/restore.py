@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from facturation import backup
+
+
+class Command(BaseCommand):
+    help = (
+        "Restaure une archive créée par la commande backup (base migrée), "
+        "suivie le cas échéant de ses sauvegardes incrémentales dans l'ordre"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'archives',
+            nargs='+',
+            metavar='archive',
+            help='Sauvegarde complète puis incrémentales, dans leur ordre de création',
+        )
+        parser.add_argument(
+            '--replace',
+            action='store_true',
+            help='Remplace les données existantes (sinon les tables doivent être vides)',
+        )
+        parser.add_argument(
+            '--noinput', '--no-input',
+            action='store_false',
+            dest='interactive',
+            help='Ne demande pas de confirmation avec --replace',
+        )
+
+    def handle(self, *args, **options):
+        if options['replace'] and options['interactive']:
+            confirm = input(
+                "Toutes les données actuelles de l'application seront remplacées. "
+                "Tapez 'oui' pour continuer : "
+            )
+            if confirm.strip().lower() != 'oui':
+                raise CommandError('Restauration annulée')
+
+        started = time.perf_counter()
+        fichiers = []
+        try:
+            for archive in options['archives']:
+                try:
+                    fichiers.append(open(archive, 'rb'))
+                except OSError as e:
+                    raise CommandError(f"Lecture impossible de {archive}: {e}")
+            counts = backup.restore(*fichiers, replace=options['replace'])
+        except backup.BackupError as e:
+            raise CommandError(str(e))
+        finally:
+            for fichier in fichiers:
+                fichier.close()
+        elapsed = time.perf_counter() - started
+
+        for label, count in counts.items():
+            if count:
+                self.stdout.write(f"  {label}: {count} ligne(s)")
+        self.stdout.write(self.style.SUCCESS(f"{sum(counts.values())} ligne(s) restaurée(s) en {elapsed:.1f} s"))
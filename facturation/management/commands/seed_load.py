@@ -0,0 +1,292 @@
+import math
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from apps.articles import cache as article_statistics
+from apps.caisse.cache import barcode_cache
+from apps.clients import metrics as client_metrics
+from apps.report import cache as report_cache
+from apps.report import rollups
+from facturation.models import Article, Client, DetailFacture, Facture, Utilisateur
+
+CENT = Decimal("0.01")
+SEED_BATCH_SIZE = 2000
+# Préfixe des codes-barres générés : un second passage ajoute des articles.
+CODE_PREFIX = "SL"
+
+NOMS_ARTICLES = {
+    "boulangerie": ["Pain", "Baguette", "Croissant", "Pain de mie", "Brioche"],
+    "produits_laitiers": ["Lait", "Yaourt", "Fromage", "Beurre", "Lait caillé"],
+    "fruits_legumes": ["Banane plantain", "Tomate", "Oignon", "Igname", "Mangue", "Piment"],
+    "viande": ["Poulet", "Boeuf", "Poisson fumé", "Mouton", "Saucisse"],
+    "epicerie": ["Riz", "Huile", "Sucre", "Farine", "Pâtes", "Sel", "Attiéké"],
+    "boissons": ["Eau minérale", "Jus de bissap", "Soda", "Bière", "Jus de gingembre"],
+    "alimentaire": ["Conserve de tomate", "Sardines", "Cube bouillon", "Lait en poudre"],
+    "hygiene": ["Savon", "Dentifrice", "Lessive", "Papier toilette", "Shampoing"],
+}
+MARQUES = ["Ivoire", "Sahel", "Lagune", "Baobab", "Cacao", "Atlantique", "Savane", "Comoé"]
+FORMATS = ["", "250 g", "500 g", "1 kg", "5 kg", "33 cl", "1 L", "1,5 L", "x6", "x12"]
+# Catégories les plus vendues d'abord (poids de tirage des articles).
+POIDS_CATEGORIES = {
+    "epicerie": 30, "boissons": 18, "alimentaire": 14, "produits_laitiers": 10,
+    "fruits_legumes": 10, "hygiene": 8, "boulangerie": 6, "viande": 4,
+}
+# Produits de première nécessité non soumis à la TVA.
+CATEGORIES_EXONEREES = {"fruits_legumes", "boulangerie"}
+
+PRENOMS = [
+    "Awa", "Moussa", "Aminata", "Kouadio", "Fatou", "Yao", "Mariam", "Ibrahim", "Adjoua",
+    "Koffi", "Aïcha", "Seydou", "Céline", "Jean", "Fanta", "Bakary", "Akissi", "Drissa",
+]
+NOMS = [
+    "Diallo", "Traoré", "Koné", "Kouamé", "Ouattara", "Coulibaly", "Yao", "Konan", "Bamba",
+    "Touré", "Kouassi", "N'Guessan", "Cissé", "Doumbia", "Sangaré", "Kaboré", "Diabaté",
+]
+
+MODES_PAIEMENT = {"especes": 55, "orange_money": 15, "mtn_momo": 12, "carte": 10, "mixte": 4, "cheque": 2, "virement": 2}
+STATUTS = {"payee": 97, "annulee": 2, "remboursee": 1}
+QUANTITES = {1: 60, 2: 20, 3: 10, 4: 6, 5: 4}
+# Lundi ... dimanche, puis heures d'ouverture (7 h - 21 h) avec pics à midi et en fin de journée.
+POIDS_JOURS = [1.0, 0.9, 0.9, 1.0, 1.2, 1.5, 1.3]
+POIDS_HEURES = {7: 2, 8: 4, 9: 5, 10: 6, 11: 8, 12: 10, 13: 8, 14: 5, 15: 5, 16: 6, 17: 9, 18: 10, 19: 8, 20: 4}
+
+
+def _cumulative(weights):
+    total = 0
+    cumulative = []
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    return cumulative
+
+
+@contextmanager
+def _dates_fournies(model, *fields):
+    """Enregistre les dates fournies par bulk_create au lieu de l'heure courante (auto_now_add)"""
+    model_fields = [model._meta.get_field(name) for name in fields]
+    for field in model_fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in model_fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère un jeu de données volumineux (articles, clients, factures et lignes) "
+        "aux répartitions réalistes, pour les mesures de performance"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--articles', type=int, default=5000, help='Articles générés (défaut 5000)')
+        parser.add_argument('--clients', type=int, default=2000, help='Clients générés (défaut 2000)')
+        parser.add_argument('--factures', type=int, default=50000, help='Factures générées (défaut 50000)')
+        parser.add_argument(
+            '--lines', type=float, default=4, help='Nombre moyen de lignes par facture (défaut 4)'
+        )
+        parser.add_argument('--days', type=int, default=365, help="Jours d'historique jusqu'à aujourd'hui (défaut 365)")
+        parser.add_argument(
+            '--anonymous-share',
+            type=float,
+            default=0.4,
+            help='Part des ventes au client comptoir anonyme (défaut 0.4)',
+        )
+        parser.add_argument('--seed', type=int, default=1, help='Graine du générateur (jeu reproductible)')
+
+    def handle(self, *args, **options):
+        if min(options['articles'], options['factures'], options['days']) <= 0 or options['lines'] < 1:
+            raise CommandError('--articles, --factures et --days doivent être positifs, --lines au moins 1')
+        if not 0 <= options['anonymous_share'] <= 1:
+            raise CommandError('--anonymous-share doit être compris entre 0 et 1')
+        self.random = random.Random(options['seed'])
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            articles = self._articles(options['articles'])
+            self._report('articles', options['articles'], started, f'{len(articles)} actifs')
+
+            step = time.perf_counter()
+            clients = self._clients(options['clients'])
+            self._report('clients', len(clients), step)
+
+            step = time.perf_counter()
+            factures, lignes = self._factures(
+                options['factures'], options['lines'], options['days'], articles, clients, options['anonymous_share']
+            )
+            self._report('factures', factures, step, f'{lignes} lignes')
+
+            # bulk_create n'envoie pas de signal : agrégats et statistiques recalculés d'un bloc.
+            step = time.perf_counter()
+            rollups.rebuild()
+            client_metrics.rebuild()
+            self._report('agrégats', None, step)
+
+            transaction.on_commit(lambda: report_cache.bump(closed=True))
+            transaction.on_commit(article_statistics.bump)
+            transaction.on_commit(barcode_cache.clear)
+
+        self.stdout.write(self.style.SUCCESS(f'Jeu de données généré en {time.perf_counter() - started:.1f} s'))
+
+    def _report(self, label, count, started, extra=''):
+        count = '' if count is None else f'{count} '
+        extra = f' ({extra})' if extra else ''
+        self.stdout.write(f'{label:>10} : {count}en {time.perf_counter() - started:.1f} s{extra}')
+
+    def _articles(self, count):
+        """Crée les articles ; retourne [(id, prix_HT, prix_TTC, taux_TVA)] des articles actifs, seuls vendus"""
+        rnd = self.random
+        offset = Article.objects.filter(code_barres__startswith=CODE_PREFIX).count()
+        categories = list(POIDS_CATEGORIES)
+        category_weights = _cumulative(POIDS_CATEGORIES.values())
+        batch = []
+        created = []
+        for i in range(count):
+            categorie = rnd.choices(categories, cum_weights=category_weights)[0]
+            # Prix log-normal autour de 1 500 FCFA, arrondi à 25 FCFA.
+            prix_ttc = Decimal(max(50, round(rnd.lognormvariate(math.log(1500), 0.9) / 25) * 25))
+            taux = Decimal("0") if categorie in CATEGORIES_EXONEREES else Decimal("0.18")
+            stock_minimum = rnd.choice([0, 5, 10, 20])
+            tirage = rnd.random()
+            if tirage < 0.04:
+                stock = 0
+            elif tirage < 0.10:
+                stock = rnd.randint(0, stock_minimum)
+            else:
+                stock = rnd.randint(stock_minimum + 1, 500)
+            batch.append(Article(
+                code_barres=f'{CODE_PREFIX}{offset + i:011d}',
+                nom=" ".join(filter(None, [
+                    rnd.choice(NOMS_ARTICLES[categorie]), rnd.choice(MARQUES), rnd.choice(FORMATS),
+                ])),
+                prix_HT=(prix_ttc / (1 + taux)).quantize(CENT, rounding=ROUND_HALF_UP),
+                prix_TTC=prix_ttc,
+                taux_TVA=taux,
+                categorie=categorie,
+                unite_mesure="kg" if categorie in ("fruits_legumes", "viande") and rnd.random() < 0.5 else "unite",
+                stock_actuel=stock,
+                stock_minimum=stock_minimum,
+                actif=rnd.random() >= 0.05,
+            ))
+            if len(batch) >= SEED_BATCH_SIZE:
+                created += Article.objects.bulk_create(batch)
+                batch = []
+        created += Article.objects.bulk_create(batch)
+        return [
+            (article.id, article.prix_HT, article.prix_TTC, article.taux_TVA) for article in created if article.actif
+        ]
+
+    def _clients(self, count):
+        """Crée les clients ; retourne leurs identifiants"""
+        rnd = self.random
+        # Tous les clients : les e-mails générés lors d'un passage précédent restent libres.
+        offset = Client.objects.count()
+        batch = []
+        ids = []
+        for i in range(count):
+            enregistre = rnd.random() < 0.7
+            client = Client(
+                prenom=rnd.choice(PRENOMS),
+                nom=rnd.choice(NOMS),
+                type="enregistre" if enregistre else "anonyme",
+                email=f'seed.{offset + i}@exemple.ci' if enregistre and rnd.random() < 0.5 else None,
+                telephone=f'+225 07 {rnd.randint(0, 99):02d} {rnd.randint(0, 99):02d} {rnd.randint(0, 99):02d}'
+                if enregistre else None,
+            )
+            # bulk_create n'appelle pas save() : colonne de recherche calculée ici.
+            client.recherche = client.texte_recherche()
+            batch.append(client)
+            if len(batch) >= SEED_BATCH_SIZE:
+                ids += [client.id for client in Client.objects.bulk_create(batch)]
+                batch = []
+        ids += [client.id for client in Client.objects.bulk_create(batch)]
+        return ids
+
+    def _dates(self, count, days):
+        """`count` dates de vente croissantes sur `days` jours, selon le jour et l'heure, en hausse sur la période"""
+        rnd = self.random
+        today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        first = today - timedelta(days=days - 1)
+        day_weights = _cumulative(
+            POIDS_JOURS[(first + timedelta(days=d)).weekday()] * (1 + 0.5 * d / days) for d in range(days)
+        )
+        hours = list(POIDS_HEURES)
+        hour_weights = _cumulative(POIDS_HEURES.values())
+        now = timezone.now()
+        dates = []
+        for day in rnd.choices(range(days), cum_weights=day_weights, k=count):
+            moment = first + timedelta(
+                days=day, hours=rnd.choices(hours, cum_weights=hour_weights)[0], seconds=rnd.randrange(3600)
+            )
+            # Aujourd'hui : pas de vente dans le futur.
+            dates.append(min(moment, now))
+        dates.sort()
+        return dates
+
+    def _factures(self, count, lines, days, articles, clients, anonymous_share):
+        """Crée les factures et leurs lignes. Retourne (factures, lignes)"""
+        if not articles:
+            raise CommandError('Aucun article actif')
+        rnd = self.random
+        comptoir, _ = Client.objects.get_or_create(nom='Client comptoir', type='anonyme')
+        caissiers = list(Utilisateur.objects.filter(role='Caissier').values_list('id', flat=True)) or [None]
+        # Popularité des articles selon une loi de Zipf ; des clients selon une loi de Pareto.
+        article_weights = _cumulative(1 / (rank + 1) ** 0.9 for rank in range(len(articles)))
+        rnd.shuffle(articles)
+        client_weights = _cumulative(rnd.paretovariate(1.2) for _ in clients) if clients else None
+        modes, mode_weights = list(MODES_PAIEMENT), _cumulative(MODES_PAIEMENT.values())
+        statuts, statut_weights = list(STATUTS), _cumulative(STATUTS.values())
+        quantites, quantite_weights = list(QUANTITES), _cumulative(QUANTITES.values())
+
+        dates = self._dates(count, days)
+        total_lines = 0
+        with _dates_fournies(Facture, 'date_facture'):
+            for start in range(0, count, SEED_BATCH_SIZE):
+                factures, baskets = [], []
+                for date_facture in dates[start:start + SEED_BATCH_SIZE]:
+                    size = 1 + min(int(rnd.expovariate(1 / (lines - 1))) if lines > 1 else 0, 40)
+                    basket = [
+                        (article, rnd.choices(quantites, cum_weights=quantite_weights)[0])
+                        for article in rnd.choices(articles, cum_weights=article_weights, k=size)
+                    ]
+                    montant_ht = sum((prix_ht * quantite).quantize(CENT) for (_, prix_ht, _, _), quantite in basket)
+                    montant_ttc = sum((prix_ttc * quantite).quantize(CENT) for (_, _, prix_ttc, _), quantite in basket)
+                    if clients and rnd.random() >= anonymous_share:
+                        client_id = rnd.choices(clients, cum_weights=client_weights)[0]
+                    else:
+                        client_id = comptoir.id
+                    factures.append(Facture(
+                        date_facture=date_facture,
+                        montant_HT=montant_ht,
+                        montant_TVA=montant_ttc - montant_ht,
+                        montant_TTC=montant_ttc,
+                        mode_paiement=rnd.choices(modes, cum_weights=mode_weights)[0],
+                        statut=rnd.choices(statuts, cum_weights=statut_weights)[0],
+                        client_id=client_id,
+                        caissier_id=rnd.choice(caissiers),
+                    ))
+                    baskets.append(basket)
+                factures = Facture.objects.bulk_create(factures)
+                details = [
+                    DetailFacture(
+                        facture=facture,
+                        article_id=article_id,
+                        quantite=quantite,
+                        prix_unitaire=prix_ttc,
+                        total_ligne=(prix_ttc * quantite).quantize(CENT),
+                        taux_TVA=taux,
+                    )
+                    for facture, basket in zip(factures, baskets)
+                    for (article_id, _, prix_ttc, taux), quantite in basket
+                ]
+                DetailFacture.objects.bulk_create(details)
+                total_lines += len(details)
+        return count, total_lines
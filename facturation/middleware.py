@@ -0,0 +1,120 @@
+"""
+Instrumentation des requêtes HTTP (optionnelle, INSTRUMENTATION_ENABLED).
+
+Pour chaque requête : nombre de requêtes SQL, temps passé en base (toutes
+connexions, via connection.execute_wrapper), temps total et requêtes SQL les
+plus lentes. Ces mesures sont renvoyées dans l'en-tête Server-Timing (onglet
+Réseau du navigateur) et ajoutées, une ligne JSON par requête, au journal
+INSTRUMENTATION_LOG, renouvelé au-delà de INSTRUMENTATION_LOG_MAX_BYTES. La
+commande instrumentation_report en tire les vues les plus lentes.
+
+Désactivée, la classe lève MiddlewareNotUsed : Django la retire de la chaîne
+et les requêtes ne paient aucun surcoût.
+"""
+import heapq
+import json
+import logging
+import time
+from contextlib import ExitStack
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+# Longueur maximale d'une requête SQL conservée dans le journal.
+SQL_MAX_LENGTH = 500
+
+
+class QueryRecorder:
+    """execute_wrapper qui compte et chronomètre les requêtes SQL"""
+
+    def __init__(self, slowest=5):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest_size = slowest
+        self._slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            if self.slowest_size:
+                # Tas des `slowest_size` plus lentes ; le compteur départage les ex aequo.
+                item = (elapsed, self.count, sql[:SQL_MAX_LENGTH])
+                if len(self._slowest) < self.slowest_size:
+                    heapq.heappush(self._slowest, item)
+                else:
+                    heapq.heappushpop(self._slowest, item)
+
+    @property
+    def slowest(self):
+        return [
+            {"ms": round(elapsed * 1000, 2), "sql": sql}
+            for elapsed, _, sql in sorted(self._slowest, reverse=True)
+        ]
+
+
+def _open_log(path, max_bytes, backup_count):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    # Journal propre au middleware : indépendant de la configuration LOGGING.
+    log = logging.Logger("facturation.instrumentation", logging.INFO)
+    handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(handler)
+    return log
+
+
+class InstrumentationMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, "INSTRUMENTATION_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slowest = settings.INSTRUMENTATION_SLOWEST_QUERIES
+        self.log = None
+        if settings.INSTRUMENTATION_LOG:
+            self.log = _open_log(
+                settings.INSTRUMENTATION_LOG,
+                settings.INSTRUMENTATION_LOG_MAX_BYTES,
+                settings.INSTRUMENTATION_LOG_BACKUP_COUNT,
+            )
+
+    def __call__(self, request):
+        recorder = QueryRecorder(self.slowest)
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        db_ms = round(recorder.duration * 1000, 2)
+        total_ms = round(total * 1000, 2)
+        response["Server-Timing"] = (
+            f'db;dur={db_ms};desc="{recorder.count} queries", app;dur={round(total_ms - db_ms, 2)}, total;dur={total_ms}'
+        )
+        if self.log is not None:
+            match = request.resolver_match
+            self.log.info(
+                json.dumps(
+                    {
+                        "date": timezone.now().isoformat(),
+                        "vue": match.view_name if match else None,
+                        "methode": request.method,
+                        "chemin": request.path,
+                        "statut": response.status_code,
+                        "requetes": recorder.count,
+                        "db_ms": db_ms,
+                        "total_ms": total_ms,
+                        "plus_lentes": recorder.slowest,
+                    },
+                    ensure_ascii=False,
+                )
+            )
+        return response
@@ -0,0 +1,38 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Index GIN pg_trgm utilisés par la recherche de la caisse (apps.caisse.search).
+# UPPER(...) correspond à l'expression générée par icontains sur PostgreSQL.
+TRIGRAM_INDEXES = {
+    "facturation_article_nom_upper_trgm": "UPPER(nom) gin_trgm_ops",
+    "facturation_article_code_upper_trgm": "UPPER(code_barres) gin_trgm_ops",
+    "facturation_article_nom_trgm": "nom gin_trgm_ops",
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, expression in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON facturation_article USING gin ({expression})"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("facturation", "0008_alter_facture_client"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('facturation', '0009_article_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='facture',
+            name='reference_caisse',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:11
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def init_date_modification(apps, schema_editor):
+    # Les factures existantes n'ont pas été modifiées depuis leur création.
+    Facture = apps.get_model('facturation', 'Facture')
+    Facture.objects.update(date_modification=F('date_facture'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('facturation', '0010_article_date_modification_facture_reference_caisse'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='facture',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(init_date_modification, migrations.RunPython.noop),
+    ]
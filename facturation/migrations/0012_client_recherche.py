@@ -0,0 +1,67 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:23
+
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.db import migrations, models
+
+from facturation.models import normaliser_recherche
+
+# Index GIN pg_trgm de la recherche de clients (apps.clients.search) : sert
+# LIKE '%mot%' sur la colonne déjà normalisée, sans UPPER().
+TRIGRAM_INDEX = "facturation_client_recherche_trgm"
+
+
+def init_recherche(apps, schema_editor):
+    Client = apps.get_model('facturation', 'Client')
+    batch = []
+    for client in Client.objects.only('prenom', 'nom', 'email', 'telephone').iterator(chunk_size=1000):
+        telephone = client.telephone or ''
+        chiffres = ''.join(char for char in telephone if char.isdigit())
+        client.recherche = normaliser_recherche(
+            client.prenom, client.nom, client.email, client.telephone,
+            chiffres if chiffres != telephone else '',
+        )
+        batch.append(client)
+        if len(batch) >= 1000:
+            Client.objects.bulk_update(batch, ['recherche'])
+            batch = []
+    Client.objects.bulk_update(batch, ['recherche'])
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} ON facturation_client USING gin (recherche gin_trgm_ops)"
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {TRIGRAM_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('facturation', '0011_facture_date_modification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='recherche',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['nom'], name='facturation_client_nom_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(django.db.models.functions.text.Lower(django.db.models.functions.text.Concat(django.db.models.functions.comparison.Coalesce('prenom', models.Value('')), models.Value(' '), django.db.models.functions.comparison.Coalesce('nom', models.Value('')))), name='facturation_client_tri_idx'),
+        ),
+        migrations.RunPython(init_recherche, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('facturation', '0012_client_recherche'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='detailfacture',
+            name='facture',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='details', to='facturation.facture'),
+        ),
+        migrations.AlterField(
+            model_name='facture',
+            name='client',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to='facturation.client'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['actif', 'categorie'], name='facturation_art_actif_cat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(condition=models.Q(('actif', True)), fields=['nom'], name='facturation_art_actif_nom_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(condition=models.Q(('actif', True), ('stock_actuel__lte', models.F('stock_minimum'))), fields=['stock_actuel'], name='facturation_art_stock_bas_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detailfacture',
+            index=models.Index(fields=['facture', 'article'], name='facturation_detail_fact_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='facture',
+            index=models.Index(fields=['date_facture'], name='facturation_fact_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='facture',
+            index=models.Index(fields=['client', 'date_facture'], name='facturation_fact_client_idx'),
+        ),
+    ]
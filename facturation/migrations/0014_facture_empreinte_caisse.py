@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('facturation', '0013_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='facture',
+            name='empreinte_caisse',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
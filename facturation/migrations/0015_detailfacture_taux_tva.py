@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:01
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def init_taux_tva(apps, schema_editor):
+    # Taux d'origine inconnu pour les lignes existantes : on reprend celui de
+    # l'article, déjà utilisé par les agrégats journaliers.
+    Article = apps.get_model('facturation', 'Article')
+    DetailFacture = apps.get_model('facturation', 'DetailFacture')
+    DetailFacture.objects.update(
+        taux_TVA=Subquery(Article.objects.filter(pk=OuterRef('article_id')).values('taux_TVA')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('facturation', '0014_facture_empreinte_caisse'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detailfacture',
+            name='taux_TVA',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=5),
+        ),
+        migrations.RunPython(init_taux_tva, migrations.RunPython.noop),
+    ]
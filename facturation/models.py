@@ -1,6 +1,32 @@
+import unicodedata
+
 from django.db import models
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce, Concat, Lower
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 
+
+def normaliser_recherche(*parts):
+    """Texte en minuscules, sans accents ni espaces superflus (colonne Client.recherche)"""
+    text = unicodedata.normalize("NFKD", " ".join(part for part in parts if part))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(text.casefold().split())
+
+
+def nom_complet_tri(prefix=""):
+    """
+    Clé de tri « prénom nom » en minuscules. Indexée (Client.Meta.indexes) :
+    l'index ne sert que si la requête emploie exactement cette expression.
+    """
+    return Lower(
+        Concat(
+            Coalesce(f"{prefix}prenom", Value("")),
+            Value(" "),
+            Coalesce(f"{prefix}nom", Value("")),
+        )
+    )
+
+
 class Client(models.Model):
     TYPE_CHOICES = [
         ("enregistre", "Enregistré"),
@@ -13,11 +39,37 @@ class Client(models.Model):
     email = models.EmailField(unique=True, blank=True, null=True)
     telephone = models.CharField(max_length=20, blank=True, null=True)
     adresse = models.CharField(max_length=255, blank=True, null=True)
+    # Prénom, nom, e-mail et téléphone normalisés, recalculés à chaque enregistrement
+    # (recherche par mots, index trigramme sous PostgreSQL : apps.clients.search).
+    recherche = models.TextField(blank=True, default="", editable=False)
+
+    CHAMPS_RECHERCHE = ("prenom", "nom", "email", "telephone")
+
+    class Meta:
+        indexes = [
+            # Recherche exacte par nom de la caisse (client saisi à l'encaissement).
+            models.Index(fields=["nom"], name="facturation_client_nom_idx"),
+            models.Index(nom_complet_tri(), name="facturation_client_tri_idx"),
+        ]
 
     def __str__(self):
         full_name = " ".join(part for part in [self.prenom, self.nom] if part)
         return full_name or "Client"
 
+    def texte_recherche(self):
+        chiffres = "".join(char for char in self.telephone or "" if char.isdigit())
+        return normaliser_recherche(
+            *(getattr(self, field) for field in self.CHAMPS_RECHERCHE),
+            chiffres if chiffres != self.telephone else "",
+        )
+
+    def save(self, *args, **kwargs):
+        self.recherche = self.texte_recherche()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and set(update_fields) & set(self.CHAMPS_RECHERCHE):
+            kwargs["update_fields"] = {*update_fields, "recherche"}
+        super().save(*args, **kwargs)
+
 
 class UtilisateurManager(BaseUserManager):
     def create_user(self, login, password=None, **extra_fields):
@@ -106,6 +158,22 @@ class Article(models.Model):
     stock_actuel = models.PositiveIntegerField(default=0)
     stock_minimum = models.PositiveIntegerField(default=0)
     actif = models.BooleanField(default=True)
+    # Sert de version au catalogue synchronisé par les caisses.
+    date_modification = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        # Requêtes vérifiées par la commande explain_hot_queries.
+        indexes = [
+            models.Index(fields=["actif", "categorie"], name="facturation_art_actif_cat_idx"),
+            # Liste des articles actifs triée par nom (cas par défaut de la liste).
+            models.Index(fields=["nom"], condition=Q(actif=True), name="facturation_art_actif_nom_idx"),
+            # Alertes de stock : quelques articles parmi tout le catalogue.
+            models.Index(
+                fields=["stock_actuel"],
+                condition=Q(actif=True, stock_actuel__lte=F("stock_minimum")),
+                name="facturation_art_stock_bas_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.nom
@@ -171,20 +239,43 @@ class Facture(models.Model):
     montant_TTC = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     mode_paiement = models.CharField(max_length=20, choices=MODE_PAIEMENT_CHOICES, blank=True, null=True)
     statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default="payee")
-    client = models.ForeignKey(Client, on_delete=models.PROTECT)
+    # Index simple remplacé par (client, date_facture), voir Meta.
+    client = models.ForeignKey(Client, on_delete=models.PROTECT, db_index=False)
     caissier = models.ForeignKey(Utilisateur, on_delete=models.SET_NULL, null=True)
+    # Référence générée par la caisse : rend la création de facture rejouable.
+    reference_caisse = models.CharField(max_length=64, unique=True, blank=True, null=True)
+    # Empreinte du contenu envoyé avec cette référence : survit à la purge des clés d'idempotence.
+    empreinte_caisse = models.CharField(max_length=64, blank=True, default="")
+    # Changement de statut inclus : sert aux sauvegardes incrémentales et aux extractions.
+    date_modification = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Périodes des rapports et dernières factures de la caisse.
+            models.Index(fields=["date_facture"], name="facturation_fact_date_idx"),
+            # Historique d'un client, du plus récent au plus ancien.
+            models.Index(fields=["client", "date_facture"], name="facturation_fact_client_idx"),
+        ]
 
     def __str__(self):
         return f"Facture {self.id} - {self.client}"
 
 
 class DetailFacture(models.Model):
-    facture = models.ForeignKey(Facture, on_delete=models.CASCADE, related_name="details")
+    # Index simple remplacé par (facture, article), voir Meta.
+    facture = models.ForeignKey(Facture, on_delete=models.CASCADE, related_name="details", db_index=False)
     article = models.ForeignKey(Article, on_delete=models.CASCADE)
     quantite = models.PositiveIntegerField()
     prix_unitaire = models.DecimalField(max_digits=10, decimal_places=2)
     remise = models.DecimalField(max_digits=5, decimal_places=2, default=0)
     total_ligne = models.DecimalField(max_digits=10, decimal_places=2)
+    # Taux de l'article au moment de la vente : les agrégats retirent la ligne à ce taux.
+    taux_TVA = models.DecimalField(max_digits=5, decimal_places=3, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["facture", "article"], name="facturation_detail_fact_idx"),
+        ]
 
     def __str__(self):
         return f"{self.article.nom} x {self.quantite}"
@@ -0,0 +1,218 @@
+"""
+Pagination par clé (keyset) des listes d'articles et de clients.
+
+Paginator lit une page avec OFFSET, donc parcourt puis jette toutes les lignes
+des pages précédentes, et compte la liste entière à chaque affichage. Ici, une
+page est lue à partir des valeurs de tri de la dernière (ou de la première)
+ligne de la page affichée : WHERE tri > valeurs ORDER BY tri LIMIT n + 1, servi
+par l'index du tri, au même coût quel que soit le rang de la page. Ces valeurs
+voyagent dans un curseur signé et opaque ; la clé primaire termine toujours le
+tri pour qu'il soit strict. Les valeurs NULL sont placées en fin de liste,
+quel que soit le sens du tri.
+
+Au-delà de APPROXIMATE_COUNT_THRESHOLD lignes, PostgreSQL estime le total
+(pg_class.reltuples, ou plan de la requête si elle est filtrée) au lieu d'un
+COUNT(*).
+"""
+import json
+import math
+import operator
+from datetime import date, datetime
+from decimal import Decimal
+from functools import cached_property, reduce
+
+from django.core import signing
+from django.db import connections
+from django.db.models import F, Q
+
+CURSOR_SALT = "facturation.pagination"
+APPROXIMATE_COUNT_THRESHOLD = 10000
+
+
+def approximate_count(queryset):
+    """(nombre de lignes de `queryset`, True si le nombre est une estimation)"""
+    connection = connections[queryset.db]
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                [connection.ops.quote_name(queryset.model._meta.db_table)],
+            )
+            row = cursor.fetchone()
+        # -1 (ou 0) tant que la table n'a pas été analysée.
+        if row and row[0] >= APPROXIMATE_COUNT_THRESHOLD:
+            if not queryset.query.where:
+                return int(row[0]), True
+            plan = json.loads(queryset.order_by().explain(format="json"))[0]["Plan"]
+            if plan["Plan Rows"] >= APPROXIMATE_COUNT_THRESHOLD:
+                return int(plan["Plan Rows"]), True
+    return queryset.count(), False
+
+
+def _encode(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _attribute(obj, name):
+    if name == "pk":
+        return obj.pk
+    for part in name.split("__"):
+        obj = getattr(obj, part) if obj is not None else None
+    return obj
+
+
+class KeysetPage:
+    def __init__(self, paginator, object_list, number, has_previous, has_next):
+        self.paginator = paginator
+        self.object_list = object_list
+        self.number = number
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    @cached_property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return None
+        return self.paginator.cursor(self.object_list[0], self.number - 1, before=True)
+
+    @cached_property
+    def next_cursor(self):
+        if not self._has_next or not self.object_list:
+            return None
+        return self.paginator.cursor(self.object_list[-1], self.number + 1)
+
+
+class KeysetPaginator:
+    """
+    Pagine `queryset` dans l'ordre `ordering` (noms de champs, d'annotations ou
+    de champs liés, préfixés par « - » pour un tri décroissant).
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = per_page
+        ordering = list(ordering)
+        if ordering[-1].lstrip("-") != "pk":
+            ordering.append("pk")
+        self.ordering = ordering
+        query = queryset.query.chain()
+        self.keys = []
+        for name in ordering:
+            field_name = name.lstrip("-")
+            expression = query.resolve_ref(field_name, allow_joins=True)
+            target = getattr(expression, "target", None)
+            self.keys.append(
+                (field_name, name.startswith("-"), expression.output_field, bool(getattr(target, "null", False)))
+            )
+
+    @cached_property
+    def _count(self):
+        return approximate_count(self.queryset)
+
+    @property
+    def count(self):
+        return self._count[0]
+
+    @property
+    def approximate(self):
+        return self._count[1]
+
+    @property
+    def num_pages(self):
+        return max(1, math.ceil(self.count / self.per_page))
+
+    def _order_by(self, reverse=False):
+        order = []
+        for name, descending, _, nullable in self.keys:
+            # NULL en fin de liste, donc en tête quand le sens est inversé.
+            nulls = {}
+            if nullable:
+                nulls = {"nulls_first": True} if reverse else {"nulls_last": True}
+            order.append(F(name).desc(**nulls) if descending != reverse else F(name).asc(**nulls))
+        return order
+
+    def _seek(self, values, before=False):
+        """Lignes situées après (ou avant) `values` dans l'ordre de la liste"""
+        terms = []
+        equal = Q()
+        for (name, descending, _, nullable), value in zip(self.keys, values):
+            if value is None:
+                # Parmi les NULL (fin de liste) : rien après, toutes les valeurs avant.
+                strict = Q(**{f"{name}__isnull": False}) if before else None
+                same = Q(**{f"{name}__isnull": True})
+            else:
+                lookup = "lt" if descending != before else "gt"
+                strict = Q(**{f"{name}__{lookup}": value})
+                if nullable and not before:
+                    strict |= Q(**{f"{name}__isnull": True})
+                same = Q(**{name: value})
+            if strict is not None:
+                terms.append(equal & strict)
+            equal &= same
+        condition = reduce(operator.or_, terms)
+        name, descending, _, nullable = self.keys[0]
+        if values[0] is not None and not nullable:
+            # Borne redondante sur la première clé : parcours d'index par intervalle.
+            lookup = "lte" if descending != before else "gte"
+            condition &= Q(**{f"{name}__{lookup}": values[0]})
+        return condition
+
+    def cursor(self, obj, number, before=False):
+        """Curseur opaque de la page `number`, qui suit (ou précède) `obj`"""
+        payload = {
+            "o": self.ordering,
+            "v": [_encode(_attribute(obj, name)) for name, *_ in self.keys],
+            "p": number,
+        }
+        if before:
+            payload["b"] = 1
+        return signing.dumps(payload, salt=CURSOR_SALT, compress=True)
+
+    def _decode(self, cursor):
+        try:
+            payload = signing.loads(cursor, salt=CURSOR_SALT)
+            if payload["o"] != self.ordering or len(payload["v"]) != len(self.keys):
+                return None
+            values = [
+                None if value is None else field.to_python(value)
+                for (_, _, field, _), value in zip(self.keys, payload["v"])
+            ]
+            return values, max(int(payload["p"]), 1), bool(payload.get("b"))
+        except (signing.BadSignature, KeyError, TypeError, ValueError):
+            return None
+
+    def get_page(self, cursor=None):
+        """Page désignée par `cursor` ; la première page si le curseur est absent ou invalide"""
+        decoded = self._decode(cursor) if cursor else None
+        if decoded is None:
+            rows = list(self.queryset.order_by(*self._order_by())[:self.per_page + 1])
+            return KeysetPage(self, rows[:self.per_page], 1, False, len(rows) > self.per_page)
+
+        values, number, before = decoded
+        if before:
+            rows = list(
+                self.queryset.filter(self._seek(values, before=True))
+                .order_by(*self._order_by(reverse=True))[:self.per_page + 1]
+            )
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            return KeysetPage(self, rows, number if has_previous else 1, has_previous, True)
+
+        rows = list(self.queryset.filter(self._seek(values)).order_by(*self._order_by())[:self.per_page + 1])
+        return KeysetPage(self, rows[:self.per_page], number, True, len(rows) > self.per_page)
@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'tailwind',
     'theme',
     'django_browser_reload',
@@ -55,6 +56,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # En tête pour mesurer aussi les autres middlewares (session, authentification).
+    # Sans effet si INSTRUMENTATION_ENABLED est faux.
+    'facturation.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -99,6 +103,45 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# CACHE_BACKEND : locmem (défaut, propre à chaque processus), file ou redis,
+# ou le chemin complet d'un backend. Avec plusieurs processus (gunicorn),
+# utiliser file ou redis pour que les invalidations soient partagées.
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem')
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS.get(CACHE_BACKEND, CACHE_BACKEND),
+        'LOCATION': config(
+            'CACHE_LOCATION',
+            default=str(BASE_DIR / '.cache') if CACHE_BACKEND == 'file' else 'caisse-plus',
+        ),
+        'TIMEOUT': config('CACHE_TIMEOUT', default=300, cast=int),
+        'KEY_PREFIX': 'caisse-plus',
+    }
+}
+
+# Imports CSV d'articles : traités par un thread du serveur web, ou par la
+# commande process_import_jobs si ARTICLES_IMPORT_IN_PROCESS=False.
+ARTICLES_IMPORT_IN_PROCESS = config('ARTICLES_IMPORT_IN_PROCESS', default=True, cast=bool)
+
+# Instrumentation des requêtes (optionnelle) : requêtes SQL, temps base et
+# temps total par vue, en-tête Server-Timing et journal JSON lines renouvelé
+# (voir facturation/middleware.py et la commande instrumentation_report).
+INSTRUMENTATION_ENABLED = config('INSTRUMENTATION_ENABLED', default=False, cast=bool)
+INSTRUMENTATION_LOG = config('INSTRUMENTATION_LOG', default=str(BASE_DIR / 'logs' / 'requetes.jsonl'))
+INSTRUMENTATION_LOG_MAX_BYTES = config('INSTRUMENTATION_LOG_MAX_BYTES', default=10 * 1024 * 1024, cast=int)
+INSTRUMENTATION_LOG_BACKUP_COUNT = config('INSTRUMENTATION_LOG_BACKUP_COUNT', default=5, cast=int)
+# Requêtes SQL les plus lentes conservées par requête HTTP.
+INSTRUMENTATION_SLOWEST_QUERIES = 5
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
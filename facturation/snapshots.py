@@ -0,0 +1,31 @@
+"""
+État enregistré d'une facture avant sa modification.
+
+Les agrégats journaliers (apps.report) et les statistiques clients
+(apps.clients) comparent, dans leur post_save, l'ancien et le nouvel état d'une
+facture. Ce module enregistre le seul pre_save qui le lit, une requête par
+enregistrement pour les deux ; chaque application l'importe et le relit avec
+`previous`, sans dépendre de l'ordre d'enregistrement des signaux.
+"""
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+
+from .models import Facture
+
+# Champs qui déterminent la place d'une facture dans les agrégats et dans les
+# statistiques de son client.
+FIELDS = ("statut", "mode_paiement", "date_facture", "montant_HT", "montant_TVA", "montant_TTC", "client")
+
+
+@receiver(pre_save, sender=Facture)
+def remember_previous_facture(sender, instance, **kwargs):
+    """Mémorise l'état enregistré de la facture avant sa modification"""
+    instance._facture_previous = None
+    if instance.pk is None or kwargs.get("raw"):
+        return
+    instance._facture_previous = Facture.objects.filter(pk=instance.pk).only(*FIELDS).first()
+
+
+def previous(instance):
+    """État de la facture avant son dernier enregistrement (None à la création)"""
+    return getattr(instance, "_facture_previous", None)
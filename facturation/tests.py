@@ -0,0 +1,336 @@
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from decimal import Decimal
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.caisse.services import CheckoutService
+from apps.clients.models import StatistiqueClient
+from . import backup
+from .pagination import KeysetPaginator
+from .models import Article, Audit, Client, DetailFacture, Facture, Utilisateur
+
+
+class BackupRestoreTests(TestCase):
+    """Tests de la sauvegarde et de la restauration en archive"""
+
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(login='gerant', password='secret', role='Gestionnaire')
+        client_obj = Client.objects.create(nom='Diallo', prenom='Awa', type='enregistre')
+        articles = [
+            Article.objects.create(
+                code_barres=f'600000000000{i}', nom=f'Article {i}', prix_HT=Decimal('100.00'),
+                prix_TTC=Decimal('118.00'), taux_TVA=Decimal('0.180'), stock_actuel=50,
+            )
+            for i in range(3)
+        ]
+        for quantite in (1, 2):
+            CheckoutService.create_facture(
+                [{'article_id': article.id, 'quantite': quantite} for article in articles],
+                client=client_obj, caissier=self.user,
+            )
+        # Date de facture ancienne : ne doit pas devenir la date de restauration.
+        Facture.objects.update(date_facture=timezone.now() - timedelta(days=40))
+
+    def _snapshot(self):
+        return {
+            model._meta.label_lower: list(model._base_manager.order_by('pk').values_list())
+            for model in backup.backup_models()
+        }
+
+    def _backup(self):
+        archive = io.BytesIO()
+        counts = backup.backup(archive, chunk_size=2)
+        archive.seek(0)
+        return archive, counts
+
+    def test_round_trip(self):
+        """Test que la restauration reproduit toutes les tables et recale les séquences"""
+        before = self._snapshot()
+        archive, counts = self._backup()
+        self.assertEqual(counts['facturation.detailfacture'], 6)
+
+        restored = backup.restore(archive, replace=True)
+        self.assertEqual(restored, counts)
+        self.assertEqual(self._snapshot(), before)
+        self.assertTrue(Utilisateur.objects.get(login='gerant').check_password('secret'))
+
+        last_id = max(row[0] for row in before['facturation.facture'])
+        facture = Facture.objects.create(client=Client.objects.get())
+        self.assertGreater(facture.id, last_id)
+
+    def test_restore_refuses_non_empty_tables(self):
+        """Test qu'une restauration sans --replace ne mélange pas les données"""
+        archive, _ = self._backup()
+        with self.assertRaises(backup.BackupError):
+            backup.restore(archive)
+        self.assertEqual(DetailFacture.objects.count(), 6)
+
+    def test_truncated_archive_leaves_database_untouched(self):
+        """Test qu'une archive tronquée est rejetée sans rien modifier"""
+        archive, _ = self._backup()
+        before = self._snapshot()
+        truncated = io.BytesIO(archive.getvalue()[:-40])
+        with self.assertRaises(backup.BackupError):
+            backup.restore(truncated, replace=True)
+        self.assertEqual(self._snapshot(), before)
+
+        with self.assertRaises(backup.BackupError):
+            backup.restore(io.BytesIO(b'pas une archive'), replace=True)
+
+
+class IncrementalBackupTests(TestCase):
+    """Tests des sauvegardes incrémentales et de leur restauration en chaîne"""
+
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(login='gerant', password='secret', role='Gestionnaire')
+        self.client_obj = Client.objects.create(nom='Diallo', prenom='Awa', type='enregistre')
+        self.articles = [
+            Article.objects.create(
+                code_barres=f'600000000000{i}', nom=f'Article {i}', prix_HT=Decimal('100.00'),
+                prix_TTC=Decimal('118.00'), taux_TVA=Decimal('0.180'), stock_actuel=50,
+            )
+            for i in range(3)
+        ]
+        self.factures = [self._vendre(self.articles) for _ in range(4)]
+        # Historique ancien : hors de la fenêtre des incrémentales.
+        il_y_a_un_mois = timezone.now() - timedelta(days=30)
+        Facture.objects.update(date_facture=il_y_a_un_mois, date_modification=il_y_a_un_mois)
+        Article.objects.update(date_modification=il_y_a_un_mois)
+        Client.objects.create(nom='Traore', prenom='Moussa', type='enregistre')
+        StatistiqueClient.objects.update(date_modification=il_y_a_un_mois)
+
+    def _vendre(self, articles):
+        return CheckoutService.create_facture(
+            [{'article_id': article.id, 'quantite': 1} for article in articles],
+            client=self.client_obj, caissier=self.user,
+        )
+
+    def _snapshot(self):
+        return {
+            model._meta.label_lower: list(model._base_manager.order_by('pk').values_list())
+            for model in backup.backup_models()
+        }
+
+    def _backup(self, parent=None):
+        archive = io.BytesIO()
+        counts = backup.backup(archive, chunk_size=2, parent=parent)
+        archive.seek(0)
+        header = backup.read_header(archive)
+        archive.seek(0)
+        return archive, header, counts
+
+    def _reopen(self, *archives):
+        return [io.BytesIO(archive.getvalue()) for archive in archives]
+
+    def test_chain_replays_changes_and_deletions(self):
+        """Test qu'une complète suivie d'incrémentales reproduit la base, suppressions comprises"""
+        complete, header, _ = self._backup()
+        self.assertEqual(header['type'], backup.COMPLETE)
+
+        # Jour 1 : une vente, une annulation.
+        self._vendre(self.articles[:1])
+        annulee = self.factures[0]
+        annulee.statut = 'annulee'
+        annulee.save()
+        jour1, header1, counts1 = self._backup(parent=header)
+        self.assertEqual(header1['parent'], header['id'])
+        self.assertEqual(counts1['facturation.facture'], 2)
+        self.assertEqual(counts1['facturation.detailfacture'], 4)
+        self.assertEqual(counts1['facturation.article'], 1)  # stock décrémenté par la vente
+        self.assertEqual(counts1['clients.statistiqueclient'], 1)  # seul le client de la vente
+
+        # Jour 2 : un article supprimé emporte ses lignes de facture, une facture supprimée.
+        self.articles[2].delete()
+        Facture.objects.filter(pk=self.factures[3].pk).delete()
+        Audit.objects.create(utilisateur=self.user, type_action='suppression', description='Article 2')
+        jour2, _, counts2 = self._backup(parent=header1)
+        # Recouvrement : les lignes du jour 1 sont renvoyées, pas l'historique.
+        self.assertLess(counts2['facturation.detailfacture'], DetailFacture.objects.count())
+        self.assertEqual(counts2['facturation.audit'], 1)
+        expected = self._snapshot()
+
+        restored = backup.restore(*self._reopen(complete, jour1, jour2), replace=True)
+        self.assertEqual(self._snapshot(), expected)
+        self.assertEqual(restored['facturation.audit'], 1)
+        self.assertEqual(Facture.objects.get(pk=annulee.pk).statut, 'annulee')
+        self.assertFalse(DetailFacture.objects.filter(article_id=self.articles[2].pk).exists())
+
+        facture = Facture.objects.create(client=self.client_obj)
+        self.assertGreater(facture.id, max(row[0] for row in expected['facturation.facture']))
+
+    def test_chain_out_of_order_is_rejected(self):
+        """Test qu'une incrémentale sans sa parente ou en tête de chaîne est refusée"""
+        complete, header, _ = self._backup()
+        self._vendre(self.articles)
+        jour1, header1, _ = self._backup(parent=header)
+        self._vendre(self.articles)
+        jour2, _, _ = self._backup(parent=header1)
+        before = self._snapshot()
+
+        for chain in ((complete, jour2), (jour1, jour2), (complete, jour2, jour1)):
+            with self.assertRaises(backup.BackupError):
+                backup.restore(*self._reopen(*chain), replace=True)
+        self.assertEqual(self._snapshot(), before)
+
+    def test_subtract_ranges(self):
+        """Test le calcul des identifiants supprimés à partir des plages"""
+        self.assertEqual(backup._subtract([[1, 10]], [[1, 3], [5, 5], [8, 12]]), [[4, 4], [6, 7]])
+        self.assertEqual(backup._subtract([[1, 3], [7, 9]], []), [[1, 3], [7, 9]])
+        self.assertEqual(backup._subtract([[1, 3], [7, 9]], [[0, 20]]), [])
+
+
+class HotQueryIndexTests(TestCase):
+    """Tests des index des requêtes fréquentes (commande explain_hot_queries)"""
+
+    def setUp(self):
+        client = Client.objects.create(nom='Diallo', prenom='Awa')
+        article = Article.objects.create(
+            code_barres='6100000000001', nom='Riz', categorie='Épicerie', prix_HT=Decimal('100.00'),
+            prix_TTC=Decimal('118.00'), taux_TVA=Decimal('0.180'), stock_actuel=2, stock_minimum=5,
+        )
+        facture = Facture.objects.create(client=client, montant_TTC=Decimal('118.00'))
+        DetailFacture.objects.create(
+            facture=facture, article=article, quantite=1, prix_unitaire=Decimal('118.00'), total_ligne=Decimal('118.00'),
+        )
+
+    def test_hot_queries_use_indexes(self):
+        """Test qu'aucune requête fréquente ne parcourt une table entière"""
+        out = io.StringIO()
+        call_command('explain_hot_queries', '--threshold', '0', stdout=out)
+        self.assertIn('facturation_art_stock_bas_idx', out.getvalue())
+        self.assertIn('facturation_fact_client_idx', out.getvalue())
+
+    def test_sequential_scan_above_threshold_fails(self):
+        """Test l'échec de la commande sur un parcours séquentiel"""
+        from .management.commands import explain_hot_queries
+
+        queries = explain_hot_queries.hot_queries
+        explain_hot_queries.hot_queries = lambda: [('Par montant', Facture.objects.filter(montant_TTC=1))]
+        try:
+            with self.assertRaises(CommandError):
+                call_command('explain_hot_queries', '--threshold', '0', stdout=io.StringIO())
+            call_command('explain_hot_queries', '--threshold', '1', stdout=io.StringIO())
+        finally:
+            explain_hot_queries.hot_queries = queries
+
+
+class KeysetPaginationTests(TestCase):
+    """Tests de la pagination par clé"""
+
+    def setUp(self):
+        for i in range(11):
+            Article.objects.create(
+                code_barres=f'62000000000{i:02d}', nom=f'Article {i % 4}', prix_HT=Decimal(i % 3 + 1),
+                prix_TTC=Decimal(i % 3 + 1), taux_TVA=Decimal('0.000'),
+                categorie=None if i % 5 == 0 else 'epicerie', stock_actuel=i,
+            )
+
+    def _expected(self, ordering):
+        paginator = KeysetPaginator(Article.objects.all(), 3, ordering)
+        return list(Article.objects.order_by(*paginator._order_by()))
+
+    def test_forward_and_backward_walks(self):
+        """Test le parcours des pages dans les deux sens, avec ex aequo et valeurs NULL"""
+        for ordering in (['nom'], ['-prix_HT', 'nom'], ['categorie'], ['-categorie', '-stock_actuel']):
+            paginator = KeysetPaginator(Article.objects.all(), 3, ordering)
+            pages = [paginator.get_page()]
+            while pages[-1].has_next():
+                pages.append(paginator.get_page(pages[-1].next_cursor))
+            rows = [article for page in pages for article in page]
+            self.assertEqual(rows, self._expected(ordering), ordering)
+            self.assertEqual([page.number for page in pages], [1, 2, 3, 4])
+
+            back = pages[-1]
+            while back.has_previous():
+                back = paginator.get_page(back.previous_cursor)
+                self.assertEqual(back.object_list, pages[back.number - 1].object_list, ordering)
+            self.assertEqual(back.number, 1)
+
+    def test_count_and_invalid_cursor(self):
+        """Test le nombre de pages et le retour à la première page sur un curseur invalide"""
+        paginator = KeysetPaginator(Article.objects.filter(categorie='epicerie'), 3, ['nom'])
+        self.assertEqual((paginator.count, paginator.approximate, paginator.num_pages), (8, False, 3))
+        page = paginator.get_page(paginator.get_page().next_cursor + 'x')
+        self.assertEqual((page.number, page.has_previous()), (1, False))
+        other = KeysetPaginator(Article.objects.all(), 3, ['prix_HT'])
+        self.assertEqual(other.get_page(paginator.get_page().next_cursor).number, 1)
+
+
+class InstrumentationTests(TestCase):
+    """Tests du middleware d'instrumentation et du rapport par vue"""
+
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(login='gerant', password='secret', role='Gestionnaire')
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.log = str(Path(self.tmpdir) / 'requetes.jsonl')
+
+    def test_disabled_by_default(self):
+        """Test l'absence de mesure quand l'instrumentation est désactivée"""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('clients:index'))
+        self.assertNotIn('Server-Timing', response.headers)
+
+    def test_server_timing_log_and_report(self):
+        """Test l'en-tête Server-Timing, le journal JSON lines et le rapport p95"""
+        with override_settings(INSTRUMENTATION_ENABLED=True, INSTRUMENTATION_LOG=self.log):
+            self.client.force_login(self.user)
+            response = self.client.get(reverse('clients:index'))
+            self.client.get(reverse('clients:index'), {'sort': 'total_spent'})
+            self.client.get(reverse('articles:liste_articles'))
+
+        self.assertRegex(response.headers['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", app;dur=')
+        records = [json.loads(line) for line in Path(self.log).read_text(encoding='utf-8').splitlines()]
+        self.assertEqual([record['vue'] for record in records[:2]], ['clients:index'] * 2)
+        self.assertGreater(records[0]['requetes'], 0)
+        self.assertLessEqual(len(records[0]['plus_lentes']), 5)
+
+        out = io.StringIO()
+        call_command('instrumentation_report', '--log', self.log, '--json', stdout=out)
+        rows = {row['vue']: row for row in json.loads(out.getvalue())}
+        self.assertEqual(rows['clients:index']['appels'], 2)
+        self.assertEqual(rows['articles:liste_articles']['appels'], 1)
+
+
+class LoadBenchmarkTests(TestCase):
+    """Tests du jeu de données de charge (seed_load) et du benchmark des chemins critiques"""
+
+    def test_seed_load_and_benchmark(self):
+        """Test la génération des volumes demandés, puis un benchmark comparé à lui-même"""
+        call_command(
+            'seed_load', '--articles', '40', '--clients', '15', '--factures', '120', '--days', '30',
+            stdout=io.StringIO(),
+        )
+        # Les clients demandés et le client comptoir des ventes anonymes.
+        self.assertEqual((Article.objects.count(), Client.objects.count(), Facture.objects.count()), (40, 16, 120))
+        self.assertTrue(Facture.objects.filter(client__nom='Client comptoir').exists())
+        self.assertFalse(DetailFacture.objects.filter(facture__montant_TTC=0).exists())
+
+        output = str(Path(tempfile.mkdtemp()) / 'bench.json')
+        self.addCleanup(shutil.rmtree, Path(output).parent)
+        call_command('bench_hot_paths', '--repeat', '1', '--export-repeat', '1', '--output', output, stdout=io.StringIO())
+        results = json.loads(Path(output).read_text(encoding='utf-8'))
+        self.assertEqual(results['volumes']['factures'], 120)
+        self.assertEqual(Facture.objects.count(), 120)
+        self.assertIn('report_view[year]', results['resultats'])
+        self.assertEqual(
+            set(results['resultats']['create_facture']), {'premier_ms', 'mediane_ms', 'p95_ms', 'min_ms', 'requetes'}
+        )
+
+        reference = json.loads(Path(output).read_text(encoding='utf-8'))
+        for row in reference['resultats'].values():
+            row['mediane_ms'] = 0.001
+        Path(output).write_text(json.dumps(reference), encoding='utf-8')
+        with self.assertRaises(CommandError):
+            call_command(
+                'bench_hot_paths', '--repeat', '1', '--only', 'report_view[year]', '--compare', output,
+                '--tolerance', '20', stdout=io.StringIO(),
+            )
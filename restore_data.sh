@@ -23,20 +23,12 @@ fi
 echo "🧱 Application des migrations..."
 "$PYTHON_BIN" manage.py migrate
 
-echo "📥 Chargement des utilisateurs..."
-"$PYTHON_BIN" manage.py loaddata apps/utilisateurs/fixtures/users.json
-
-echo "📥 Chargement des articles..."
-"$PYTHON_BIN" manage.py loaddata apps/utilisateurs/fixtures/articles.json
-
-echo "📥 Chargement des clients..."
-"$PYTHON_BIN" manage.py loaddata apps/utilisateurs/fixtures/clients.json
-
-echo "📥 Chargement des factures..."
-"$PYTHON_BIN" manage.py loaddata apps/utilisateurs/fixtures/factures.json
-
-echo "📥 Chargement des détails de factures..."
-"$PYTHON_BIN" manage.py loaddata apps/utilisateurs/fixtures/details.json
+# Remplace les données existantes par celles de l'archive complète, puis rejoue
+# les incrémentales dans leur ordre de création (une seule transaction).
+echo "📥 Chargement des données..."
+ARCHIVES=$(ls apps/utilisateurs/fixtures/sauvegarde.gz apps/utilisateurs/fixtures/sauvegarde_incr_*.gz 2>/dev/null | sort)
+# shellcheck disable=SC2086
+"$PYTHON_BIN" manage.py restore $ARCHIVES --replace --noinput
 
 echo ""
 echo "✅ Restauration terminée."